@@ -0,0 +1,161 @@
+import numpy as np
+
+
+def dividir_demandas(demandas, capacidad):
+    """Separa las demandas que superan la capacidad en viajes completos dedicados.
+
+    Devuelve la lista de viajes dedicados (un nodo cada uno, con carga completa)
+    y la demanda restante de cada nodo, siempre entre 1 y `capacidad` (o 0).
+    Es el mismo reparto que hace el greedy con las entregas parciales: el
+    camión vacía su carga completa en el nodo y vuelve a por el resto.
+    """
+    dedicados = []
+    restantes = [0] * len(demandas)
+    for nodo in range(1, len(demandas)):
+        demanda = demandas[nodo]
+        if demanda <= 0:
+            continue
+        completos = (demanda - 1) // capacidad
+        dedicados.extend([nodo] * completos)
+        restantes[nodo] = demanda - completos * capacidad
+    return dedicados, restantes
+
+
+def lista_ahorros(distancias, clientes, k_vecinos=None, forma=1.0, regreso=None):
+    """Devuelve los pares (i, j) de clientes ordenados de mayor a menor ahorro de Clarke–Wright.
+
+    El ahorro de unir i y j en un mismo viaje es d(i, 0) + d(0, j) - d(i, j);
+    solo se conservan los pares con ahorro positivo. El orden usa el ahorro
+    parametrizado d(i, 0) + d(0, j) - forma · d(i, j): con `forma` > 1 pesa más
+    la arista interior, lo que suele ayudar en matrices no euclídeas.
+    Con `k_vecinos` solo se consideran los pares en los que j está entre los k
+    vecinos más cercanos de i, lo que deja la lista en O(n·k) en vez de O(n²).
+    Con `regreso` (coste del camino mínimo de cada nodo al almacén), d(i, 0)
+    se toma de ahí en lugar del regreso directo.
+    """
+    clientes = np.asarray(clientes, dtype=np.int64)
+    if len(clientes) < 2:
+        return np.empty((0, 2), dtype=np.int64)
+    if k_vecinos is None or k_vecinos >= len(clientes) - 1:
+        a, b = np.triu_indices(len(clientes), 1)
+        i, j = clientes[a], clientes[b]
+    else:
+        es_cliente = np.zeros(len(distancias), dtype=bool)
+        es_cliente[clientes] = True
+        vecinos = np.asarray(distancias.vecinos_cercanos(k_vecinos + 1), dtype=np.int64)[clientes]
+        i = np.repeat(clientes, vecinos.shape[1])
+        j = vecinos.ravel()
+        validos = es_cliente[j]
+        i, j = i[validos], j[validos]
+        # Cada par se guarda una sola vez, con i < j
+        i, j = np.minimum(i, j), np.maximum(i, j)
+        pares = np.unique(np.stack([i, j], axis=1), axis=0)
+        i, j = pares[:, 0], pares[:, 1]
+    almacen = np.zeros_like(i)
+    hasta_almacen = distancias.pares(i, almacen) if regreso is None else np.asarray(regreso)[i]
+    desde_almacen = hasta_almacen.astype(np.float64) + distancias.pares(almacen, j)
+    interior = distancias.pares(i, j).astype(np.float64)
+    positivos = desde_almacen - interior > 0
+    i, j = i[positivos], j[positivos]
+    orden = np.argsort(forma * interior[positivos] - desde_almacen[positivos], kind="stable")
+    return np.stack([i[orden], j[orden]], axis=1)
+
+
+def clarke_wright(distancias, demandas, capacidad, k_vecinos=None, forma=1.0, regreso=None, presupuesto=None):
+    """Construye viajes con el algoritmo de ahorros de Clarke–Wright.
+
+    Las rutas se fusionan por sus extremos usando union-find para saber a qué
+    ruta pertenece cada cliente. Devuelve la lista de viajes (listas de nodos
+    sin el almacén), con los viajes dedicados de las demandas grandes primero.
+    Si el `presupuesto` se agota se dejan de fusionar rutas: las que quedan
+    son igualmente una solución válida.
+
+    Los ahorros suponen que unir dos viajes por sus extremos ahorra lo que
+    dicen las distancias al almacén, algo que solo se cumple en instancias
+    métricas. En matrices no métricas hay que pasarle las distancias de los
+    caminos mínimos y recorrer los viajes por esos caminos (ver
+    `viajes_por_caminos`); con las distancias directas queda bastante peor
+    que el greedy.
+    """
+    dedicados, cargas = dividir_demandas(demandas, capacidad)
+    clientes = [nodo for nodo in range(1, len(demandas)) if cargas[nodo] > 0]
+
+    padre = list(range(len(demandas)))
+    extremos = {nodo: (nodo, nodo) for nodo in clientes}
+    enlaces = {nodo: [] for nodo in clientes}
+
+    def raiz(nodo):
+        while padre[nodo] != nodo:
+            padre[nodo] = padre[padre[nodo]]
+            nodo = padre[nodo]
+        return nodo
+
+    for i, j in lista_ahorros(distancias, clientes, k_vecinos, forma, regreso).tolist():
+        if presupuesto is not None and presupuesto.agotado():
+            break
+        ri = raiz(i)
+        rj = raiz(j)
+        if ri == rj or cargas[ri] + cargas[rj] > capacidad:
+            continue
+        if i not in extremos[ri] or j not in extremos[rj]:
+            continue
+        # El nuevo viaje va del otro extremo de la ruta de i al otro extremo de la de j
+        izquierda, derecha = extremos[ri]
+        otro_i = izquierda if derecha == i else derecha
+        izquierda, derecha = extremos[rj]
+        otro_j = izquierda if derecha == j else derecha
+        enlaces[i].append(j)
+        enlaces[j].append(i)
+        padre[rj] = ri
+        cargas[ri] += cargas[rj]
+        extremos[ri] = (otro_i, otro_j)
+        del extremos[rj]
+
+    viajes = [[nodo] for nodo in dedicados]
+    for inicio, _ in extremos.values():
+        viaje = [inicio]
+        anterior = None
+        actual = inicio
+        while True:
+            siguientes = [nodo for nodo in enlaces[actual] if nodo != anterior]
+            if not siguientes:
+                break
+            anterior, actual = actual, siguientes[0]
+            viaje.append(actual)
+        viajes.append(viaje)
+    return viajes
+
+
+def viajes_por_caminos(viajes, siguiente):
+    """Viajes de `clarke_wright` con los nodos por los que pasan los caminos mínimos entre sus visitas.
+
+    Con los ahorros calculados sobre las distancias de los caminos mínimos
+    (las de Floyd–Warshall), cada tramo del viaje solo cuesta eso si pasa por
+    los nodos intermedios de su camino; `siguiente[i][j]` es el primer salto
+    de i hacia j. Pasar por un nodo con demanda pendiente es entregarle, así
+    que los viajes se ordenan para que, en lo posible, cada uno vaya después
+    de los que visitan los nodos por los que pasa: al pasar ya están servidos.
+    """
+    tramos = []
+    visitas = {}  # nodo -> viajes que lo visitan
+    for k, viaje in enumerate(viajes):
+        tramo = []
+        anterior = 0
+        for nodo in viaje:
+            while siguiente[anterior][nodo] != nodo:
+                anterior = siguiente[anterior][nodo]
+                tramo.append(anterior)
+            tramo.append(nodo)
+            anterior = nodo
+            visitas.setdefault(nodo, set()).add(k)
+        tramos.append(tramo)
+
+    # Viajes que deberían ir antes de cada uno; los ciclos se rompen por el que menos espera
+    antes = [set().union(*(visitas.get(nodo, ()) for nodo in tramo)) - {k} for k, tramo in enumerate(tramos)]
+    pendientes = set(range(len(tramos)))
+    ordenados = []
+    while pendientes:
+        k = min(pendientes, key=lambda k: (len(antes[k] & pendientes), k))
+        pendientes.remove(k)
+        ordenados.append(tramos[k])
+    return ordenados
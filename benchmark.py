@@ -0,0 +1,191 @@
+"""Banco de pruebas de rendimiento de los algoritmos de ambas variantes.
+
+Genera instancias reproducibles (misma semilla, misma instancia) de 10, 100,
+1000 y 5000 nodos y ejecuta sobre ellas cada método `resolver_*` de
+TSPGenerico y TSPCapacidad. Por cada combinación mide:
+
+- el tiempo con `time.perf_counter`, tras unas ejecuciones de calentamiento
+  y como mediana de varias repeticiones (la construcción de la instancia no
+  se cronometra);
+- la distancia de la solución;
+- la memoria pico de la resolución, con `tracemalloc`, en una ejecución
+  aparte para que su sobrecoste no afecte a los tiempos.
+
+Los resultados se pueden guardar como línea base (JSON) y comparar con ella
+en ejecuciones posteriores: el programa termina con código 1 si algún tiempo
+o alguna distancia empeora más allá del umbral indicado.
+
+Uso:
+    python benchmark.py --guardar-base base.json
+    python benchmark.py --base base.json --umbral-tiempo 0.25
+    python benchmark.py --tamanos 10 100 --metodos 2opt 3opt greedy
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from io import StringIO
+from held_karp import MAX_NODOS_HELD_KARP
+from lote import VARIANTES, algoritmos_disponibles, crear_problema
+
+TAMANOS = (10, 100, 1000, 5000)
+SEMILLA = 2024
+
+# Tamaño máximo de instancia de los métodos que no escalan
+MAX_NODOS = {
+    "fuerza_bruta": 10,
+    "held_karp": MAX_NODOS_HELD_KARP,
+    "multiarranque": 1000,
+    "ramificacion_poda": 100,
+}
+
+# Argumentos fijos para que cada método haga siempre el mismo trabajo
+PARAMETROS = {
+    "recocido_simulado": {"max_evaluaciones": 20000},
+    "tabu": {"max_evaluaciones": 20000},
+    "multiarranque": {"num_arranques": 4, "semilla": SEMILLA},
+    "flota": {"max_evaluaciones": 20000},
+    "ramificacion_poda": {"max_ramificaciones": 200},
+}
+
+
+def instancia(variante, num_nodos, semilla=SEMILLA):
+    """Descripción de la instancia reproducible de una variante y tamaño"""
+    return {"variante": variante, "num_nodos": num_nodos, "semilla": semilla + num_nodos}
+
+
+def _ejecutar(variante, metodo, num_nodos, semilla):
+    """Construye la instancia (sin cronometrar) y la resuelve; devuelve (segundos, tsp)"""
+    tsp = crear_problema(instancia(variante, num_nodos, semilla))
+    resolver = getattr(tsp, "resolver_" + metodo)
+    # Los mensajes de los algoritmos no interesan aquí
+    with redirect_stdout(StringIO()):
+        inicio = time.perf_counter()
+        resolver(**PARAMETROS.get(metodo, {}))
+        segundos = time.perf_counter() - inicio
+    return segundos, tsp
+
+
+def medir(variante, metodo, num_nodos, repeticiones=3, calentamiento=1, semilla=SEMILLA):
+    """Mide un método sobre la instancia de un tamaño y devuelve un diccionario con los resultados"""
+    for _ in range(calentamiento):
+        _ejecutar(variante, metodo, num_nodos, semilla)
+
+    tiempos = []
+    distancia = None
+    for _ in range(max(repeticiones, 1)):
+        segundos, tsp = _ejecutar(variante, metodo, num_nodos, semilla)
+        tiempos.append(segundos)
+        distancia = tsp.mejor_distancia
+
+    tracemalloc.start()
+    try:
+        tsp = crear_problema(instancia(variante, num_nodos, semilla))
+        tracemalloc.reset_peak()
+        memoria_base = tracemalloc.get_traced_memory()[0]
+        with redirect_stdout(StringIO()):
+            getattr(tsp, "resolver_" + metodo)(**PARAMETROS.get(metodo, {}))
+        memoria_pico = tracemalloc.get_traced_memory()[1] - memoria_base
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "tiempo": statistics.median(tiempos),
+        "tiempo_min": min(tiempos),
+        "distancia": distancia,
+        "memoria_pico": memoria_pico,
+    }
+
+
+def ejecutar_banco(tamanos=TAMANOS, variantes=None, metodos=None, repeticiones=3, calentamiento=1,
+                   semilla=SEMILLA, progreso=None):
+    """Ejecuta todas las combinaciones y devuelve {"variante/metodo/n": resultado}"""
+    resultados = {}
+    for variante in variantes or sorted(VARIANTES):
+        for metodo in algoritmos_disponibles(variante):
+            if metodos and metodo not in metodos:
+                continue
+            for num_nodos in tamanos:
+                if num_nodos > MAX_NODOS.get(metodo, num_nodos):
+                    continue
+                clave = f"{variante}/{metodo}/{num_nodos}"
+                resultados[clave] = medir(variante, metodo, num_nodos, repeticiones, calentamiento, semilla)
+                if progreso is not None:
+                    progreso(clave, resultados[clave])
+    return resultados
+
+
+def comparar(resultados, base, umbral_tiempo=0.25, umbral_calidad=0.0, tiempo_minimo=0.005):
+    """Compara con la línea base y devuelve la lista de regresiones (mensajes).
+
+    Un tiempo es regresión si supera al de la base en más de `umbral_tiempo`
+    (fracción) y la diferencia es mayor que `tiempo_minimo` segundos, para no
+    confundir el ruido de las medidas muy cortas con una regresión. Una
+    distancia lo es si supera a la de la base en más de `umbral_calidad`.
+    """
+    regresiones = []
+    for clave, actual in resultados.items():
+        anterior = base.get(clave)
+        if anterior is None:
+            continue
+        limite = anterior["tiempo"] * (1 + umbral_tiempo)
+        if actual["tiempo"] > limite and actual["tiempo"] - anterior["tiempo"] > tiempo_minimo:
+            regresiones.append(f"{clave}: tiempo {actual['tiempo']:.4f} s "
+                               f"(base {anterior['tiempo']:.4f} s)")
+        if actual["distancia"] > anterior["distancia"] * (1 + umbral_calidad):
+            regresiones.append(f"{clave}: distancia {actual['distancia']} "
+                               f"(base {anterior['distancia']})")
+    return regresiones
+
+
+def _mostrar(clave, resultado):
+    print(f"{clave:<40} {resultado['tiempo']:>10.4f} s {resultado['distancia']:>12} km "
+          f"{resultado['memoria_pico'] / 1024 ** 2:>9.2f} MB", flush=True)
+
+
+def principal(argumentos=None):
+    parser = argparse.ArgumentParser(description="Banco de pruebas de rendimiento de los algoritmos del TSP.")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=list(TAMANOS), help="tamaños de instancia")
+    parser.add_argument("--variantes", nargs="+", choices=sorted(VARIANTES), help="variantes a medir")
+    parser.add_argument("--metodos", nargs="+", help="métodos a medir (nombre sin 'resolver_')")
+    parser.add_argument("--repeticiones", type=int, default=3, help="ejecuciones cronometradas")
+    parser.add_argument("--calentamiento", type=int, default=1, help="ejecuciones previas sin cronometrar")
+    parser.add_argument("--semilla", type=int, default=SEMILLA, help="semilla de las instancias")
+    parser.add_argument("--salida", help="guarda los resultados de esta ejecución (JSON)")
+    parser.add_argument("--guardar-base", help="guarda los resultados como nueva línea base (JSON)")
+    parser.add_argument("--base", help="línea base con la que comparar (JSON)")
+    parser.add_argument("--umbral-tiempo", type=float, default=0.25,
+                        help="empeoramiento de tiempo tolerado, en fracción (0.25 = 25%%)")
+    parser.add_argument("--umbral-calidad", type=float, default=0.0,
+                        help="empeoramiento de distancia tolerado, en fracción")
+    parser.add_argument("--tiempo-minimo", type=float, default=0.005,
+                        help="diferencia de tiempo (s) por debajo de la cual no se considera regresión")
+    args = parser.parse_args(argumentos)
+
+    print(f"{'instancia':<40} {'tiempo':>12} {'distancia':>15} {'memoria':>12}")
+    resultados = ejecutar_banco(args.tamanos, args.variantes, args.metodos, args.repeticiones,
+                                args.calentamiento, args.semilla, progreso=_mostrar)
+
+    for nombre in (args.salida, args.guardar_base):
+        if nombre:
+            with open(nombre, "w", encoding="utf-8") as fichero:
+                json.dump(resultados, fichero, indent=2, sort_keys=True)
+
+    if args.base:
+        with open(args.base, encoding="utf-8") as fichero:
+            base = json.load(fichero)
+        regresiones = comparar(resultados, base, args.umbral_tiempo, args.umbral_calidad, args.tiempo_minimo)
+        if regresiones:
+            print("\nRegresiones respecto a la línea base:")
+            for regresion in regresiones:
+                print(f"  {regresion}")
+            return 1
+        print("\nSin regresiones respecto a la línea base.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(principal())
@@ -0,0 +1,212 @@
+from collections import deque
+
+
+class BusquedaLocal:
+    """Motor de búsqueda local sobre un tour cíclico con evaluación delta de movimientos.
+
+    El tour se guarda como una lista de nodos más su vector de posiciones, de
+    modo que sucesor y predecesor se consultan en O(1) y las inversiones de
+    segmentos se hacen in situ. Los movimientos solo se prueban contra las
+    listas de vecinos más cercanos y se usan bits "no mirar" para no volver a
+    revisar nodos cuyo entorno no ha cambiado.
+    """
+
+    def __init__(self, ruta_indices, distancias, vecinos, distancia_inicial=None, max_segmento=3):
+        self.ruta = list(ruta_indices)
+        self.n = len(self.ruta)
+        self.posicion = [0] * self.n
+        for i, nodo in enumerate(self.ruta):
+            self.posicion[nodo] = i
+        self.distancias = distancias
+        self.vecinos = vecinos
+        if distancia_inicial is None:
+            distancia_inicial = sum(distancias[self.ruta[i - 1]][self.ruta[i]] for i in range(self.n))
+        self.distancia = distancia_inicial
+        self.max_segmento = max_segmento
+        # Totales de `optimizar`: nodos examinados con cada movimiento y movimientos aplicados
+        self.examinados = 0
+        self.aplicados = 0
+
+    def siguiente(self, nodo):
+        """Devuelve el nodo que sigue a `nodo` en el tour"""
+        i = self.posicion[nodo] + 1
+        return self.ruta[i] if i < self.n else self.ruta[0]
+
+    def anterior(self, nodo):
+        """Devuelve el nodo que precede a `nodo` en el tour"""
+        return self.ruta[self.posicion[nodo] - 1]
+
+    def invertir(self, desde, hasta):
+        """Invierte in situ el camino del tour que va de `desde` a `hasta`"""
+        ruta = self.ruta
+        posicion = self.posicion
+        n = self.n
+        i = posicion[desde]
+        j = posicion[hasta]
+        longitud = (j - i) % n + 1
+        if 2 * longitud > n:
+            # Invertir el complemento da el mismo ciclo con menos intercambios
+            i, j = (j + 1) % n, (i - 1) % n
+            longitud = n - longitud
+        for _ in range(longitud // 2):
+            a = ruta[i]
+            b = ruta[j]
+            ruta[i] = b
+            posicion[b] = i
+            ruta[j] = a
+            posicion[a] = j
+            i += 1
+            if i == n:
+                i = 0
+            j -= 1
+            if j < 0:
+                j = n - 1
+
+    def intercambiar(self, x1, x2, y1, y2):
+        """Sustituye las aristas (x1, x2) e (y1, y2) por (x1, y1) y (x2, y2)"""
+        if self.siguiente(x1) == x2:
+            self.invertir(x2, y1)
+        else:
+            self.invertir(y1, x2)
+
+    def mejorar_2opt(self, a):
+        """Aplica el primer movimiento 2-opt que mejora el tour alrededor de `a`.
+
+        Devuelve los nodos cuyas aristas cambiaron, o None si no hubo mejora.
+        """
+        distancias = self.distancias
+        fila_a = distancias[a]
+        for hacia_delante in (True, False):
+            b = self.siguiente(a) if hacia_delante else self.anterior(a)
+            d_ab = fila_a[b]
+            for c in self.vecinos[a]:
+                d_ac = fila_a[c]
+                if d_ac >= d_ab:
+                    break
+                d = self.siguiente(c) if hacia_delante else self.anterior(c)
+                if d == a:
+                    continue
+                # Solo cambian cuatro aristas: la ganancia se calcula en O(1)
+                ganancia = d_ab + distancias[c][d] - d_ac - distancias[b][d]
+                if ganancia > 0:
+                    self.intercambiar(a, b, c, d)
+                    self.distancia -= ganancia
+                    return a, b, c, d
+        return None
+
+    def mover_segmento(self, a, b, c, d, e, f, paso):
+        """Reinserta el segmento b..c, situado entre a y d, en la arista (e, f).
+
+        `paso` es 1 si el segmento avanza de b a c en el sentido del tour y -1
+        si avanza en sentido contrario. Tras el movimiento b queda junto a e y c
+        junto a f. Se realiza como dos o tres intercambios 2-opt encadenados.
+        """
+        # u es el extremo de (e, f) que se alcanza primero al avanzar desde d
+        n = self.n
+        posicion = self.posicion
+        if ((posicion[e] - posicion[d]) * paso) % n < ((posicion[f] - posicion[d]) * paso) % n:
+            u, v = e, f
+        else:
+            u, v = f, e
+        self.intercambiar(a, b, u, v)
+        if u != d:
+            self.intercambiar(a, u, d, c)
+        if u == e:
+            self.intercambiar(u, c, b, v)
+
+    def mejorar_or_opt(self, b):
+        """Aplica la primera reinserción de un segmento que empieza en `b` y mejora el tour.
+
+        Prueba segmentos de 1 a `max_segmento` nodos en ambos sentidos y los
+        reinserta, en su orientación original o invertidos, junto a los vecinos
+        más cercanos de sus extremos.
+        """
+        distancias = self.distancias
+        posicion = self.posicion
+        n = self.n
+        for paso in (1, -1):
+            avanzar = self.siguiente if paso == 1 else self.anterior
+            a = self.anterior(b) if paso == 1 else self.siguiente(b)
+            c = b
+            for longitud in range(1, self.max_segmento + 1):
+                if longitud > 1:
+                    c = avanzar(c)
+                d = avanzar(c)
+                if c == a or d == a:
+                    break
+                eliminado = distancias[a][b] + distancias[c][d] - distancias[a][d]
+                if eliminado <= 0:
+                    continue
+                for extremo, otro in ((b, c), (c, b)):
+                    fila_extremo = distancias[extremo]
+                    for e in self.vecinos[extremo]:
+                        d_e = fila_extremo[e]
+                        if d_e >= eliminado:
+                            break
+                        if ((posicion[e] - posicion[b]) * paso) % n < longitud:
+                            continue
+                        for f in (self.siguiente(e), self.anterior(e)):
+                            if f == a or e == a or ((posicion[f] - posicion[b]) * paso) % n < longitud:
+                                continue
+                            ganancia = eliminado + distancias[e][f] - d_e - distancias[otro][f]
+                            if ganancia > 0:
+                                if extremo == b:
+                                    self.mover_segmento(a, b, c, d, e, f, paso)
+                                else:
+                                    self.mover_segmento(a, b, c, d, f, e, paso)
+                                self.distancia -= ganancia
+                                return a, b, c, d, e, f
+        return None
+
+    def optimizar(self, movimientos, max_iteraciones=1000, presupuesto=None, activos=None):
+        """Aplica los movimientos hasta alcanzar un óptimo local o agotar las pasadas.
+
+        Cada pasada recorre los nodos activos; un nodo se desactiva si ningún
+        movimiento lo mejora y se reactiva cuando cambia alguna de sus aristas.
+        Con `activos` solo empiezan activos esos nodos (el resto se revisa si
+        cambian sus aristas), para reparar una zona de un tour ya optimizado.
+        Con un `Presupuesto` se para en cuanto se agota (el tour siempre es
+        válido) y se avisa de la distancia tras cada pasada.
+        """
+        if activos is None:
+            activo = [True] * self.n
+            cola = deque(self.ruta)
+        else:
+            activo = [False] * self.n
+            cola = deque()
+            for nodo in activos:
+                if not activo[nodo]:
+                    activo[nodo] = True
+                    cola.append(nodo)
+        pasadas = 0
+        examinados = 0
+        aplicados = 0
+        while cola and pasadas < max_iteraciones:
+            pasadas += 1
+            for _ in range(len(cola)):
+                # Examinar un nodo puede costar milisegundos: el reloj se lee en cada uno
+                if presupuesto is not None and presupuesto.agotado(inmediato=True):
+                    cola.clear()
+                    break
+                a = cola.popleft()
+                activo[a] = False
+                for mover in movimientos:
+                    examinados += 1
+                    tocados = mover(a)
+                    if tocados:
+                        aplicados += 1
+                        for nodo in tocados:
+                            if not activo[nodo]:
+                                activo[nodo] = True
+                                cola.append(nodo)
+                        break
+            if presupuesto is not None:
+                presupuesto.informar(self.distancia)
+        self.examinados += examinados
+        self.aplicados += aplicados
+        return pasadas
+
+    def ruta_desde(self, inicio=0):
+        """Devuelve el tour como lista cerrada que empieza y termina en `inicio`"""
+        i = self.posicion[inicio]
+        return self.ruta[i:] + self.ruta[:i] + [inicio]
@@ -0,0 +1,276 @@
+"""Caché de soluciones indexada por la huella de la instancia, con expulsión LRU y persistencia opcional.
+
+La clave de una entrada es un hash de las distancias, las demandas, la
+capacidad, el algoritmo y sus parámetros (y de la ruta actual en los métodos
+que la mejoran). Con una caché asignada al problema, cada `resolver_*`
+restaura la solución guardada si la clave ya está, sin resolver. Si no está
+pero hay una solución de una instancia con las mismas distancias (por
+ejemplo, con una demanda distinta), los métodos de mejora a los que no se
+indica la solución inicial arrancan en caliente desde su ruta en lugar de
+construir una nueva.
+
+Uso:
+    cache = CacheSoluciones(max_entradas=256, directorio="cache")
+    tsp.cache = cache
+    tsp.resolver_2opt()     # resuelve y guarda la solución
+    otro.cache = cache
+    otro.resolver_2opt()    # si es la misma instancia, restaura la solución guardada
+"""
+import functools
+import hashlib
+import inspect
+import json
+import os
+import threading
+import weakref
+from array import array
+from collections import OrderedDict
+import numpy as np
+from instrumentacion import sin_contar
+from solucion import RegistroEntregas, Resultado, TIPO_ENTERO, a_json, ruta_compacta
+
+MAX_ENTRADAS = 128
+# Atributos que forman la solución de un problema (los que tenga) y se guardan en cada entrada
+ATRIBUTOS_SOLUCION = ("mejor_ruta_indices", "mejor_distancia", "traza_convergencia", "memoria_pico",
+                      "cota_inferior", "entregas_realizadas", "regresos_almacen", "rutas_flota", "makespan")
+# Parámetros que no influyen en la solución y no forman parte de la clave
+PARAMETROS_EXCLUIDOS = ("cancelacion", "progreso")
+
+# Huella de cada objeto de distancias: se calcula una sola vez aunque se resuelva muchas veces
+_huellas_distancias = weakref.WeakKeyDictionary()
+
+
+def _resumen(*partes):
+    resumen = hashlib.blake2b(digest_size=16)
+    for parte in partes:
+        resumen.update(parte.encode("utf-8") if isinstance(parte, str) else parte)
+        resumen.update(b"\x1f")
+    return resumen.hexdigest()
+
+
+def huella_distancias(distancias):
+    """Hash de unas distancias: de la matriz o, en las euclídeas, de las coordenadas"""
+    distancias = sin_contar(distancias)
+    huella = _huellas_distancias.get(distancias)
+    if huella is None:
+        datos = distancias.coordenadas if hasattr(distancias, "coordenadas") else distancias.datos
+        datos = np.ascontiguousarray(datos)
+        huella = _resumen(type(distancias).__name__, f"{datos.dtype.str}{datos.shape}", datos)
+        _huellas_distancias[distancias] = huella
+    return huella
+
+
+def olvidar_huella(distancias):
+    """Descarta la huella guardada de unas distancias que se han modificado en su sitio"""
+    _huellas_distancias.pop(sin_contar(distancias), None)
+
+
+def huella_instancia(tsp):
+    """Hash de una instancia: distancias y, en la variante con capacidad, demandas y capacidad"""
+    demandas = getattr(tsp, "demandas", None)
+    if demandas is None:
+        return huella_distancias(tsp.distancias)
+    return _resumen(huella_distancias(tsp.distancias), np.ascontiguousarray(demandas, dtype=np.int64),
+                    str(tsp.capacidad_camion))
+
+
+def _parametro_json(valor):
+    """Representación de un parámetro en la clave: los de NumPy como los nativos, el resto con repr"""
+    try:
+        return a_json(valor)
+    except TypeError:
+        return repr(valor)
+
+
+class CacheSoluciones:
+    """Caché LRU de soluciones, con límite de entradas y de bytes y persistencia opcional.
+
+    Cada entrada es la solución serializada en JSON, y su tamaño el de ese
+    texto. Con `directorio` las entradas también se escriben en disco (un
+    fichero por clave) y las que no están en memoria se buscan allí, de modo
+    que la caché sobrevive entre ejecuciones; la expulsión solo afecta a la
+    memoria. Puede compartirse entre hilos.
+    """
+
+    def __init__(self, max_entradas=MAX_ENTRADAS, max_bytes=None, directorio=None):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self.directorio = directorio
+        self.bytes = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.arranques_en_caliente = 0
+        self._entradas = OrderedDict()  # clave -> JSON de la solución, de la menos a la más reciente
+        self._estructuras = {}  # huella de las distancias -> clave de la última solución guardada
+        self._cerrojo = threading.Lock()
+        if directorio is not None:
+            os.makedirs(directorio, exist_ok=True)
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def __contains__(self, clave):
+        return clave in self._entradas or (self.directorio is not None and os.path.exists(self._fichero(clave)))
+
+    def obtener(self, clave):
+        """Solución guardada con esa clave (un diccionario), o None"""
+        with self._cerrojo:
+            datos = self._entradas.get(clave)
+            if datos is not None:
+                self._entradas.move_to_end(clave)
+        if datos is None and self.directorio is not None:
+            datos = self._leer(self._fichero(clave))
+            if datos is not None:
+                self._insertar(clave, datos)
+        return None if datos is None else json.loads(datos)
+
+    def guardar(self, clave, solucion, estructura=None):
+        """Guarda una solución; con `estructura`, queda como punto de partida para esas distancias"""
+        datos = json.dumps(solucion, separators=(",", ":"), default=a_json).encode("utf-8")
+        self._insertar(clave, datos)
+        if estructura is not None:
+            with self._cerrojo:
+                self._estructuras[estructura] = clave
+        if self.directorio is not None:
+            self._escribir(self._fichero(clave), datos)
+            if estructura is not None:
+                self._escribir(self._fichero("estructura-" + estructura), clave.encode("ascii"))
+
+    def solucion_inicial(self, estructura):
+        """Atributos de la última solución guardada para unas distancias, o None"""
+        clave = self._estructuras.get(estructura)
+        if clave is None and self.directorio is not None:
+            datos = self._leer(self._fichero("estructura-" + estructura))
+            clave = None if datos is None else datos.decode("ascii")
+        solucion = None if clave is None else self.obtener(clave)
+        return None if solucion is None else solucion["atributos"]
+
+    def vaciar(self):
+        """Vacía la caché en memoria (los ficheros del directorio se conservan)"""
+        with self._cerrojo:
+            self._entradas.clear()
+            self._estructuras.clear()
+            self.bytes = 0
+
+    def _insertar(self, clave, datos):
+        with self._cerrojo:
+            anterior = self._entradas.pop(clave, None)
+            if anterior is not None:
+                self.bytes -= len(anterior)
+            self._entradas[clave] = datos
+            self.bytes += len(datos)
+            while self._entradas and (len(self._entradas) > self.max_entradas
+                                      or (self.max_bytes is not None and self.bytes > self.max_bytes)):
+                _, expulsada = self._entradas.popitem(last=False)
+                self.bytes -= len(expulsada)
+
+    def _fichero(self, nombre):
+        return os.path.join(self.directorio, nombre + ".json")
+
+    @staticmethod
+    def _leer(ruta_fichero):
+        try:
+            with open(ruta_fichero, "rb") as fichero:
+                return fichero.read()
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _escribir(ruta_fichero, datos):
+        # Se escribe aparte y se renombra, para que un lector nunca vea un fichero a medias
+        temporal = f"{ruta_fichero}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporal, "wb") as fichero:
+            fichero.write(datos)
+        os.replace(temporal, ruta_fichero)
+
+
+def _restaurar(nombre, valor):
+    """Atributo de una solución guardada con su tipo compacto (ver `solucion.py`)"""
+    if nombre == "mejor_ruta_indices":
+        return ruta_compacta(valor)
+    if nombre == "regresos_almacen":
+        return array(TIPO_ENTERO, valor)
+    if nombre == "entregas_realizadas":
+        return RegistroEntregas(*valor)
+    return valor
+
+
+def cacheado(encadena=False):
+    """Decorador de los métodos `resolver_*`: consulta la caché de soluciones del problema antes de resolver.
+
+    Sin caché (`tsp.cache` es None) solo añade la consulta del atributo.
+    `encadena` indica que el método mejora la ruta actual si la hay, así que
+    esta forma parte de la clave. Los métodos que encadenan, si aún no hay
+    ruta, y los que aceptan una ruta en `inicial`, si quien llama no la
+    indica, arrancan en caliente desde la ruta en caché de unas distancias
+    iguales (a estos se les pasa la solución entera, como `Resultado`); una
+    construcción inicial explícita (p. ej. `inicial="clarke_wright"`) se
+    respeta y su solución se guarda con una clave distinta de la del
+    arranque por defecto. Solo se guardan las soluciones completas o
+    detenidas por el límite de tiempo de la propia llamada.
+    """
+    def decorador(metodo):
+        firma = inspect.signature(metodo)
+        acepta_inicial = "inicial" in firma.parameters
+
+        @functools.wraps(metodo)
+        def envoltura(self, *args, **kwargs):
+            cache = self.cache
+            if cache is None:
+                return metodo(self, *args, **kwargs)
+            argumentos = firma.bind(self, *args, **kwargs)
+            # Solo se arranca en caliente si quien llama no ha elegido la construcción inicial
+            en_caliente = ((acepta_inicial and "inicial" not in argumentos.arguments)
+                           or (encadena and self.mejor_ruta_indices is None))
+            argumentos.apply_defaults()
+            parametros = {nombre: valor for nombre, valor in list(argumentos.arguments.items())[1:]
+                          if nombre not in PARAMETROS_EXCLUIDOS}
+            if acepta_inicial and en_caliente:
+                parametros["inicial"] = None  # Por defecto: la ruta en caché, si la hay
+            estructura = _resumen(type(self).__name__, huella_distancias(self.distancias))
+            partes = [estructura, huella_instancia(self), metodo.__name__,
+                      json.dumps(parametros, sort_keys=True, default=_parametro_json)]
+            if encadena and self.mejor_ruta_indices is not None:
+                partes.append(json.dumps(self.mejor_ruta_indices, default=a_json))
+            clave = _resumen(*partes)
+
+            solucion = cache.obtener(clave)
+            if solucion is not None:
+                cache.aciertos += 1
+                self.instrumentacion.contar("aciertos_cache")
+                for nombre, valor in solucion["atributos"].items():
+                    setattr(self, nombre, _restaurar(nombre, valor))
+                if self._presupuesto is None:
+                    self.interrupcion = solucion["interrupcion"]
+                progreso = argumentos.arguments.get("progreso")
+                if progreso is not None:
+                    progreso(self.mejor_distancia, 0.0)
+                return self.resultado()
+            cache.fallos += 1
+
+            inicial = cache.solucion_inicial(estructura) if en_caliente else None
+            if inicial is not None:
+                cache.arranques_en_caliente += 1
+                self.instrumentacion.contar("arranques_en_caliente")
+                ruta = inicial["mejor_ruta_indices"]
+                if acepta_inicial:
+                    # Con su distancia y sus entregas, `construir_inicial` juzga si la ruta adaptada sirve
+                    entregas = inicial.get("entregas_realizadas")
+                    argumentos.arguments["inicial"] = Resultado(
+                        self.etiquetas, ruta_compacta(ruta), inicial["mejor_distancia"],
+                        None if entregas is None else _restaurar("entregas_realizadas", entregas))
+                else:
+                    self.mejor_ruta_indices = ruta_compacta(ruta)
+                    self.mejor_distancia = self.distancia_total(ruta[:-1])
+
+            anidada = self._presupuesto is not None
+            resultado = metodo(*argumentos.args, **argumentos.kwargs)
+            interrupcion = self._presupuesto.interrupcion if anidada else self.interrupcion
+            # Una llamada anidada detenida por el presupuesto de la externa no es una solución completa
+            if (resultado is not None and resultado[1] is not None
+                    and (interrupcion is None or (interrupcion == "tiempo" and not anidada))):
+                atributos = {nombre: getattr(self, nombre) for nombre in ATRIBUTOS_SOLUCION if hasattr(self, nombre)}
+                cache.guardar(clave, {"atributos": atributos, "interrupcion": interrupcion}, estructura)
+            return resultado
+        return envoltura
+    return decorador
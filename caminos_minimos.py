@@ -0,0 +1,189 @@
+"""Caminos mínimos hasta el almacén para los regresos del TSP con capacidad.
+
+Las matrices aleatorias no cumplen la desigualdad triangular: volver al
+almacén pasando por otros nodos puede ser más corto que ir directo. Aquí se
+calcula, una sola vez por instancia, el camino mínimo de cada nodo al
+almacén:
+
+- Floyd–Warshall vectorizado (todos los pares, O(n³)) en matrices pequeñas;
+- Dijkstra hacia el almacén sobre la matriz completa (O(n²) vectorizado) en
+  matrices grandes;
+- Dijkstra sobre el grafo disperso de vecinos más cercanos (más las aristas
+  directas al almacén) en instancias euclídeas, donde no hay matriz.
+"""
+import heapq
+import numpy as np
+from distancias_euclideas import DistanciasEuclideas
+
+# Por encima de este tamaño Floyd–Warshall (O(n³)) deja paso a Dijkstra (O(n²))
+MAX_NODOS_FLOYD_WARSHALL = 300
+
+
+def floyd_warshall(datos):
+    """Distancias mínimas entre todos los pares y matriz de siguientes saltos.
+
+    Cada paso k relaja la matriz completa a la vez con NumPy.
+    `siguiente[i, j]` es el nodo al que se va desde i en el camino mínimo a j.
+    """
+    distancias = np.array(datos, dtype=np.float64)
+    num_nodos = len(distancias)
+    np.fill_diagonal(distancias, 0)
+    siguiente = np.tile(np.arange(num_nodos), (num_nodos, 1))
+    for k in range(num_nodos):
+        por_k = distancias[:, k, None] + distancias[None, k, :]
+        mejora = por_k < distancias
+        # La fila y la columna k no cambian en este paso (la diagonal es 0)
+        np.copyto(distancias, por_k, where=mejora)
+        np.copyto(siguiente, siguiente[:, k, None], where=mejora)
+    return distancias, siguiente
+
+
+def dijkstra_hacia(datos, destino=0):
+    """Camino mínimo de cada nodo hasta `destino` sobre una matriz completa.
+
+    Devuelve (distancia, siguiente). Cada iteración fija el nodo abierto más
+    cercano y relaja de una vez todas las aristas que llegan a él (su columna).
+    """
+    datos = np.asarray(datos)
+    num_nodos = len(datos)
+    distancia = np.full(num_nodos, np.inf)
+    distancia[destino] = 0
+    siguiente = np.full(num_nodos, destino, dtype=np.int64)
+    abiertos = np.ones(num_nodos, dtype=bool)
+    for _ in range(num_nodos):
+        nodo = int(np.argmin(np.where(abiertos, distancia, np.inf)))
+        if not abiertos[nodo]:
+            break
+        abiertos[nodo] = False
+        nuevas = datos[:, nodo] + distancia[nodo]
+        mejora = abiertos & (nuevas < distancia)
+        distancia[mejora] = nuevas[mejora]
+        siguiente[mejora] = nodo
+    return distancia, siguiente
+
+
+def dijkstra_vecinos(distancias, vecinos, destino=0):
+    """Camino mínimo de cada nodo hasta `destino` en el grafo de vecinos más cercanos.
+
+    El grafo tiene las aristas de cada nodo con sus `vecinos` (en ambos
+    sentidos, distancias simétricas) y la arista directa de cada nodo al
+    destino, así que ningún camino es peor que el regreso directo.
+    """
+    num_nodos = len(distancias)
+    origen = np.repeat(np.arange(num_nodos), [len(lista) for lista in vecinos])
+    final = np.fromiter((nodo for lista in vecinos for nodo in lista), dtype=np.int64, count=len(origen))
+    origen, final = np.concatenate((origen, final)), np.concatenate((final, origen))
+    pesos = distancias.pares(origen, final)
+    orden = np.argsort(origen, kind="stable")
+    comienzo = np.searchsorted(origen[orden], np.arange(num_nodos + 1)).tolist()
+    adyacentes = final[orden].tolist()
+    pesos = pesos[orden].tolist()
+
+    distancia = distancias.pares(np.arange(num_nodos), np.full(num_nodos, destino)).tolist()
+    distancia[destino] = 0
+    siguiente = [destino] * num_nodos
+    cerrados = [False] * num_nodos
+    cola = [(d, nodo) for nodo, d in enumerate(distancia)]
+    heapq.heapify(cola)
+    while cola:
+        d, nodo = heapq.heappop(cola)
+        if cerrados[nodo]:
+            continue
+        cerrados[nodo] = True
+        for k in range(comienzo[nodo], comienzo[nodo + 1]):
+            otro = adyacentes[k]
+            nueva = d + pesos[k]
+            if nueva < distancia[otro]:
+                distancia[otro] = nueva
+                siguiente[otro] = nodo
+                heapq.heappush(cola, (nueva, otro))
+    return np.array(distancia), np.array(siguiente, dtype=np.int64)
+
+
+class CaminosAlmacen:
+    """Caminos mínimos de cada nodo hasta el almacén, calculados una vez y guardados.
+
+    `distancia[v]` es el coste del camino mínimo de v al almacén y
+    `siguiente[v]` el siguiente nodo de ese camino: forman un árbol con raíz
+    en el almacén, del que cada camino se reconstruye en O(longitud). Ambos
+    son listas, para consultarlas en O(1) desde los bucles de Python.
+    """
+
+    def __init__(self, distancias, almacen=0, max_nodos_floyd=MAX_NODOS_FLOYD_WARSHALL, k_vecinos=8):
+        self.almacen = almacen
+        if isinstance(distancias, DistanciasEuclideas):
+            self.metodo = "dijkstra_vecinos"
+            distancia, siguiente = dijkstra_vecinos(distancias, distancias.vecinos_cercanos(k_vecinos), almacen)
+        elif len(distancias) <= max_nodos_floyd:
+            self.metodo = "floyd_warshall"
+            todas, siguientes = floyd_warshall(distancias.datos)
+            distancia, siguiente = todas[:, almacen], siguientes[:, almacen]
+        else:
+            self.metodo = "dijkstra"
+            distancia, siguiente = dijkstra_hacia(distancias.datos, almacen)
+        if np.array_equal(distancia, np.floor(distancia)):
+            distancia = distancia.astype(np.int64)
+        self.distancia = distancia.tolist()
+        self.siguiente = siguiente.tolist()
+
+    def relajar(self, distancias, nodos, vecinos=None):
+        """Actualiza los caminos tras añadir nodos al final o acortar aristas de `nodos`.
+
+        Solo sirve cuando las distancias bajan (o aparecen nodos nuevos): se
+        busca un salto mejor para cada nodo de `nodos` y las mejoras se
+        propagan como en Dijkstra a los nodos que llegan a ellos, con su
+        columna de la matriz o, si se dan `vecinos`, solo por la lista de
+        vecinos (el grafo de `dijkstra_vecinos`). El coste es proporcional a
+        los nodos que cambian. Devuelve el conjunto de nodos cuyo camino ha
+        cambiado; si alguna arista se alarga hay que recalcular la instancia.
+        """
+        distancia = self.distancia
+        siguiente = self.siguiente
+        anteriores = len(distancia)
+        for nodo in range(anteriores, len(distancias)):
+            # Un nodo nuevo empieza con el regreso directo
+            distancia.append(distancias[nodo][self.almacen])
+            siguiente.append(self.almacen)
+        cambiados = set(range(anteriores, len(distancias)))
+        cola = [(distancia[nodo], nodo) for nodo in cambiados]
+        for nodo in nodos:
+            if nodo == self.almacen:
+                continue
+            candidatos = np.arange(len(distancias)) if vecinos is None else np.asarray(vecinos[nodo], dtype=np.int64)
+            if len(candidatos) == 0:
+                continue
+            costes = distancias.pares(np.full(len(candidatos), nodo), candidatos) + np.take(distancia, candidatos)
+            k = int(np.argmin(costes))
+            if costes[k] < distancia[nodo]:
+                distancia[nodo] = costes[k].item()
+                siguiente[nodo] = int(candidatos[k])
+                cambiados.add(nodo)
+                cola.append((distancia[nodo], nodo))
+        heapq.heapify(cola)
+        while cola:
+            d, nodo = heapq.heappop(cola)
+            if d > distancia[nodo]:
+                continue
+            if vecinos is None:
+                origenes = np.arange(len(distancias))
+                columna = distancias.datos[:, nodo]
+                costes = columna.astype(np.result_type(columna.dtype, np.int64)) + d
+            else:
+                origenes = np.asarray(vecinos[nodo], dtype=np.int64)
+                costes = distancias.pares(origenes, np.full(len(origenes), nodo)) + d
+            for k in np.flatnonzero(costes < np.take(distancia, origenes)).tolist():
+                otro = int(origenes[k])
+                distancia[otro] = costes[k].item()
+                siguiente[otro] = nodo
+                cambiados.add(otro)
+                heapq.heappush(cola, (distancia[otro], otro))
+        return cambiados
+
+    def camino(self, nodo):
+        """Camino mínimo de `nodo` al almacén, incluidos ambos extremos"""
+        camino = [nodo]
+        siguiente = self.siguiente
+        while nodo != self.almacen:
+            nodo = siguiente[nodo]
+            camino.append(nodo)
+        return camino
@@ -0,0 +1,431 @@
+"""Descomposición en grupos para instancias muy grandes (de 10 000 a 50 000 nodos).
+
+En lugar de tratar toda la instancia como una única ruta:
+
+1. los nodos se reparten en grupos de unos `TAMANO_GRUPO` nodos cercanos:
+   k-medias sobre las coordenadas en las instancias euclídeas y k-medoides
+   sobre la matriz en las demás;
+2. cada grupo se resuelve como una instancia pequeña con los `resolver_*`
+   de siempre, en paralelo en el pool de `ejecutor_compartido` (las
+   distancias se comparten, no se copian en cada tarea);
+3. en el TSP genérico los tours de los grupos se cosen por las aristas de
+   conexión más baratas; con capacidad los viajes de los grupos se juntan
+   tal cual, porque todos salen del almacén y vuelven a él;
+4. una búsqueda local repara las fronteras: solo parte de los nodos que
+   tienen algún vecino cercano en otro grupo (y de los de las costuras).
+
+Con límite de tiempo, `FRACCION_GRUPOS` del que queda es para resolver los
+grupos y el resto para coser y reparar.
+"""
+import math
+import os
+import random
+from concurrent.futures import wait
+import numpy as np
+from distancias_euclideas import DistanciasEuclideas
+from matriz_distancias import MatrizDistancias
+from metaheuristicas import Presupuesto, INTERVALO_PROGRESO
+from multiarranque import ejecutor_compartido, estado_trabajador
+from flota import MejoraViajes
+
+# Nodos por grupo (aproximado: los grupos salen del agrupamiento, no de un corte exacto)
+TAMANO_GRUPO = 500
+MAX_ITERACIONES_AGRUPAMIENTO = 20
+# Parte del tiempo restante para resolver los grupos; el resto es para coser y reparar las fronteras
+FRACCION_GRUPOS = 0.6
+# Por debajo de este número de nodos resolver los grupos en serie es más rápido que arrancar procesos
+MIN_NODOS_PARALELO = 2000
+# Filas de la matriz punto–centro que se calculan a la vez al asignar los puntos en k-medias
+BLOQUE_ASIGNACION = 8192
+# Candidatos a medoide que se prueban por grupo en cada iteración de k-medoides
+MAX_CANDIDATOS_MEDOIDE = 256
+# Pares de nodos que se prueban para coser un tour que no tiene vecinos cercanos en el ya cosido
+MAX_PARES_COSTURA = 1 << 16
+
+
+def _asignar(puntos, centros):
+    """Índice del centro más cercano a cada punto, por bloques para no crear la matriz completa"""
+    etiquetas = np.empty(len(puntos), dtype=np.int64)
+    normas_centros = (centros ** 2).sum(axis=1)
+    for inicio in range(0, len(puntos), BLOQUE_ASIGNACION):
+        bloque = puntos[inicio:inicio + BLOQUE_ASIGNACION]
+        # |p - c|² sin el término |p|², que no cambia el centro más cercano
+        etiquetas[inicio:inicio + len(bloque)] = (normas_centros - 2 * bloque @ centros.T).argmin(axis=1)
+    return etiquetas
+
+
+def _sembrar(num_puntos, k, distancia_a, rng):
+    """Semillas de k-medias++: cada una se elige con probabilidad proporcional al cuadrado de su distancia
+
+    `distancia_a(i)` devuelve la distancia de todos los puntos al punto i.
+    Devuelve las posiciones de las semillas.
+    """
+    semillas = [int(rng.integers(num_puntos))]
+    cercania = np.asarray(distancia_a(semillas[0]), dtype=np.float64) ** 2
+    for _ in range(1, k):
+        total = cercania.sum()
+        elegido = int(rng.integers(num_puntos)) if total == 0 else int(rng.choice(num_puntos, p=cercania / total))
+        semillas.append(elegido)
+        np.minimum(cercania, np.asarray(distancia_a(elegido), dtype=np.float64) ** 2, out=cercania)
+    return semillas
+
+
+def k_medias(puntos, k, rng, max_iteraciones=MAX_ITERACIONES_AGRUPAMIENTO):
+    """Grupo de cada punto (array de coordenadas n × 2) con k-medias de Lloyd e inicialización k-medias++"""
+    puntos = np.asarray(puntos, dtype=np.float64)
+    semillas = _sembrar(len(puntos), k, lambda i: np.hypot(*(puntos - puntos[i]).T), rng)
+    centros = puntos[semillas].copy()
+    etiquetas = None
+    for _ in range(max_iteraciones):
+        nuevas = _asignar(puntos, centros)
+        if etiquetas is not None and np.array_equal(nuevas, etiquetas):
+            break
+        etiquetas = nuevas
+        cuenta = np.bincount(etiquetas, minlength=k)
+        llenos = cuenta > 0
+        for eje in range(2):
+            suma = np.bincount(etiquetas, weights=puntos[:, eje], minlength=k)
+            centros[llenos, eje] = suma[llenos] / cuenta[llenos]
+    return etiquetas
+
+
+def k_medoides(datos, nodos, k, rng, max_iteraciones=MAX_ITERACIONES_AGRUPAMIENTO):
+    """Grupo de cada nodo de `nodos` con k-medoides sobre la matriz `datos`
+
+    Se alterna asignar cada nodo al medoide más cercano y elegir como
+    medoide de cada grupo el nodo con menor suma de distancias al resto
+    (entre una muestra de `MAX_CANDIDATOS_MEDOIDE` en los grupos grandes).
+    """
+    nodos = np.asarray(nodos, dtype=np.int64)
+    medoides = np.array(_sembrar(len(nodos), k, lambda i: datos[nodos, nodos[i]], rng), dtype=np.int64)
+    etiquetas = None
+    for _ in range(max_iteraciones):
+        nuevas = np.asarray(datos[np.ix_(nodos, nodos[medoides])]).argmin(axis=1)
+        if etiquetas is not None and np.array_equal(nuevas, etiquetas):
+            break
+        etiquetas = nuevas
+        orden = np.argsort(etiquetas, kind="stable")
+        cortes = np.flatnonzero(np.diff(etiquetas[orden])) + 1
+        for miembros in np.split(orden, cortes):
+            candidatos = miembros
+            if len(candidatos) > MAX_CANDIDATOS_MEDOIDE:
+                candidatos = rng.choice(miembros, MAX_CANDIDATOS_MEDOIDE, replace=False)
+            sumas = datos[np.ix_(nodos[candidatos], nodos[miembros])].sum(axis=1, dtype=np.float64)
+            medoides[etiquetas[miembros[0]]] = candidatos[sumas.argmin()]
+    return etiquetas
+
+
+def agrupar(distancias, nodos, num_grupos, rng):
+    """Reparte los nodos en como mucho `num_grupos` grupos de nodos cercanos (lista de arrays no vacíos)"""
+    nodos = np.asarray(nodos, dtype=np.int64)
+    num_grupos = max(1, min(num_grupos, len(nodos)))
+    if num_grupos == 1:
+        return [nodos]
+    if isinstance(distancias, DistanciasEuclideas):
+        etiquetas = k_medias(distancias.coordenadas[nodos], num_grupos, rng)
+    else:
+        etiquetas = k_medoides(distancias.datos, nodos, num_grupos, rng)
+    orden = np.argsort(etiquetas, kind="stable")
+    return np.split(nodos[orden], np.flatnonzero(np.diff(etiquetas[orden])) + 1)
+
+
+def subinstancia(distancias, nodos):
+    """Distancias entre los nodos indicados, renumerados 0..len(nodos)-1"""
+    if isinstance(distancias, DistanciasEuclideas):
+        return DistanciasEuclideas(distancias.coordenadas[nodos])
+    return MatrizDistancias(distancias.datos[np.ix_(nodos, nodos)])
+
+
+def _sin_resolver(grupo, variante):
+    """Ruta de un grupo que no se ha llegado a resolver: sus nodos en el orden del grupo"""
+    return grupo if variante == "generico" else [0] + grupo + [0]
+
+
+def resolver_grupo(distancias, grupo, variante, parametros, algoritmo, tiempo_limite=None, semilla=None,
+                   cancelacion=None):
+    """Resuelve un grupo como instancia propia con `resolver_<algoritmo>` y devuelve su ruta en índices globales
+
+    En el TSP genérico es el tour del grupo, sin repetir el primer nodo; con
+    capacidad, una ruta cerrada por el almacén con sus viajes.
+    """
+    if variante == "generico":
+        nodos = list(grupo)
+        if len(nodos) <= 3:
+            return nodos
+        from tsp_generico import TSPGenerico
+        tsp = TSPGenerico(distancias=subinstancia(distancias, nodos), semilla=semilla)
+    else:
+        from tsp_capacidad import TSPCapacidad
+        nodos = [0] + list(grupo)
+        demandas = parametros["demandas"]
+        tsp = TSPCapacidad(capacidad_camion=parametros["capacidad_camion"], demandas=[demandas[nodo] for nodo in nodos],
+                           distancias=subinstancia(distancias, nodos), semilla=semilla)
+    getattr(tsp, "resolver_" + algoritmo)(tiempo_limite=tiempo_limite, cancelacion=cancelacion)
+    if tsp.mejor_ruta_indices is None:
+        return _sin_resolver(list(grupo), variante)
+    ruta = tsp.mejor_ruta_indices[:-1] if variante == "generico" else tsp.mejor_ruta_indices
+    return [nodos[i] for i in ruta]
+
+
+def _resolver_grupo_trabajador(grupo, algoritmo, tiempo_limite, semilla):
+    """Tarea de un proceso trabajador: `resolver_grupo` con las distancias compartidas"""
+    estado = estado_trabajador()
+    return resolver_grupo(estado["distancias"], grupo, estado["variante"], estado["parametros"], algoritmo,
+                          tiempo_limite, semilla)
+
+
+def resolver_grupos(distancias, grupos, variante, parametros, algoritmo, presupuesto, max_procesos=None,
+                    semilla=None):
+    """Resuelve todos los grupos, en paralelo si compensa, y devuelve la ruta de cada uno
+
+    Con límite de tiempo cada grupo recibe su parte de `FRACCION_GRUPOS`
+    del tiempo restante. Si la resolución se cancela (o se agota el tiempo
+    antes de empezar un grupo en serie), los grupos que faltan se quedan
+    con sus nodos en el orden del grupo.
+    """
+    rng = random.Random(semilla)
+    semillas = [rng.getrandbits(64) for _ in grupos]
+    grupos = [grupo.tolist() for grupo in grupos]
+    max_procesos = min(max_procesos or os.cpu_count() or 1, len(grupos))
+    paralelo = max_procesos > 1 and sum(map(len, grupos)) >= MIN_NODOS_PARALELO
+    rondas = math.ceil(len(grupos) / max_procesos) if paralelo else len(grupos)
+    restante = presupuesto.restante()
+    tiempo_grupo = None if restante is None else restante * FRACCION_GRUPOS / rondas
+
+    if not paralelo:
+        rutas = []
+        for grupo, semilla_grupo in zip(grupos, semillas):
+            if presupuesto.agotado(inmediato=True):
+                rutas.append(_sin_resolver(grupo, variante))
+            else:
+                rutas.append(resolver_grupo(distancias, grupo, variante, parametros, algoritmo, tiempo_grupo,
+                                            semilla_grupo, presupuesto.cancelacion))
+        return rutas
+    with ejecutor_compartido(distancias, max_procesos, variante, parametros) as ejecutor:
+        futuros = [ejecutor.submit(_resolver_grupo_trabajador, grupo, algoritmo, tiempo_grupo, semilla_grupo)
+                   for grupo, semilla_grupo in zip(grupos, semillas)]
+        pendientes = set(futuros)
+        while pendientes and not presupuesto.agotado(inmediato=True):
+            # Se espera por intervalos para atender una cancelación
+            _, pendientes = wait(pendientes, INTERVALO_PROGRESO)
+        return [futuro.result() if futuro.done() else _sin_resolver(grupo, variante)
+                for grupo, futuro in zip(grupos, futuros)]
+
+
+def _pares_entre_grupos(grupo_de, vecinos):
+    """Pares (x, u) de nodos vecinos de grupos distintos, en los dos sentidos, agrupados por el grupo de x"""
+    vecinos = np.asarray(vecinos, dtype=np.int64)
+    x = np.repeat(np.arange(len(vecinos)), vecinos.shape[1])
+    u = vecinos.ravel()
+    distintos = grupo_de[x] != grupo_de[u]
+    x, u = np.concatenate((x[distintos], u[distintos])), np.concatenate((u[distintos], x[distintos]))
+    orden = np.argsort(grupo_de[x], kind="stable")
+    x, u = x[orden], u[orden]
+    limites = np.searchsorted(grupo_de[x], np.arange(grupo_de.max() + 2))
+    return x, u, limites
+
+
+def nodos_frontera(grupo_de, vecinos):
+    """Nodos con algún vecino cercano en otro grupo"""
+    vecinos = np.asarray(vecinos, dtype=np.int64)
+    return np.flatnonzero((grupo_de[vecinos] != grupo_de[:, None]).any(axis=1))
+
+
+def coser_tours(distancias, tours, grupo_de, vecinos, rng):
+    """Une los tours de los grupos en un único tour y devuelve (ruta cerrada desde el nodo 0, nodos cosidos)
+
+    Los tours se insertan uno a uno, empezando por el del grupo del nodo 0 y
+    siguiendo por los grupos vecinos de los ya cosidos. Cada inserción rompe
+    una arista (x, y) del tour del grupo y otra (u, v) del tour cosido y une
+    sus extremos (u con x e y con v, o al revés), eligiendo entre los pares
+    (x, u) de vecinos cercanos el que menos alarga el total. Si el grupo no
+    tiene vecinos en el tour cosido se prueba con una muestra de pares.
+    Las distancias deben ser simétricas.
+    """
+    n = len(grupo_de)
+    siguiente = np.full(n, -1, dtype=np.int64)
+    anterior = np.full(n, -1, dtype=np.int64)
+    posicion = np.empty(n, dtype=np.int64)
+    tours = [np.asarray(tour, dtype=np.int64) for tour in tours]
+    for tour in tours:
+        posicion[tour] = np.arange(len(tour))
+    pares_x, pares_u, limites = _pares_entre_grupos(grupo_de, vecinos)
+
+    # Orden de inserción: recorrido en anchura de los grupos unidos por pares de vecinos
+    inicial = int(grupo_de[0])
+    adyacentes = [set() for _ in tours]
+    for g, h in set(zip(grupo_de[pares_x].tolist(), grupo_de[pares_u].tolist())):
+        adyacentes[g].add(h)
+    orden = [inicial]
+    visto = [False] * len(tours)
+    visto[inicial] = True
+    for g in orden:
+        for h in sorted(adyacentes[g]):
+            if not visto[h]:
+                visto[h] = True
+                orden.append(h)
+    orden.extend(g for g in range(len(tours)) if not visto[g])
+
+    tour = tours[inicial]
+    siguiente[tour] = np.roll(tour, -1)
+    anterior[tour] = np.roll(tour, 1)
+    en_tour = np.zeros(n, dtype=bool)
+    en_tour[tour] = True
+    cosidos = []
+    for g in orden[1:]:
+        tour = tours[g]
+        m = len(tour)
+        xs, us = pares_x[limites[g]:limites[g + 1]], pares_u[limites[g]:limites[g + 1]]
+        dentro = en_tour[us]
+        xs, us = xs[dentro], us[dentro]
+        if len(xs) == 0:
+            muestra_x = tour if m <= 64 else rng.choice(tour, 64, replace=False)
+            muestra_u = np.flatnonzero(en_tour)
+            if len(muestra_u) > MAX_PARES_COSTURA // len(muestra_x):
+                muestra_u = rng.choice(muestra_u, MAX_PARES_COSTURA // len(muestra_x), replace=False)
+            xs = np.repeat(muestra_x, len(muestra_u))
+            us = np.tile(muestra_u, len(muestra_x))
+        vs = siguiente[us]
+        ws = anterior[us]
+        pos = posicion[xs]
+        y_sig = tour[(pos + 1) % m]
+        y_ant = tour[(pos - 1) % m]
+        d = distancias.pares
+        ux = d(us, xs).astype(np.float64)
+        uv = d(us, vs)
+        wu = d(ws, us)
+        x_sig = d(xs, y_sig)
+        x_ant = d(xs, y_ant)
+        aumentos = np.stack([
+            ux + d(y_sig, vs) - uv - x_sig,   # u -> x (hacia atrás) ... y_sig -> v
+            ux + d(y_ant, vs) - uv - x_ant,   # u -> x (hacia delante) ... y_ant -> v
+            ux + d(ws, y_sig) - wu - x_sig,   # w -> y_sig (hacia delante) ... x -> u
+            ux + d(ws, y_ant) - wu - x_ant,   # w -> y_ant (hacia atrás) ... x -> u
+        ])
+        opcion, k = np.unravel_index(aumentos.argmin(), aumentos.shape)
+        u, p = int(us[k]), int(pos[k])
+        pasos = np.arange(m)
+        if opcion == 0:
+            camino, izquierda, derecha = tour[(p - pasos) % m], u, int(vs[k])
+        elif opcion == 1:
+            camino, izquierda, derecha = tour[(p + pasos) % m], u, int(vs[k])
+        elif opcion == 2:
+            camino, izquierda, derecha = tour[(p + 1 + pasos) % m], int(ws[k]), u
+        else:
+            camino, izquierda, derecha = tour[(p - 1 - pasos) % m], int(ws[k]), u
+        siguiente[camino[:-1]] = camino[1:]
+        anterior[camino[1:]] = camino[:-1]
+        siguiente[izquierda] = camino[0]
+        anterior[camino[0]] = izquierda
+        siguiente[camino[-1]] = derecha
+        anterior[derecha] = camino[-1]
+        en_tour[tour] = True
+        cosidos.extend((izquierda, derecha, int(camino[0]), int(camino[-1])))
+
+    ruta = [0] * (n + 1)
+    nodo = 0
+    siguiente = siguiente.tolist()
+    for i in range(1, n + 1):
+        nodo = siguiente[nodo]
+        ruta[i] = nodo
+    return ruta, cosidos
+
+
+def descomponer_tsp(distancias, vecinos, tamano_grupo=TAMANO_GRUPO, algoritmo="3opt", max_procesos=None,
+                    semilla=None, presupuesto=None):
+    """Tour del TSP genérico por grupos, sin reparar: devuelve (ruta cerrada desde el nodo 0, nodos de frontera)"""
+    if presupuesto is None:
+        presupuesto = Presupuesto(evaluaciones_defecto=None)
+    rng = np.random.default_rng(semilla)
+    n = len(distancias)
+    grupos = agrupar(distancias, np.arange(n), math.ceil(n / tamano_grupo), rng)
+    tours = resolver_grupos(distancias, grupos, "generico", {}, algoritmo, presupuesto, max_procesos, semilla)
+    grupo_de = np.empty(n, dtype=np.int64)
+    for g, grupo in enumerate(grupos):
+        grupo_de[grupo] = g
+    ruta, cosidos = coser_tours(distancias, tours, grupo_de, vecinos, rng)
+    frontera = np.union1d(nodos_frontera(grupo_de, vecinos), cosidos)
+    return ruta, frontera.tolist()
+
+
+def descomponer_capacidad(distancias, demandas, capacidad, regreso, vecinos, tamano_grupo=TAMANO_GRUPO,
+                          algoritmo="greedy", max_procesos=None, semilla=None, presupuesto=None):
+    """Viajes del TSP con capacidad por grupos de clientes, reparados en las fronteras
+
+    Devuelve (viajes, nodos, cantidades) como `resolver_flota`, sin los
+    vehículos: los viajes son listas de pedidos y `nodos[p]` y
+    `cantidades[p]` dicen a qué nodo va el pedido p y cuánto lleva. La
+    reparación aplica los movimientos entre viajes de `MejoraViajes` a
+    partir de los pedidos de nodos de frontera. Encadenados en el orden
+    devuelto, los viajes son los que entrega esa ruta con `evaluar_ruta`.
+    """
+    if presupuesto is None:
+        presupuesto = Presupuesto()
+    rng = np.random.default_rng(semilla)
+    clientes = [nodo for nodo in range(1, len(demandas)) if demandas[nodo] > 0]
+    if not clientes:
+        return [], [], []
+    grupos = agrupar(distancias, clientes, math.ceil(len(clientes) / tamano_grupo), rng)
+    parametros = {"demandas": list(demandas), "capacidad_camion": capacidad}
+    rutas = resolver_grupos(distancias, grupos, "capacidad", parametros, algoritmo, presupuesto, max_procesos,
+                            semilla)
+    nodos, cantidades, viajes = pedidos_de_rutas(rutas, demandas, capacidad)
+
+    # El almacén y los nodos sin demanda no son de ningún grupo
+    grupo_de = np.full(len(demandas), -1, dtype=np.int64)
+    for g, grupo in enumerate(grupos):
+        grupo_de[grupo] = g
+    frontera = np.zeros(len(demandas), dtype=bool)
+    frontera[nodos_frontera(grupo_de, vecinos)] = True
+    motor = MejoraViajes(viajes, [0] * len(viajes), [capacidad], nodos, cantidades, distancias, regreso, vecinos,
+                         makespan=False)
+    motor.mejorar(presupuesto, random.Random(semilla), [p for p, nodo in enumerate(nodos) if frontera[nodo]])
+    return [motor.viajes[t] for t in motor.ajustar_a_ruta()], nodos, cantidades
+
+
+def pedidos_de_rutas(rutas, demandas, capacidad):
+    """Viajes de pedidos de varias rutas con capacidad sobre las mismas demandas
+
+    Cada visita entrega lo que puede, como en `evaluar_ruta`, y si el camión
+    llega vacío a un nodo empieza allí un viaje nuevo. Lo que quede pendiente
+    al final de una ruta (por ejemplo, en una lista de nodos sin pasos por
+    el almacén) se entrega en viajes adicionales. Devuelve (nodos,
+    cantidades, viajes).
+    """
+    pendientes = list(demandas)
+    nodos = []
+    cantidades = []
+    viajes = []
+    viaje = []
+    carga = capacidad
+
+    def entregar(nodo):
+        nonlocal viaje, carga
+        if carga == 0:
+            viajes.append(viaje)
+            viaje = []
+            carga = capacidad
+        cantidad = min(carga, pendientes[nodo])
+        viaje.append(len(nodos))
+        nodos.append(nodo)
+        cantidades.append(cantidad)
+        pendientes[nodo] -= cantidad
+        carga -= cantidad
+
+    for ruta in rutas:
+        for nodo in ruta:
+            if nodo == 0:
+                if viaje:
+                    viajes.append(viaje)
+                    viaje = []
+                carga = capacidad
+            elif pendientes[nodo] > 0:
+                entregar(nodo)
+        for nodo in ruta:
+            while pendientes[nodo] > 0:
+                entregar(nodo)
+        if viaje:
+            viajes.append(viaje)
+            viaje = []
+        carga = capacidad
+    return nodos, cantidades, viajes
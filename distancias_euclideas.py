@@ -0,0 +1,111 @@
+import math
+import numpy as np
+from indice_espacial import ArbolKD, RejillaEspacial
+from matriz_distancias import tipo_compacto
+
+
+class FilaEuclidea:
+    """Fila `i` de una matriz euclídea implícita: `fila[j]` calcula la distancia al vuelo"""
+
+    __slots__ = ("xs", "ys", "x", "y")
+
+    def __init__(self, xs, ys, i):
+        self.xs = xs
+        self.ys = ys
+        self.x = xs[i]
+        self.y = ys[i]
+
+    def __len__(self):
+        return len(self.xs)
+
+    def __getitem__(self, j):
+        return int(math.hypot(self.xs[j] - self.x, self.ys[j] - self.y) + 0.5)
+
+
+class DistanciasEuclideas:
+    """Distancias euclídeas entre nodos con coordenadas, calculadas bajo demanda.
+
+    Tiene la misma interfaz que `MatrizDistancias` (`matriz[i][j]`, `fila`,
+    `pares`, `mas_cercano`, `buscador`, `vecinos_cercanos`) pero no guarda la
+    matriz: ocupa O(n) en vez de O(n²), lo que permite instancias de cientos de
+    miles de nodos. Las distancias se redondean al entero más cercano, como en
+    TSPLIB (EUC_2D). El más cercano entre los nodos aún disponibles se busca
+    con un `ArbolKD` y las listas de vecinos con una `RejillaEspacial`.
+    """
+
+    def __init__(self, coordenadas):
+        coordenadas = np.asarray(coordenadas, dtype=np.float64)
+        if coordenadas.ndim != 2 or coordenadas.shape[1] != 2:
+            raise ValueError("Las coordenadas deben ser una lista de pares (x, y)")
+        self.coordenadas = np.ascontiguousarray(coordenadas)
+        self.x = self.coordenadas[:, 0].copy()
+        self.y = self.coordenadas[:, 1].copy()
+        self._xs = self.x.tolist()
+        self._ys = self.y.tolist()
+        self.num_nodos = len(self.coordenadas)
+        self._datos = None
+        self._rejilla = None
+        # (fichero, desplazamiento) si las coordenadas se han proyectado desde un fichero binario
+        self.origen = None
+
+    @classmethod
+    def aleatoria(cls, num_nodos, lado=1000, semilla=None):
+        """Genera nodos con coordenadas uniformes en un cuadrado de `lado` km"""
+        rng = np.random.default_rng(semilla)
+        return cls(rng.uniform(0, lado, size=(num_nodos, 2)))
+
+    def __len__(self):
+        return self.num_nodos
+
+    def __getitem__(self, i):
+        return FilaEuclidea(self._xs, self._ys, i)
+
+    def fila(self, i):
+        """Devuelve las distancias del nodo `i` a todos los nodos como array de NumPy"""
+        return self.pares(np.full(self.num_nodos, i), np.arange(self.num_nodos))
+
+    def pares(self, i, j):
+        """Distancias entre los nodos `i[k]` y `j[k]` (arrays de índices), vectorizado"""
+        i = np.asarray(i)
+        j = np.asarray(j)
+        distancias = np.hypot(self.x[i] - self.x[j], self.y[i] - self.y[j])
+        return np.floor(distancias + 0.5).astype(np.int64)
+
+    @property
+    def datos(self):
+        """Matriz completa, calculada y guardada la primera vez que se pide (O(n²) en memoria).
+
+        Solo la necesitan los algoritmos exactos para instancias pequeñas; el
+        resto usa `pares`, `fila` y los índices espaciales.
+        """
+        if self._datos is None:
+            indices = np.arange(self.num_nodos)
+            completa = self.pares(indices[:, None], indices[None, :])
+            self._datos = completa.astype(tipo_compacto(int(completa.max()) if completa.size else 0))
+        return self._datos
+
+    def mas_cercano(self, nodo, disponibles):
+        """Devuelve el nodo disponible más cercano a `nodo`, o None (búsqueda lineal vectorizada)"""
+        candidatos = np.flatnonzero(disponibles)
+        if len(candidatos) == 0:
+            return None
+        distancias = (self.x[candidatos] - self.x[nodo]) ** 2 + (self.y[candidatos] - self.y[nodo]) ** 2
+        return int(candidatos[distancias.argmin()])
+
+    def es_simetrica(self):
+        """Siempre: d(i, j) = d(j, i)"""
+        return True
+
+    def buscador(self, disponibles):
+        """Índice de los nodos disponibles para consultas repetidas del más cercano, con retirada"""
+        return ArbolKD(self.x, self.y, disponibles)
+
+    def vecinos_cercanos(self, k):
+        """Devuelve, para cada nodo, sus k vecinos más cercanos ordenados por distancia"""
+        if self._rejilla is None:
+            self._rejilla = RejillaEspacial(self.x, self.y)
+        return self._rejilla.vecinos_cercanos(k)
+
+    def con_nodo(self, coordenada):
+        """Nuevas distancias con un nodo más al final, en `coordenada` (x, y); O(n)"""
+        return DistanciasEuclideas(np.vstack((self.coordenadas, np.asarray(coordenada, dtype=np.float64)[None, :])))
@@ -0,0 +1,80 @@
+"""División óptima de una ruta gigante en viajes (Split), para el TSP con capacidad.
+
+Estrategia "ruta primero, viajes después": se construye un tour por todos
+los nodos sin tener en cuenta la capacidad y después se corta en viajes
+que salen del almacén y vuelven a él. Para un orden de visita fijo, los
+cortes óptimos son un camino mínimo en un grafo acíclico: el nodo j está
+unido con el i < j si los clientes i+1..j caben en un mismo viaje, con el
+coste de ese viaje. Como un viaje no puede llevar más que la capacidad,
+desde cada i solo hay k arcos (los clientes que caben), y el camino
+mínimo se calcula en O(n·k) recorriendo los nodos en orden.
+"""
+import numpy as np
+from ahorros import dividir_demandas
+
+
+def dividir_ruta(orden, distancias, cargas, capacidad, regreso):
+    """Corta un orden de clientes en viajes consecutivos de coste total mínimo.
+
+    `cargas[nodo]` es lo que hay que llevar a cada cliente (como mucho
+    `capacidad`) y `regreso[nodo]` el coste de volver al almacén desde él.
+    Un viaje cuesta la salida directa del almacén al primer cliente, las
+    aristas entre clientes consecutivos y el regreso desde el último.
+    Devuelve (viajes, coste), con los viajes como listas de nodos sin el
+    almacén.
+    """
+    m = len(orden)
+    if m == 0:
+        return [], 0
+    indices = np.asarray(orden, dtype=np.int64)
+    salida = distancias.pares(np.zeros(m, dtype=np.int64), indices).tolist()
+    interior = distancias.pares(indices[:-1], indices[1:]).tolist()
+    carga = [cargas[nodo] for nodo in orden]
+    llegada = [regreso[nodo] for nodo in orden]
+
+    # costes[j]: coste mínimo de servir los j primeros clientes; previo[j]: dónde empieza su último viaje
+    costes = [0] + [float('inf')] * m
+    previo = [0] * (m + 1)
+    for i in range(m):
+        base = costes[i]
+        carga_viaje = 0
+        coste_viaje = salida[i]
+        for j in range(i, m):
+            carga_viaje += carga[j]
+            if carga_viaje > capacidad:
+                break
+            if j > i:
+                coste_viaje += interior[j - 1]
+            total = base + coste_viaje + llegada[j]
+            if total < costes[j + 1]:
+                costes[j + 1] = total
+                previo[j + 1] = i
+
+    viajes = []
+    j = m
+    while j > 0:
+        i = previo[j]
+        viajes.append(list(orden[i:j]))
+        j = i
+    viajes.reverse()
+    return viajes, costes[m]
+
+
+def viajes_de_ruta_gigante(ruta_indices, distancias, demandas, capacidad, regreso):
+    """Viajes de una ruta gigante (tour cerrado por todos los nodos que pasa por el almacén).
+
+    Las demandas mayores que la capacidad se sirven antes con viajes
+    dedicados de carga completa (como en `clarke_wright`) y el resto se
+    divide con `dividir_ruta`. El tour se prueba en los dos sentidos, porque
+    la salida es directa y el regreso va por el camino mínimo, y se queda
+    el más corto. Devuelve la lista de viajes, con los dedicados primero.
+    """
+    dedicados, cargas = dividir_demandas(demandas, capacidad)
+    corte = list(ruta_indices).index(0)
+    orden = [nodo for nodo in list(ruta_indices[corte + 1:]) + list(ruta_indices[:corte])
+             if nodo != 0 and cargas[nodo] > 0]
+    viajes, coste = dividir_ruta(orden, distancias, cargas, capacidad, regreso)
+    viajes_inversos, coste_inverso = dividir_ruta(orden[::-1], distancias, cargas, capacidad, regreso)
+    if coste_inverso < coste:
+        viajes = viajes_inversos
+    return [[nodo] for nodo in dedicados] + viajes
@@ -0,0 +1,182 @@
+import heapq
+
+
+class EvaluadorIncremental:
+    """Evaluación incremental de intercambios de visitas en una ruta con capacidad.
+
+    Guarda, para la ruta actual, la cantidad entregada en cada posición, las
+    posiciones de las visitas a cada nodo y los límites de cada viaje (tramo
+    entre dos pasos por el almacén). Con eso un intercambio de dos visitas se
+    valora así:
+
+    - la variación de distancia sale de las aristas vecinas a las dos
+      posiciones, en O(1);
+    - las entregas solo se vuelven a simular en los viajes de ambas
+      posiciones y, en cascada, en los viajes posteriores que visitan nodos
+      cuyo total entregado haya cambiado (entregas parciales repartidas en
+      varios viajes). Así se sabe si queda demanda sin atender.
+
+    Las aristas que llegan al almacén cuestan `regreso[nodo]` (el camino
+    mínimo de regreso); sin esa lista, el regreso directo.
+    """
+
+    def __init__(self, ruta_indices, distancias, demandas, capacidad, regreso=None):
+        self.ruta = list(ruta_indices)
+        self.distancias = distancias
+        self.regreso = list(regreso) if regreso is not None else [distancias[v][0] for v in range(len(distancias))]
+        self.demandas = demandas
+        self.capacidad = capacidad
+        n = len(self.ruta)
+
+        # Los pasos por el almacén no se mueven: los límites de viaje son fijos
+        self.inicio_viaje = [0] * n
+        self.fin_viaje = [n - 1] * n
+        ultimo_almacen = 0
+        for p, nodo in enumerate(self.ruta):
+            if nodo == 0:
+                ultimo_almacen = p
+            self.inicio_viaje[p] = ultimo_almacen
+        siguiente_almacen = n - 1
+        for p in range(n - 1, -1, -1):
+            if self.ruta[p] == 0:
+                siguiente_almacen = p
+            self.fin_viaje[p] = siguiente_almacen
+        self.clientes = [p for p, nodo in enumerate(self.ruta) if nodo != 0]
+
+        self.visitas = {}
+        for p in self.clientes:
+            self.visitas.setdefault(self.ruta[p], []).append(p)
+
+        self.entregado = [0] * n
+        entregas, pendiente = self._simular(0, n - 1, {})
+        self.entregado[1:n - 1] = entregas
+        self.faltante = sum(self.demandas[nodo] for nodo in range(1, len(self.demandas))
+                            if nodo not in pendiente) + sum(pendiente.values())
+        ruta = self.ruta
+        regreso = self.regreso
+        self.distancia = sum(regreso[ruta[p]] if ruta[p + 1] == 0 else distancias[ruta[p]][ruta[p + 1]]
+                             for p in range(n - 1))
+        self._propuesta = None
+
+    def _pendiente_antes(self, nodo, posicion):
+        """Demanda del nodo aún sin entregar al llegar a `posicion`"""
+        return self.demandas[nodo] - sum(self.entregado[p] for p in self.visitas.get(nodo, ()) if p < posicion)
+
+    def _simular(self, desde, hasta, cambios):
+        """Simula las entregas entre las posiciones `desde` y `hasta` (exclusivas).
+
+        `desde` debe ser un paso por el almacén. `cambios` sustituye el nodo de
+        algunas posiciones. Devuelve las cantidades entregadas en cada posición
+        y la demanda pendiente final de cada nodo visitado en el tramo.
+        """
+        ruta = self.ruta
+        capacidad = self.capacidad
+        carga = capacidad
+        pendiente = {}
+        entregas = []
+        for p in range(desde + 1, hasta):
+            nodo = cambios.get(p, ruta[p])
+            if nodo == 0:
+                carga = capacidad
+                entregas.append(0)
+                continue
+            if nodo not in pendiente:
+                pendiente[nodo] = self._pendiente_antes(nodo, desde)
+            cantidad = carga if carga < pendiente[nodo] else pendiente[nodo]
+            pendiente[nodo] -= cantidad
+            carga -= cantidad
+            entregas.append(cantidad)
+        return entregas, pendiente
+
+    def delta_intercambio(self, i, j):
+        """Variación de distancia al intercambiar las visitas de las posiciones i < j, en O(1)"""
+        ruta = self.ruta
+        d = self.distancias
+        r = self.regreso
+        a = ruta[i]
+        b = ruta[j]
+        if a == b:
+            return 0
+        # Solo las aristas hacia la posición siguiente pueden llegar al almacén
+        tras_j = ruta[j + 1]
+        if j == i + 1:
+            antes = d[ruta[i - 1]][a] + d[a][b] + (r[b] if tras_j == 0 else d[b][tras_j])
+            despues = d[ruta[i - 1]][b] + d[b][a] + (r[a] if tras_j == 0 else d[a][tras_j])
+        else:
+            tras_i = ruta[i + 1]
+            antes = (d[ruta[i - 1]][a] + (r[a] if tras_i == 0 else d[a][tras_i])
+                     + d[ruta[j - 1]][b] + (r[b] if tras_j == 0 else d[b][tras_j]))
+            despues = (d[ruta[i - 1]][b] + (r[b] if tras_i == 0 else d[b][tras_i])
+                       + d[ruta[j - 1]][a] + (r[a] if tras_j == 0 else d[a][tras_j]))
+        return despues - antes
+
+    def intercambio_factible(self, i, j):
+        """Indica si el intercambio de las posiciones i < j no deja más demanda sin atender.
+
+        Se vuelven a simular los viajes de i y de j y, en cascada, solo los
+        viajes posteriores que visitan algún nodo cuyo total entregado haya
+        cambiado; el resto de viajes entrega exactamente lo mismo que antes.
+        """
+        ruta = self.ruta
+        entregado = self.entregado
+        capacidad = self.capacidad
+        cambios = {i: ruta[j], j: ruta[i]}
+        # diferencia[nodo] = entregado nuevo - entregado anterior hasta el punto simulado
+        diferencia = {}
+        nuevas = {}
+        cola = sorted({self.inicio_viaje[i], self.inicio_viaje[j]})
+        ultimo = -1
+        while cola:
+            inicio = heapq.heappop(cola)
+            if inicio <= ultimo:
+                continue
+            ultimo = inicio
+            fin = self.fin_viaje[inicio + 1]
+            carga = capacidad
+            tocados = set()
+            for p in range(inicio + 1, fin):
+                nodo = cambios.get(p, ruta[p])
+                pendiente = self._pendiente_antes(nodo, p) - diferencia.get(nodo, 0)
+                cantidad = carga if carga < pendiente else pendiente
+                carga -= cantidad
+                nuevas[p] = cantidad
+                diferencia[nodo] = diferencia.get(nodo, 0) + cantidad
+                diferencia[ruta[p]] = diferencia.get(ruta[p], 0) - entregado[p]
+                tocados.add(nodo)
+                tocados.add(ruta[p])
+            # Un nodo con reparto distinto obliga a simular el viaje de su siguiente visita
+            for nodo in tocados:
+                if diferencia[nodo]:
+                    for p in self.visitas[nodo]:
+                        if p > fin and p not in cambios:
+                            heapq.heappush(cola, self.inicio_viaje[p])
+                            break
+
+        faltante = self.faltante - sum(diferencia.values())
+        if faltante > self.faltante:
+            return False
+        self._propuesta = (i, j, nuevas, faltante)
+        return True
+
+    def aplicar_intercambio(self, i, j, delta=None):
+        """Aplica el intercambio de las posiciones i < j (evaluado antes con `intercambio_factible`)"""
+        if delta is None:
+            delta = self.delta_intercambio(i, j)
+        if self._propuesta is None or self._propuesta[:2] != (i, j):
+            if not self.intercambio_factible(i, j):
+                raise ValueError("El intercambio deja demanda sin atender")
+        _, _, nuevas, faltante = self._propuesta
+        self._propuesta = None
+
+        ruta = self.ruta
+        a = ruta[i]
+        b = ruta[j]
+        ruta[i] = b
+        ruta[j] = a
+        if a != b:
+            self.visitas[a] = sorted(j if p == i else p for p in self.visitas[a])
+            self.visitas[b] = sorted(i if p == j else p for p in self.visitas[b])
+        for p, cantidad in nuevas.items():
+            self.entregado[p] = cantidad
+        self.faltante = faltante
+        self.distancia += delta
@@ -0,0 +1,703 @@
+"""Modo flota del TSP con capacidad: varios vehículos, cada uno con su capacidad.
+
+La demanda se reparte en pedidos (una demanda mayor que la capacidad del
+vehículo más grande se parte en cargas completas más un resto). Cada
+vehículo hace uno o varios viajes desde el almacén, cada uno dentro de su
+capacidad. La solución se construye en tres fases:
+
+1. construcción simultánea de los viajes de todos los vehículos por vecino
+   más cercano, avanzando siempre el que lleva menos distancia;
+2. mejora de los viajes de cada vehículo por separado (2-opt en cada viaje
+   y movimientos entre sus viajes), en paralelo, un vehículo por tarea;
+3. mejora conjunta con movimientos entre viajes de vehículos distintos
+   (recolocar, intercambiar y 2-opt*), evaluados en O(1) sobre listas de
+   vecinos. Un movimiento solo se acepta si reduce la distancia total sin
+   alargar la jornada del vehículo más cargado (makespan).
+
+Las aristas que llegan al almacén cuestan el camino mínimo de regreso.
+"""
+import heapq
+import os
+import random
+from concurrent.futures import wait
+import numpy as np
+from ahorros import dividir_demandas
+from metaheuristicas import Presupuesto, INTERVALO_PROGRESO
+from multiarranque import ejecutor_compartido, estado_trabajador
+
+# Por debajo de este número de pedidos la mejora por vehículo no compensa el arranque de procesos
+MIN_PEDIDOS_PARALELO = 400
+
+# Veces que `ajustar_a_ruta` puede pasar un mismo viaje al final de la ruta antes de darlo por parte de un ciclo
+MAX_EMPUJES = 3
+
+
+def crear_pedidos(demandas, capacidades):
+    """Divide las demandas en pedidos (nodo, cantidad) que quepan en el vehículo más grande"""
+    capacidad_maxima = max(capacidades)
+    dedicados, restantes = dividir_demandas(demandas, capacidad_maxima)
+    nodos = dedicados + [nodo for nodo in range(1, len(demandas)) if restantes[nodo] > 0]
+    cantidades = [capacidad_maxima] * len(dedicados) + [restantes[nodo] for nodo in range(1, len(demandas))
+                                                         if restantes[nodo] > 0]
+    return nodos, cantidades
+
+
+def construir_en_paralelo(distancias, nodos, cantidades, capacidades, regreso):
+    """Construye a la vez los viajes de todos los vehículos por vecino más cercano.
+
+    Avanza siempre el vehículo que lleva menos distancia recorrida: va al
+    pedido pendiente más cercano que cabe en su carga restante o, si no cabe
+    ninguno, vuelve al almacén a recargar. Así la jornada de los vehículos
+    queda equilibrada desde la construcción. Devuelve los viajes (listas de
+    pedidos) de cada vehículo.
+    """
+    nodos_pedido = np.asarray(nodos, dtype=np.int64)
+    cantidades_pedido = np.asarray(cantidades)
+    activos = np.ones(len(nodos_pedido), dtype=bool)
+    viajes = [[] for _ in capacidades]
+    actual = [0] * len(capacidades)
+    carga = list(capacidades)
+    abierto = [[] for _ in capacidades]
+    cola = [(0, v) for v in range(len(capacidades))]
+    while activos.any() and cola:
+        recorrido, v = heapq.heappop(cola)
+        candidatos = np.flatnonzero(activos & (cantidades_pedido <= carga[v]))
+        if len(candidatos) == 0:
+            if not abierto[v]:
+                # Vacío en el almacén y sin nada que le quepa: el resto es para vehículos mayores
+                continue
+            viajes[v].append(abierto[v])
+            recorrido += regreso[actual[v]]
+            abierto[v] = []
+            actual[v] = 0
+            carga[v] = capacidades[v]
+        else:
+            costes = distancias.pares(np.full(len(candidatos), actual[v]), nodos_pedido[candidatos])
+            elegido = int(candidatos[np.argmin(costes)])
+            activos[elegido] = False
+            abierto[v].append(elegido)
+            carga[v] -= int(cantidades_pedido[elegido])
+            actual[v] = int(nodos_pedido[elegido])
+            recorrido += int(costes.min())
+        heapq.heappush(cola, (recorrido, v))
+    for v, viaje in enumerate(abierto):
+        if viaje:
+            viajes[v].append(viaje)
+    return viajes
+
+
+class MejoraViajes:
+    """Búsqueda local sobre los viajes de uno o varios vehículos.
+
+    Cada viaje es una lista de pedidos que sale del almacén y vuelve a él sin
+    superar la capacidad de su vehículo. Para cada pedido se prueban, con los
+    pedidos de los nodos de su lista de vecinos en otros viajes:
+
+    - recolocarlo justo antes o después del vecino;
+    - intercambiarlo con el vecino;
+    - 2-opt*: unir el principio de su viaje con el final del viaje del
+      vecino (desde el vecino) y al revés.
+
+    Los tres se valoran en O(1) con las aristas que cambian; la carga de los
+    tramos sale de las sumas acumuladas de cada viaje. Con `makespan` se
+    rechazan los movimientos entre vehículos que dejan a alguno con una
+    jornada más larga que la mayor actual.
+
+    Ningún movimiento deja en medio de un viaje dos pedidos del mismo nodo:
+    la ruta que encadena los viajes entrega en cada visita lo que puede, así
+    que un nodo repartido en varios pedidos solo se entrega como dicen si
+    todos menos uno van al final de su viaje (ver `ajustar_a_ruta`).
+
+    Los pedidos también pueden quitarse (`quitar`) e insertarse (`insertar`)
+    sobre la marcha, para reparar una solución cuando cambia la instancia
+    (ver `reoptimizacion.py`).
+    """
+
+    def __init__(self, viajes, vehiculo_de_viaje, capacidades, nodos, cantidades, distancias, regreso, vecinos,
+                 makespan=True):
+        self.viajes = [list(viaje) for viaje in viajes]
+        self.vehiculo = list(vehiculo_de_viaje)
+        self.capacidades = capacidades
+        self.nodos = nodos
+        self.cantidades = cantidades
+        self.distancias = distancias
+        self.regreso = regreso
+        self.vecinos = vecinos
+        self.makespan = makespan
+
+        self.pedidos_de_nodo = {}
+        for viaje in self.viajes:
+            for pedido in viaje:
+                self.pedidos_de_nodo.setdefault(nodos[pedido], []).append(pedido)
+        self.viaje_de = {}
+        self.posicion = {}
+        self.acumulada = [None] * len(self.viajes)
+        self.coste = [0] * len(self.viajes)
+        self.distancia_vehiculo = [0] * len(capacidades)
+        self.tocados = set()  # Viajes modificados por movimientos, inserciones o retiradas
+        # Orden de los viajes en la ruta que los encadena y viajes cambiados desde `ajustar_a_ruta`
+        self.rango = list(range(len(self.viajes)))
+        self._siguiente_rango = len(self.viajes)
+        self._orden = None  # Viajes no vacíos por rango (ver `orden_ruta`); None hasta que se ordenan
+        self.modificados = set()
+        # Viajes cambiados desde que se escribieron en una ruta (ver `ReoptimizacionCapacidad.solucion`)
+        self.sin_escribir = set()
+        for t in range(len(self.viajes)):
+            self._actualizar(t)
+            self.distancia_vehiculo[self.vehiculo[t]] += self.coste[t]
+
+    def _c(self, a, b):
+        return self.regreso[a] if b == 0 else self.distancias[a][b]
+
+    def coste_viaje(self, viaje):
+        """Distancia de un viaje (lista de pedidos) desde el almacén y de vuelta a él"""
+        if not viaje:
+            return 0
+        d = self.distancias
+        nodos = [self.nodos[p] for p in viaje]
+        return (d[0][nodos[0]] + sum(d[nodos[k]][nodos[k + 1]] for k in range(len(nodos) - 1))
+                + self.regreso[nodos[-1]])
+
+    def _actualizar(self, t):
+        """Recalcula posiciones, cargas acumuladas y coste del viaje t"""
+        viaje = self.viajes[t]
+        self.modificados.add(t)
+        self.sin_escribir.add(t)
+        acumulada = []
+        carga = 0
+        for i, pedido in enumerate(viaje):
+            self.viaje_de[pedido] = t
+            self.posicion[pedido] = i
+            carga += self.cantidades[pedido]
+            acumulada.append(carga)
+        self.acumulada[t] = acumulada
+        self.coste[t] = self.coste_viaje(viaje)
+
+    def _carga(self, t):
+        acumulada = self.acumulada[t]
+        return acumulada[-1] if acumulada else 0
+
+    def _hasta(self, t, i):
+        """Carga de las posiciones 0..i del viaje t"""
+        return self.acumulada[t][i] if i >= 0 else 0
+
+    def _anterior(self, t, i):
+        return self.nodos[self.viajes[t][i - 1]] if i > 0 else 0
+
+    def _siguiente(self, t, i):
+        viaje = self.viajes[t]
+        return self.nodos[viaje[i + 1]] if i + 1 < len(viaje) else 0
+
+    @property
+    def distancia(self):
+        return sum(self.distancia_vehiculo)
+
+    def _admisible(self, nuevos):
+        """Comprueba el makespan con los nuevos viajes {t: lista de pedidos}; devuelve sus costes o None"""
+        costes = {t: self.coste_viaje(viaje) for t, viaje in nuevos.items()}
+        if self.makespan:
+            cambios = {}
+            for t, coste in costes.items():
+                v = self.vehiculo[t]
+                cambios[v] = cambios.get(v, self.distancia_vehiculo[v]) + coste - self.coste[t]
+            if len(cambios) > 1 and max(cambios.values()) > max(self.distancia_vehiculo):
+                return None
+        return costes
+
+    def _aplicar(self, nuevos, costes):
+        for t, viaje in nuevos.items():
+            self.distancia_vehiculo[self.vehiculo[t]] += costes[t] - self.coste[t]
+            if self._orden is not None and bool(viaje) != bool(self.viajes[t]):
+                if not viaje:
+                    self._orden.remove(t)
+                elif not self._orden or self.rango[t] > self.rango[self._orden[-1]]:
+                    self._orden.append(t)
+                else:
+                    self._orden = None
+            self.viajes[t] = viaje
+            self._actualizar(t)
+            self.tocados.add(t)
+
+    def _mejorar_pedido(self, p, presupuesto):
+        """Busca un movimiento que mejore con el pedido p y lo aplica; devuelve si lo ha encontrado"""
+        c = self._c
+        nodos = self.nodos
+        cantidades = self.cantidades
+        t = self.viaje_de[p]
+        i = self.posicion[p]
+        u = nodos[p]
+        a = self._anterior(t, i)
+        b = self._siguiente(t, i)
+        capacidad_t = self.capacidades[self.vehiculo[t]]
+        quitar = c(a, b) - c(a, u) - c(u, b)
+        for w in self.vecinos[u]:
+            for q in self.pedidos_de_nodo.get(w, ()):
+                s = self.viaje_de[q]
+                if s == t:
+                    continue
+                presupuesto.evaluaciones += 1
+                j = self.posicion[q]
+                capacidad_s = self.capacidades[self.vehiculo[s]]
+                antes_q = self._anterior(s, j)
+                tras_q = self._siguiente(s, j)
+                viaje_t = self.viajes[t]
+                viaje_s = self.viajes[s]
+
+                # Recolocar p junto a q (después y antes)
+                if self._carga(s) + cantidades[p] <= capacidad_s:
+                    if quitar + c(w, u) + c(u, tras_q) - c(w, tras_q) < 0:
+                        nuevos = {t: viaje_t[:i] + viaje_t[i + 1:], s: viaje_s[:j + 1] + [p] + viaje_s[j + 1:]}
+                        if self._probar(nuevos):
+                            return True
+                    if quitar + c(antes_q, u) + c(u, w) - c(antes_q, w) < 0:
+                        nuevos = {t: viaje_t[:i] + viaje_t[i + 1:], s: viaje_s[:j] + [p] + viaje_s[j:]}
+                        if self._probar(nuevos):
+                            return True
+
+                # Intercambiar p y q
+                if (self._carga(t) - cantidades[p] + cantidades[q] <= capacidad_t
+                        and self._carga(s) - cantidades[q] + cantidades[p] <= capacidad_s):
+                    delta = (c(a, w) + c(w, b) - c(a, u) - c(u, b)
+                             + c(antes_q, u) + c(u, tras_q) - c(antes_q, w) - c(w, tras_q))
+                    if delta < 0:
+                        nuevos = {t: viaje_t[:i] + [q] + viaje_t[i + 1:], s: viaje_s[:j] + [p] + viaje_s[j + 1:]}
+                        if self._probar(nuevos):
+                            return True
+
+                # 2-opt*: t[..i] + s[j..] y s[..j-1] + t[i+1..]
+                if (self._hasta(t, i) + self._carga(s) - self._hasta(s, j - 1) <= capacidad_t
+                        and self._hasta(s, j - 1) + self._carga(t) - self._hasta(t, i) <= capacidad_s):
+                    if c(u, w) + c(antes_q, b) - c(u, b) - c(antes_q, w) < 0:
+                        nuevos = {t: viaje_t[:i + 1] + viaje_s[j:], s: viaje_s[:j] + viaje_t[i + 1:]}
+                        if self._probar(nuevos):
+                            return True
+        return False
+
+    def _en_medio(self, p):
+        """Indica si el pedido p entrega algo y su viaje aún entrega después"""
+        acumulada = self.acumulada[self.viaje_de[p]]
+        return self.cantidades[p] > 0 and acumulada[-1] > acumulada[self.posicion[p]]
+
+    def _anclado(self, p):
+        """Indica si el pedido p debe quedarse al final de su viaje: su nodo tiene otro pedido en medio de uno"""
+        pedidos = self.pedidos_de_nodo[self.nodos[p]]
+        return len(pedidos) > 1 and any(q != p and self._en_medio(q) for q in pedidos)
+
+    def _separa(self, nuevos):
+        """Indica si los nuevos viajes dejan en medio de un viaje un pedido anclado al final del suyo"""
+        finales = {viaje[-1] for viaje in nuevos.values() if viaje}
+        for t in nuevos:
+            viaje = self.viajes[t]
+            if not viaje or viaje[-1] in finales:
+                continue
+            p = viaje[-1]
+            for q in self.pedidos_de_nodo[self.nodos[p]]:
+                if q != p and (q not in finales if self.viaje_de[q] in nuevos else self._en_medio(q)):
+                    return True
+        return False
+
+    def _probar(self, nuevos):
+        if self._separa(nuevos):
+            return False
+        costes = self._admisible(nuevos)
+        if costes is None:
+            return False
+        self._aplicar(nuevos, costes)
+        return True
+
+    def dos_opt(self, t):
+        """2-opt dentro del viaje t hasta que no mejora (los viajes son cortos: O(L²) por pasada)
+
+        Si el último pedido está anclado al final del viaje, no se mueve.
+        """
+        viaje = self.viajes[t]
+        c = self._c
+        nodos = self.nodos
+        fijos = 1 if viaje and self._anclado(viaje[-1]) else 0
+        mejora = True
+        while mejora:
+            mejora = False
+            secuencia = [0] + [nodos[p] for p in viaje] + [0]
+            for i in range(1, len(secuencia) - 2 - fijos):
+                for j in range(i + 1, len(secuencia) - 1 - fijos):
+                    delta = (c(secuencia[i - 1], secuencia[j]) + c(secuencia[i], secuencia[j + 1])
+                             - c(secuencia[i - 1], secuencia[i]) - c(secuencia[j], secuencia[j + 1]))
+                    if delta < 0:
+                        viaje[i - 1:j] = viaje[i - 1:j][::-1]
+                        secuencia[i:j + 1] = secuencia[i:j + 1][::-1]
+                        mejora = True
+        nuevo = self.coste_viaje(viaje)
+        self.distancia_vehiculo[self.vehiculo[t]] += nuevo - self.coste[t]
+        self._actualizar(t)
+
+    def _marcar_nodo(self, nodo):
+        """Marca como modificados los viajes de los pedidos del nodo (cambia lo que la ruta le entrega)"""
+        self.modificados.update(self.viaje_de[q] for q in self.pedidos_de_nodo.get(nodo, ()))
+
+    def _nuevo_viaje(self, vehiculo):
+        """Añade un viaje vacío del vehículo, el último de la ruta, y devuelve su índice"""
+        t = len(self.viajes)
+        self.viajes.append([])
+        self.vehiculo.append(vehiculo)
+        self.acumulada.append([])
+        self.coste.append(0)
+        self.rango.append(self._siguiente_rango)
+        self._siguiente_rango += 1
+        return t
+
+    def quitar(self, p):
+        """Quita el pedido p de su viaje"""
+        t = self.viaje_de.pop(p)
+        i = self.posicion.pop(p)
+        viaje = self.viajes[t][:i] + self.viajes[t][i + 1:]
+        self._aplicar({t: viaje}, {t: self.coste_viaje(viaje)})
+        self.pedidos_de_nodo[self.nodos[p]].remove(p)
+        self._marcar_nodo(self.nodos[p])
+
+    def cambiar_cantidad(self, p, cantidad):
+        """Cambia la cantidad del pedido p sin moverlo (el llamador comprueba la capacidad)"""
+        self.cantidades[p] = cantidad
+        self._marcar_nodo(self.nodos[p])
+        self._actualizar(self.viaje_de[p])
+
+    def hueco(self, p):
+        """Carga que aún cabe en el viaje del pedido p"""
+        t = self.viaje_de[p]
+        return self.capacidades[self.vehiculo[t]] - self._carga(t)
+
+    def insertar(self, p):
+        """Inserta el pedido p donde menos alarga los viajes (inserción más barata).
+
+        Solo se prueba junto a los pedidos de sus vecinos (antes o después) y
+        en un viaje nuevo solo para él, así que cuesta O(k) y no depende del
+        número de viajes.
+        """
+        c = self._c
+        u = self.nodos[p]
+        cantidad = self.cantidades[p]
+        en_medio = any(self._en_medio(q) for q in self.pedidos_de_nodo.get(u, ()))
+        mejor, destino, posicion = c(0, u) + c(u, 0), None, 0
+        for w in self.vecinos[u]:
+            for q in self.pedidos_de_nodo.get(w, ()):
+                s = self.viaje_de[q]
+                if self._carga(s) + cantidad > self.capacidades[self.vehiculo[s]]:
+                    continue
+                j = self.posicion[q]
+                for k, a, b in ((j, self._anterior(s, j), w), (j + 1, w, self._siguiente(s, j))):
+                    delta = c(a, u) + c(u, b) - c(a, b)
+                    if delta < mejor:
+                        # Sin dejar en medio dos pedidos de un nodo
+                        if k < len(self.viajes[s]) and en_medio or k == len(self.viajes[s]) and self._anclado(q):
+                            continue
+                        mejor, destino, posicion = delta, s, k
+        if destino is None:
+            destino = self._nuevo_viaje(self._vehiculo_para(cantidad))
+        viaje = self.viajes[destino][:posicion] + [p] + self.viajes[destino][posicion:]
+        self._marcar_nodo(u)
+        self._aplicar({destino: viaje}, {destino: self.coste_viaje(viaje)})
+        self.pedidos_de_nodo.setdefault(u, []).append(p)
+
+    def _vehiculo_para(self, cantidad):
+        """Vehículo con la jornada más corta entre los que pueden llevar `cantidad` en un viaje nuevo"""
+        return min((v for v, capacidad in enumerate(self.capacidades) if capacidad >= cantidad),
+                   key=self.distancia_vehiculo.__getitem__)
+
+    def recalcular_costes(self, nodos):
+        """Recalcula el coste de los viajes que pasan por `nodos` (tras cambiar sus distancias o regresos)
+
+        Devuelve los pedidos de esos viajes.
+        """
+        viajes = {self.viaje_de[p] for nodo in nodos for p in self.pedidos_de_nodo.get(nodo, ())}
+        for t in viajes:
+            self._aplicar({t: self.viajes[t]}, {t: self.coste_viaje(self.viajes[t])})
+        return [p for t in viajes for p in self.viajes[t]]
+
+    def reparar(self, pedidos, presupuesto, rng):
+        """Mejora solo el entorno de `pedidos`: 2-opt en sus viajes y movimientos que parten de ellos
+
+        Los viajes que cambian con los movimientos se repasan al final con
+        2-opt. El trabajo depende del número de pedidos, no de la solución.
+        """
+        pedidos = [p for p in pedidos if p in self.viaje_de]
+        # También los viajes que han cambiado con las inserciones y retiradas previas
+        self.tocados.update(self.viaje_de[p] for p in pedidos)
+        for t in list(self.tocados):
+            self.dos_opt(t)
+        self._recorrer(pedidos, presupuesto, rng)
+        for t in self.tocados:
+            self.dos_opt(t)
+        self.tocados = set()
+
+    def mejorar(self, presupuesto, rng, pedidos=None):
+        """Aplica movimientos de mejora hasta que no queda ninguno o se agota el presupuesto
+
+        Con `pedidos` solo se prueban movimientos a partir de esos pedidos.
+        """
+        for t in range(len(self.viajes)):
+            self.dos_opt(t)
+        pedidos = [p for viaje in self.viajes for p in viaje] if pedidos is None else list(pedidos)
+        self._recorrer(pedidos, presupuesto, rng)
+        for t in range(len(self.viajes)):
+            self.dos_opt(t)
+
+    def _recorrer(self, pedidos, presupuesto, rng):
+        """Pasadas por `pedidos` en orden aleatorio aplicando movimientos hasta que ninguno mejora"""
+        mejora = True
+        while mejora and not presupuesto.agotado():
+            mejora = False
+            rng.shuffle(pedidos)
+            for p in pedidos:
+                if self._mejorar_pedido(p, presupuesto):
+                    mejora = True
+                if presupuesto.agotado():
+                    break
+            presupuesto.informar(self.distancia)
+
+    def _clave(self, p):
+        return self.rango[self.viaje_de[p]], self.posicion[p]
+
+    def _restricciones(self, nodo):
+        """(viajes que van antes, viaje del último pedido, viajes que van después) de un nodo repartido
+
+        El último pedido del nodo en la ruta es el que va en medio de su viaje
+        o, si no hay, el último en el orden actual. Los demás pedidos con
+        cantidad van antes que él y las visitas de paso (cantidad 0), después,
+        cuando ya no queda nada que entregar al nodo.
+        """
+        pedidos = self.pedidos_de_nodo[nodo]
+        con_cantidad = [p for p in pedidos if self.cantidades[p] > 0]
+        if not con_cantidad:
+            return (), None, ()
+        ultimo = max([p for p in con_cantidad if self._en_medio(p)] or con_cantidad, key=self._clave)
+        t = self.viaje_de[ultimo]
+        antes = {self.viaje_de[p] for p in con_cantidad} - {t}
+        despues = {self.viaje_de[p] for p in pedidos if self.cantidades[p] == 0} - {t}
+        return antes, t, despues
+
+    def ajustar_a_ruta(self):
+        """Ordena los viajes para que la ruta que los encadena entregue lo que dicen sus pedidos
+
+        La ruta se simula como `TSPCapacidad.evaluar_ruta`: cada visita
+        entrega lo que puede de lo pendiente del nodo, así que un pedido que
+        no es el último de su nodo se lleva toda la carga restante y solo
+        cuadra al final de su viaje. De cada nodo repartido en varios viajes
+        se deja como último el pedido que va en mitad de su viaje y los
+        viajes de los demás se ponen antes que el suyo (el orden de los
+        viajes no cambia la distancia). Si un nodo tiene varios pedidos en
+        mitad de un viaje (los movimientos lo evitan, pero no las
+        inserciones), los que sobran pasan al final del suyo. Después las
+        cantidades se igualan a lo que entrega la simulación; los pedidos que
+        se quedan sin nada se quitan si eso no alarga su viaje (si no, siguen
+        como visitas de paso, con cantidad 0, salvo que el camión llegue
+        vacío con el nodo aún por servir, porque `evaluar_ruta` la anotaría
+        como entrega) y lo que falte (si el orden tiene ciclos) va en viajes
+        nuevos al final.
+
+        Solo se revisan los viajes modificados desde la llamada anterior y
+        los que dependen de ellos, así que tras un cambio pequeño cuesta poco.
+        Devuelve los viajes no vacíos en el orden de la ruta.
+        """
+        tocados = set(self.tocados)  # Estos cambios no son para repasarlos con 2-opt
+        nodos = self.nodos
+        cantidades = self.cantidades
+
+        def repartidos(t):
+            return {nodos[p] for p in self.viajes[t] if len(self.pedidos_de_nodo[nodos[p]]) > 1}
+
+        revisar = set()
+        for t in self.modificados:
+            revisar |= repartidos(t)
+
+        def al_final(p):
+            viaje = self.viajes[self.viaje_de[p]]
+            return [q for q in viaje if q != p] + [p]
+
+        # Se queda en medio el pedido que más costaría llevar al final; los demás van al final
+        movidos = {}
+        for nodo in revisar:
+            medio = [p for p in self.pedidos_de_nodo[nodo] if self._en_medio(p)]
+            if len(medio) > 1:
+                medio.sort(key=lambda p: (self.coste_viaje(al_final(p)) - self.coste[self.viaje_de[p]],
+                                          self._clave(p)))
+                for p in medio[:-1]:
+                    movidos.setdefault(self.viaje_de[p], []).append(p)
+        for t, pedidos in movidos.items():
+            viaje = [p for p in self.viajes[t] if p not in pedidos] + pedidos
+            self._aplicar({t: viaje}, {t: self.coste_viaje(viaje)})
+            self.dos_opt(t)
+
+        # Cada viaje que incumple un orden pasa al final de la ruta, y se revisan los nodos que comparte
+        simular = set(self.modificados)
+        for nodo in revisar:
+            simular.update(self.viaje_de[q] for q in self.pedidos_de_nodo[nodo])
+        pendientes = list(revisar)
+        empujes = {}  # Un viaje que vuelve a pasar al final una y otra vez está en un ciclo de órdenes
+        while pendientes:
+            antes, t, despues = self._restricciones(pendientes.pop())
+            if t is None:
+                continue
+            for s in [t, *despues]:
+                minimo = max((self.rango[r] for r in antes), default=-1) if s == t else self.rango[t]
+                if self.rango[s] <= minimo and empujes.get(s, 0) < MAX_EMPUJES:
+                    empujes[s] = empujes.get(s, 0) + 1
+                    self.rango[s] = self._siguiente_rango
+                    self._siguiente_rango += 1
+                    if self._orden is not None and self.viajes[s]:
+                        self._orden.remove(s)
+                        self._orden.append(s)
+                    # Cambia lo pendiente en todas las visitas de sus nodos repartidos
+                    for nodo in repartidos(s):
+                        simular.update(self.viaje_de[q] for q in self.pedidos_de_nodo[nodo])
+                        pendientes.append(nodo)
+
+        # Simulación de los viajes afectados, en el orden de la ruta
+        totales = {}
+        vacios = []
+        sobrantes = []
+        cola = [(self.rango[t], t) for t in simular if self.viajes[t]]
+        heapq.heapify(cola)
+        hechos = set()
+        while cola:
+            _, t = heapq.heappop(cola)
+            if t in hechos:
+                continue
+            hechos.add(t)
+            carga = self.capacidades[self.vehiculo[t]]
+            cambiado = False
+            for p in self.viajes[t]:
+                nodo = nodos[p]
+                pedidos = self.pedidos_de_nodo[nodo]
+                if nodo not in totales:
+                    totales[nodo] = sum(cantidades[q] for q in pedidos)
+                clave = self._clave(p)
+                pendiente = totales[nodo] - sum(cantidades[q] for q in pedidos if self._clave(q) < clave)
+                cantidad = min(carga, pendiente)
+                carga -= cantidad
+                if pendiente > 0 and cantidad == 0:
+                    sobrantes.append(p)  # Con el camión vacío, la visita cuenta como entrega de 0
+                if cantidad != cantidades[p]:
+                    cantidades[p] = cantidad
+                    cambiado = True
+                    if cantidad == 0:
+                        vacios.append(p)
+                    # Cambia lo pendiente en las visitas siguientes del nodo
+                    for q in pedidos:
+                        s = self.viaje_de[q]
+                        if s != t and s not in hechos and self._clave(q) > clave:
+                            heapq.heappush(cola, (self.rango[s], s))
+            if cambiado:
+                self._actualizar(t)
+        for p in vacios:
+            t = self.viaje_de[p]
+            if cantidades[p] == 0 and self.coste_viaje([q for q in self.viajes[t] if q != p]) <= self.coste[t]:
+                self.quitar(p)
+        for p in sobrantes:
+            if p in self.viaje_de:
+                self.quitar(p)
+
+        # Lo que falta, en viajes propios al final de la ruta
+        for nodo, total in totales.items():
+            pendiente = total - sum(cantidades[q] for q in self.pedidos_de_nodo[nodo])
+            while pendiente > 0:
+                p = len(nodos)
+                nodos.append(nodo)
+                cantidades.append(min(pendiente, max(self.capacidades)))
+                pendiente -= cantidades[p]
+                t = self._nuevo_viaje(self._vehiculo_para(cantidades[p]))
+                self._aplicar({t: [p]}, {t: self.coste_viaje([p])})
+                self.pedidos_de_nodo[nodo].append(p)
+        self.modificados = set()
+        self.tocados = tocados
+        return self.orden_ruta()
+
+    def orden_ruta(self):
+        """Viajes no vacíos en el orden de la ruta que los encadena (por `rango`)
+
+        El orden se guarda y se mantiene con cada viaje que pasa al final,
+        se vacía o se estrena; solo se vuelve a ordenar todo si un viaje
+        vacío vuelve a llenarse sin ser el último.
+        """
+        if self._orden is None:
+            self._orden = sorted((t for t, viaje in enumerate(self.viajes) if viaje), key=self.rango.__getitem__)
+        return list(self._orden)
+
+    def viajes_de(self, vehiculo):
+        """Viajes no vacíos de un vehículo"""
+        return [viaje for t, viaje in enumerate(self.viajes) if self.vehiculo[t] == vehiculo and viaje]
+
+
+def mejorar_vehiculo(distancias, regreso, vecinos, nodos, cantidades, viajes, capacidad, tiempo_limite,
+                     max_evaluaciones, semilla, cancelacion=None):
+    """Mejora los viajes de un vehículo y devuelve los nuevos"""
+    motor = MejoraViajes(viajes, [0] * len(viajes), [capacidad], nodos, cantidades, distancias, regreso,
+                         vecinos, makespan=False)
+    motor.mejorar(Presupuesto(tiempo_limite, max_evaluaciones, cancelacion), random.Random(semilla))
+    return motor.viajes_de(0)
+
+
+def _mejorar_vehiculo_trabajador(nodos, cantidades, viajes, capacidad, tiempo_limite, max_evaluaciones, semilla):
+    """Tarea de un proceso trabajador: `mejorar_vehiculo` con las distancias compartidas"""
+    estado = estado_trabajador()
+    if "vecinos" not in estado:
+        estado["vecinos"] = estado["distancias"].vecinos_cercanos(estado["parametros"]["k_vecinos"])
+    return mejorar_vehiculo(estado["distancias"], estado["parametros"]["regreso"], estado["vecinos"],
+                            nodos, cantidades, viajes, capacidad, tiempo_limite, max_evaluaciones, semilla)
+
+
+def resolver_flota(distancias, demandas, capacidades, regreso, tiempo_limite=None, max_evaluaciones=None,
+                   max_procesos=None, k_vecinos=10, semilla=None, presupuesto=None):
+    """Resuelve el modo flota y devuelve (viajes, vehículo de cada viaje, nodos, cantidades).
+
+    Los viajes son listas de pedidos; `nodos[p]` y `cantidades[p]` dicen a
+    qué nodo va el pedido p y cuánto lleva. El `presupuesto` (por defecto,
+    uno con `tiempo_limite` y `max_evaluaciones`) puede traer además una
+    cancelación y un aviso de progreso; al agotarse se devuelven los viajes
+    mejorados hasta ese momento (como mínimo, los de la construcción).
+    Los viajes vienen en el orden de la ruta que los encadena: simulada con
+    la capacidad de cada vehículo, entrega lo que dicen sus pedidos (ver
+    `MejoraViajes.ajustar_a_ruta`).
+    """
+    rng = random.Random(semilla)
+    nodos, cantidades = crear_pedidos(demandas, capacidades)
+    construidos = construir_en_paralelo(distancias, nodos, cantidades, capacidades, regreso)
+    if presupuesto is None:
+        presupuesto = Presupuesto(tiempo_limite, max_evaluaciones)
+    num_vehiculos = len(capacidades)
+    semillas = [rng.getrandbits(64) for _ in capacidades]
+    max_procesos = min(max_procesos or os.cpu_count() or 1, num_vehiculos)
+    paralelo = max_procesos > 1 and len(nodos) >= MIN_PEDIDOS_PARALELO
+    # La mitad del presupuesto es para la mejora por vehículo, repartida entre los que van en serie
+    en_serie = 1 if paralelo else num_vehiculos
+    restante = presupuesto.restante()
+    tiempo_vehiculo = None if restante is None else restante / (2 * en_serie)
+    evaluaciones_vehiculo = (None if presupuesto.max_evaluaciones is None
+                             else max(presupuesto.max_evaluaciones // (2 * num_vehiculos), 1))
+
+    if paralelo:
+        parametros = {"regreso": regreso, "k_vecinos": k_vecinos}
+        with ejecutor_compartido(distancias, max_procesos, "flota", parametros) as ejecutor:
+            futuros = [ejecutor.submit(_mejorar_vehiculo_trabajador, nodos, cantidades, construidos[v],
+                                       capacidades[v], tiempo_vehiculo, evaluaciones_vehiculo, semillas[v])
+                       for v in range(num_vehiculos)]
+            # Mientras los trabajadores mejoran cada vehículo se calculan aquí las listas de vecinos
+            vecinos = distancias.vecinos_cercanos(k_vecinos)
+            pendientes = set(futuros)
+            while pendientes and not presupuesto.agotado(inmediato=True):
+                # Se espera por intervalos para atender una cancelación
+                _, pendientes = wait(pendientes, INTERVALO_PROGRESO)
+            # Los vehículos que no han terminado (cancelación) se quedan con los viajes construidos
+            viajes_vehiculo = [futuro.result() if futuro.done() else construidos[v]
+                               for v, futuro in enumerate(futuros)]
+    else:
+        vecinos = distancias.vecinos_cercanos(k_vecinos)
+        viajes_vehiculo = [mejorar_vehiculo(distancias, regreso, vecinos, nodos, cantidades, construidos[v],
+                                            capacidades[v], tiempo_vehiculo, evaluaciones_vehiculo, semillas[v],
+                                            presupuesto.cancelacion)
+                           for v in range(num_vehiculos)]
+
+    viajes = [viaje for lista in viajes_vehiculo for viaje in lista]
+    vehiculo_de_viaje = [v for v, lista in enumerate(viajes_vehiculo) for _ in lista]
+    motor = MejoraViajes(viajes, vehiculo_de_viaje, capacidades, nodos, cantidades, distancias, regreso, vecinos)
+    motor.mejorar(presupuesto, rng)
+    orden = motor.ajustar_a_ruta()
+    return [motor.viajes[t] for t in orden], [motor.vehiculo[t] for t in orden], nodos, cantidades
@@ -0,0 +1,206 @@
+"""Formato binario de instancias y soluciones, con carga por proyección en memoria.
+
+Instancia (`.tspb`): una cabecera fija de 64 bytes seguida de los datos en
+crudo, cada bloque alineado a 64 bytes:
+
+    "TSPB", versión, tipo (0 = matriz, 1 = coordenadas), si hay demandas,
+    tipo NumPy de la matriz, número de nodos, capacidad (float64, -1 si no
+    hay), desplazamiento de la matriz/coordenadas y de las demandas, tipo
+    NumPy de las demandas
+    matriz n×n del tipo indicado, o coordenadas n×2 en float64
+    demandas n × el tipo indicado (opcional)
+
+Matriz y demandas enteras usan el tipo entero más pequeño que admite sus
+valores (`tipo_compacto`, como `MatrizDistancias`); las demandas con
+decimales conservan su tipo. La capacidad es un solo número de la
+cabecera y se guarda como float64, igual que la distancia de las
+soluciones: al leerla vuelve a ser un entero si no tiene decimales.
+
+La matriz se abre con `np.memmap` en modo de solo lectura: no se copia ni se
+lee entera al cargar, el sistema operativo trae las páginas según se usan y
+varios procesos que abren el mismo fichero comparten esas páginas.
+
+Solución (`.tspsol`, junto a la instancia): cabecera "TSPS" con los tamaños y
+la distancia total, seguida de la ruta (índices), las entregas (nodo,
+cantidad, carga restante) y los regresos al almacén (nodo de inicio,
+distancia y la ruta de cada regreso, concatenadas con sus desplazamientos).
+"""
+import os
+import struct
+from array import array
+import numpy as np
+from matriz_distancias import MatrizDistancias, tipo_compacto
+from distancias_euclideas import DistanciasEuclideas
+from solucion import RegistroEntregas, TIPO_ENTERO, ruta_compacta
+
+VERSION = 1
+ALINEACION = 64
+TIPO_MATRIZ = 0
+TIPO_COORDENADAS = 1
+
+_CABECERA_INSTANCIA = struct.Struct("<4sHBB8sQdQQ8s")
+_CABECERA_SOLUCION = struct.Struct("<4sHxxQQQQd")
+
+
+def _alinear(posicion):
+    return (posicion + ALINEACION - 1) // ALINEACION * ALINEACION
+
+
+def ruta_solucion(ruta_instancia):
+    """Fichero de solución que acompaña a un fichero de instancia"""
+    return os.path.splitext(ruta_instancia)[0] + ".tspsol"
+
+
+def escribir_instancia(ruta_fichero, distancias, demandas=None, capacidad=None):
+    """Escribe una instancia (MatrizDistancias o DistanciasEuclideas, demandas y capacidad)"""
+    if isinstance(distancias, DistanciasEuclideas):
+        tipo = TIPO_COORDENADAS
+        bloque = np.ascontiguousarray(distancias.coordenadas, dtype="<f8")
+    else:
+        tipo = TIPO_MATRIZ
+        datos = distancias.datos if isinstance(distancias, MatrizDistancias) else MatrizDistancias(distancias).datos
+        bloque = np.ascontiguousarray(datos, dtype=datos.dtype.newbyteorder("<"))
+    num_nodos = len(bloque)
+    if demandas is not None:
+        demandas = np.asarray(demandas)
+        if demandas.dtype.kind == "f":
+            tipo_demandas = demandas.dtype
+        elif demandas.size == 0 or demandas.min() >= 0:
+            tipo_demandas = tipo_compacto(int(demandas.max()) if demandas.size else 0)
+        else:
+            tipo_demandas = np.int64
+        demandas = np.ascontiguousarray(demandas, dtype=np.dtype(tipo_demandas).newbyteorder("<"))
+    desplazamiento_datos = _alinear(_CABECERA_INSTANCIA.size)
+    desplazamiento_demandas = _alinear(desplazamiento_datos + bloque.nbytes) if demandas is not None else 0
+    cabecera = _CABECERA_INSTANCIA.pack(b"TSPB", VERSION, tipo, demandas is not None,
+                                        bloque.dtype.str.encode("ascii"), num_nodos,
+                                        -1.0 if capacidad is None else float(capacidad),
+                                        desplazamiento_datos, desplazamiento_demandas,
+                                        b"" if demandas is None else demandas.dtype.str.encode("ascii"))
+    with open(ruta_fichero, "wb") as fichero:
+        fichero.write(cabecera)
+        fichero.seek(desplazamiento_datos)
+        # tofile escribe el bloque directamente, sin pasar por bytes intermedios
+        bloque.tofile(fichero)
+        if demandas is not None:
+            fichero.seek(desplazamiento_demandas)
+            demandas.tofile(fichero)
+
+
+def abrir_instancia(ruta_fichero):
+    """Abre una instancia sin copiarla: devuelve un diccionario con las distancias, demandas y capacidad.
+
+    `distancias` es una MatrizDistancias (o DistanciasEuclideas) sobre una
+    proyección en memoria de solo lectura del fichero.
+    """
+    with open(ruta_fichero, "rb") as fichero:
+        cabecera = fichero.read(_CABECERA_INSTANCIA.size)
+    if len(cabecera) < _CABECERA_INSTANCIA.size:
+        raise ValueError(f"{ruta_fichero}: fichero de instancia incompleto")
+    (marca, version, tipo, hay_demandas, tipo_datos, num_nodos, capacidad,
+     desplazamiento_datos, desplazamiento_demandas, tipo_demandas) = _CABECERA_INSTANCIA.unpack(cabecera)
+    if marca != b"TSPB":
+        raise ValueError(f"{ruta_fichero}: no es un fichero de instancia binario")
+    if version > VERSION:
+        raise ValueError(f"{ruta_fichero}: versión {version} no soportada")
+
+    if tipo == TIPO_COORDENADAS:
+        coordenadas = np.memmap(ruta_fichero, dtype="<f8", mode="r", offset=desplazamiento_datos,
+                                shape=(num_nodos, 2))
+        distancias = DistanciasEuclideas(coordenadas)
+    else:
+        datos = np.memmap(ruta_fichero, dtype=np.dtype(tipo_datos.rstrip(b"\0").decode("ascii")), mode="r",
+                          offset=desplazamiento_datos, shape=(num_nodos, num_nodos))
+        distancias = MatrizDistancias(datos, compactar=False)
+    distancias.origen = (os.path.abspath(ruta_fichero), desplazamiento_datos)
+
+    demandas = None
+    if hay_demandas:
+        demandas = np.memmap(ruta_fichero, dtype=np.dtype(tipo_demandas.rstrip(b"\0").decode("ascii")), mode="r",
+                             offset=desplazamiento_demandas, shape=(num_nodos,))
+    return {
+        "distancias": distancias,
+        "demandas": demandas,
+        "capacidad": None if capacidad < 0 else int(capacidad) if capacidad.is_integer() else capacidad,
+    }
+
+
+def guardar_instancia(ruta_fichero, tsp):
+    """Guarda la instancia de un TSPGenerico o TSPCapacidad"""
+    if hasattr(tsp, "capacidad_camion"):
+        escribir_instancia(ruta_fichero, tsp.distancias, tsp.demandas, tsp.capacidad_camion)
+    else:
+        escribir_instancia(ruta_fichero, tsp.distancias)
+
+
+def cargar_instancia(ruta_fichero, semilla=None):
+    """Carga una instancia guardada como TSPCapacidad (si tiene demandas) o TSPGenerico"""
+    from tsp_generico import TSPGenerico
+    from tsp_capacidad import TSPCapacidad
+    instancia = abrir_instancia(ruta_fichero)
+    if instancia["demandas"] is None:
+        return TSPGenerico(distancias=instancia["distancias"], semilla=semilla)
+    # Las demandas se modifican durante la resolución: se pasan como lista (O(n))
+    capacidad = instancia["capacidad"] if instancia["capacidad"] is not None else 100
+    return TSPCapacidad(capacidad_camion=capacidad, demandas=instancia["demandas"].tolist(),
+                        distancias=instancia["distancias"], semilla=semilla)
+
+
+def guardar_solucion(ruta_fichero, tsp):
+    """Guarda la mejor solución de un TSPGenerico o TSPCapacidad (ruta, entregas y regresos)"""
+    ruta = np.asarray(tsp.mejor_ruta_indices, dtype="<i8")
+    registro = getattr(tsp, "entregas_realizadas", None)
+    entregas = (np.empty((0, 3), dtype="<i8") if registro is None
+                else np.array(registro.tolist()[:3], dtype="<i8").T.reshape(-1, 3))
+    # Los regresos solo guardan el nodo de partida: camino y distancia salen de los caminos mínimos
+    inicios = np.asarray(getattr(tsp, "regresos_almacen", ()), dtype="<i8")
+    if len(inicios):
+        caminos = tsp.caminos_almacen
+        distancias_regreso = np.array([caminos.distancia[inicio] for inicio in inicios.tolist()], dtype="<f8")
+        caminos_regreso = [caminos.camino(inicio) for inicio in inicios.tolist()]
+    else:
+        distancias_regreso = np.empty(0, dtype="<f8")
+        caminos_regreso = []
+    tramos = np.array([nodo for camino in caminos_regreso for nodo in camino], dtype="<i8")
+    desplazamientos = np.zeros(len(inicios) + 1, dtype="<i8")
+    np.cumsum([len(camino) for camino in caminos_regreso], out=desplazamientos[1:])
+
+    cabecera = _CABECERA_SOLUCION.pack(b"TSPS", VERSION, len(ruta), len(entregas), len(inicios), len(tramos),
+                                       float(tsp.mejor_distancia))
+    with open(ruta_fichero, "wb") as fichero:
+        fichero.write(cabecera)
+        for bloque in (ruta, entregas, inicios, distancias_regreso, desplazamientos, tramos):
+            fichero.seek(_alinear(fichero.tell()))
+            bloque.tofile(fichero)
+
+
+def cargar_solucion(ruta_fichero, tsp):
+    """Carga una solución guardada en `tsp` (mejor ruta, distancia, entregas y regresos)"""
+    contenido = np.memmap(ruta_fichero, dtype=np.uint8, mode="r")
+    marca, version, num_ruta, num_entregas, num_regresos, num_tramos, distancia = \
+        _CABECERA_SOLUCION.unpack(contenido[:_CABECERA_SOLUCION.size].tobytes())
+    if marca != b"TSPS":
+        raise ValueError(f"{ruta_fichero}: no es un fichero de solución binario")
+    if version > VERSION:
+        raise ValueError(f"{ruta_fichero}: versión {version} no soportada")
+
+    posicion = _CABECERA_SOLUCION.size
+    bloques = []
+    for tipo, forma in (("<i8", (num_ruta,)), ("<i8", (num_entregas, 3)), ("<i8", (num_regresos,)),
+                        ("<f8", (num_regresos,)), ("<i8", (num_regresos + 1,)), ("<i8", (num_tramos,))):
+        posicion = _alinear(posicion)
+        cantidad = int(np.prod(forma))
+        # Un bloque vacío al final no ocupa nada: su desplazamiento alineado cae fuera del fichero
+        bloque = (np.frombuffer(contenido, dtype=tipo, count=cantidad, offset=posicion) if cantidad
+                  else np.empty(0, dtype=tipo))
+        bloques.append(bloque.reshape(forma))
+        posicion += cantidad * 8
+    ruta, entregas, inicios, distancias_regreso, desplazamientos, tramos = bloques
+
+    tsp.mejor_ruta_indices = ruta_compacta(ruta.tolist())
+    tsp.mejor_distancia = int(distancia) if distancia.is_integer() else distancia
+    if hasattr(tsp, "entregas_realizadas"):
+        # Los caminos y distancias de regreso guardados no se leen: salen de los caminos mínimos de la instancia
+        tsp.entregas_realizadas = RegistroEntregas(*entregas.T.tolist())
+        tsp.regresos_almacen = array(TIPO_ENTERO, inicios.tolist())
+    return tsp
@@ -0,0 +1,108 @@
+import tracemalloc
+import numpy as np
+
+# Por encima de este tamaño la tabla de padres (2^(n-1) · (n-1) bytes) supera los cientos de MB
+MAX_NODOS_HELD_KARP = 22
+
+
+def _capas_por_cardinalidad(num_bits):
+    """Agrupa todas las máscaras de `num_bits` bits por número de bits activos.
+
+    Devuelve la lista de capas (arrays de máscaras) y, para cada máscara, su
+    posición dentro de su capa.
+    """
+    mascaras = np.arange(1 << num_bits, dtype=np.int32)
+    cardinalidad = np.zeros(len(mascaras), dtype=np.int8)
+    for bit in range(num_bits):
+        cardinalidad += ((mascaras >> bit) & 1).astype(np.int8)
+    del mascaras
+    orden = np.argsort(cardinalidad, kind="stable").astype(np.int32)
+    inicios = np.concatenate(([0], np.cumsum(np.bincount(cardinalidad, minlength=num_bits + 1))))
+    capas = [orden[inicios[k]:inicios[k + 1]] for k in range(num_bits + 1)]
+    posicion_en_capa = np.empty(len(orden), dtype=np.int32)
+    for capa in capas:
+        posicion_en_capa[capa] = np.arange(len(capa), dtype=np.int32)
+    return capas, posicion_en_capa
+
+
+def held_karp(distancias, presupuesto=None):
+    """Resuelve el TSP de forma exacta con la programación dinámica de Held–Karp.
+
+    Complejidad O(2^n · n^2) en tiempo. Los costes solo se guardan para la capa
+    anterior y la actual (subconjuntos de igual tamaño); lo único que ocupa
+    memoria proporcional a 2^n es la tabla de padres, en uint8. Devuelve
+    (ruta_indices, distancia, memoria_pico_bytes), con la ruta cerrada en el nodo 0.
+    Si el `presupuesto` se agota antes de terminar no hay solución parcial que
+    devolver: la ruta y la distancia son None.
+    """
+    datos = np.asarray(distancias.datos if hasattr(distancias, "datos") else distancias)
+    num_nodos = len(datos)
+    if num_nodos <= 2:
+        ruta = list(range(num_nodos)) + [0]
+        return ruta, sum(int(datos[ruta[i], ruta[i + 1]]) for i in range(len(ruta) - 1)), 0
+
+    ya_midiendo = tracemalloc.is_tracing()
+    if ya_midiendo:
+        tracemalloc.reset_peak()
+    else:
+        tracemalloc.start()
+    memoria_inicial = tracemalloc.get_traced_memory()[0]
+
+    # El nodo 0 es el origen fijo; el resto se indexa como bits 0..m-1 (nodo = bit + 1)
+    m = num_nodos - 1
+    if datos.dtype.kind in "iu" and int(datos.max()) * num_nodos < 2 ** 30:
+        tipo, infinito = np.int32, 2 ** 30
+    elif datos.dtype.kind in "iu":
+        tipo, infinito = np.int64, 2 ** 62
+    else:
+        tipo, infinito = np.float64, np.inf
+    d = datos[1:, 1:].astype(tipo)
+    desde_origen = datos[0, 1:].astype(tipo)
+    hacia_origen = datos[1:, 0].astype(tipo)
+
+    capas, posicion_en_capa = _capas_por_cardinalidad(m)
+    padres = np.zeros((1 << m, m), dtype=np.uint8)
+
+    # Capa 1: caminos 0 -> j
+    costes_previos = np.full((m, m), infinito, dtype=tipo)
+    costes_previos[posicion_en_capa[capas[1]], np.log2(capas[1]).astype(np.int64)] = desde_origen
+
+    for k in range(2, m + 1):
+        capa = capas[k]
+        costes = np.full((len(capa), m), infinito, dtype=tipo)
+        for j in range(m):
+            if presupuesto is not None and presupuesto.agotado(inmediato=True):
+                memoria_pico = tracemalloc.get_traced_memory()[1] - memoria_inicial
+                if not ya_midiendo:
+                    tracemalloc.stop()
+                return None, None, memoria_pico
+            con_j = capa[(capa >> j) & 1 == 1]
+            # Mejor forma de llegar a j desde cada final i del subconjunto sin j
+            candidatos = costes_previos[posicion_en_capa[con_j ^ (1 << j)]] + d[:, j]
+            mejores = candidatos.argmin(axis=1)
+            costes[posicion_en_capa[con_j], j] = candidatos[np.arange(len(con_j)), mejores]
+            padres[con_j, j] = mejores
+            del candidatos
+        costes_previos = costes
+
+    totales = costes_previos[0] + hacia_origen
+    ultimo = int(totales.argmin())
+    distancia = totales[ultimo].item()
+
+    # Reconstrucción hacia atrás con la tabla de padres
+    camino = []
+    mascara = (1 << m) - 1
+    j = ultimo
+    while True:
+        camino.append(j + 1)
+        if mascara == 1 << j:
+            break
+        anterior = int(padres[mascara, j])
+        mascara ^= 1 << j
+        j = anterior
+    ruta_indices = [0] + camino[::-1] + [0]
+
+    memoria_pico = tracemalloc.get_traced_memory()[1] - memoria_inicial
+    if not ya_midiendo:
+        tracemalloc.stop()
+    return ruta_indices, distancia, memoria_pico
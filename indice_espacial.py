@@ -0,0 +1,227 @@
+import math
+import numpy as np
+
+
+class RejillaEspacial:
+    """Índice espacial de rejilla uniforme sobre las coordenadas de los nodos.
+
+    Cada celda guarda los nodos que caen en ella (unos `por_celda` de media).
+    Sirve para calcular de una vez las listas de vecinos más cercanos de todos
+    los nodos: los de cada celda se comparan en bloque solo con los de las
+    celdas de alrededor.
+    """
+
+    def __init__(self, x, y, por_celda=2):
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.num_nodos = len(self.x)
+        if self.num_nodos == 0:
+            self.lado = 1.0
+            self.columnas = self.filas = 1
+            self.celdas = [[]]
+            return
+        x_min = float(self.x.min())
+        y_min = float(self.y.min())
+        ancho = float(self.x.max()) - x_min
+        alto = float(self.y.max()) - y_min
+        area = max(ancho * alto, ancho ** 2, alto ** 2)
+        self.lado = math.sqrt(area * por_celda / self.num_nodos) or 1.0
+        self.columnas = int(ancho / self.lado) + 1
+        self.filas = int(alto / self.lado) + 1
+        columna = ((self.x - x_min) / self.lado).astype(np.int64)
+        fila = ((self.y - y_min) / self.lado).astype(np.int64)
+        self.celdas = [[] for _ in range(self.columnas * self.filas)]
+        for nodo, celda in enumerate((fila * self.columnas + columna).tolist()):
+            self.celdas[celda].append(nodo)
+
+    def _alrededor(self, columna, fila, radio):
+        """Nodos de las celdas a distancia de Chebyshev como mucho `radio` de (columna, fila)"""
+        desde = max(columna - radio, 0)
+        hasta = min(columna + radio, self.columnas - 1) + 1
+        return [nodo
+                for f in range(max(fila - radio, 0), min(fila + radio, self.filas - 1) + 1)
+                for celda in self.celdas[f * self.columnas + desde:f * self.columnas + hasta]
+                for nodo in celda]
+
+    def vecinos_cercanos(self, k):
+        """Devuelve, para cada nodo, sus k vecinos más cercanos ordenados por distancia.
+
+        El radio de búsqueda de cada celda solo se amplía si el k-ésimo vecino
+        encontrado podría estar más lejos que las celdas ya examinadas.
+        """
+        vecinos = [[] for _ in range(self.num_nodos)]
+        k = min(k, self.num_nodos - 1)
+        if k <= 0:
+            return vecinos
+        x = self.x
+        y = self.y
+        for indice, nodos in enumerate(self.celdas):
+            if not nodos:
+                continue
+            fila, columna = divmod(indice, self.columnas)
+            nodos = np.array(nodos, dtype=np.int64)
+            radio_maximo = max(columna, self.columnas - 1 - columna, fila, self.filas - 1 - fila)
+            radio = 1
+            while True:
+                candidatos = self._alrededor(columna, fila, radio)
+                completo = radio >= radio_maximo
+                if len(candidatos) > k or completo:
+                    candidatos = np.array(candidatos, dtype=np.int64)
+                    d2 = (x[nodos, None] - x[candidatos]) ** 2 + (y[nodos, None] - y[candidatos]) ** 2
+                    d2[nodos[:, None] == candidatos] = np.inf
+                    cercanos = np.argpartition(d2, k - 1, axis=1)[:, :k]
+                    distancias = np.take_along_axis(d2, cercanos, axis=1)
+                    # Fuera del radio examinado todo está al menos a radio·lado de la celda
+                    if completo or distancias.max() <= (radio * self.lado) ** 2:
+                        orden = np.argsort(distancias, axis=1, kind="stable")
+                        cercanos = candidatos[np.take_along_axis(cercanos, orden, axis=1)]
+                        for nodo, lista in zip(nodos.tolist(), cercanos.tolist()):
+                            vecinos[nodo] = lista
+                        break
+                radio += 1
+        return vecinos
+
+
+# Caja de una rama sin nodos: neutra para la unión de cajas
+_CAJA_VACIA = (math.inf, -math.inf, math.inf, -math.inf)
+
+
+class ArbolKD:
+    """Árbol k-d (2-d) de los nodos disponibles, con retirada, para buscar el más cercano.
+
+    Se construye una sola vez, equilibrado por la mediana, con hojas de como
+    mucho `tamano_hoja` nodos. Cada nodo del árbol cuenta los nodos disponibles
+    que contiene: al retirar uno se descuenta en su camino a la raíz, y la
+    búsqueda descarta enseguida las ramas vacías. Así las consultas siguen
+    siendo rápidas aunque se hayan visitado ya todos los nodos de alrededor
+    (por ejemplo, en el greedy, que vuelve una y otra vez al almacén).
+    """
+
+    def __init__(self, x, y, disponibles=None, tamano_hoja=8):
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self._xs = self.x.tolist()
+        self._ys = self.y.tolist()
+        nodos = np.arange(len(self.x)) if disponibles is None else np.flatnonzero(disponibles)
+        self.activos = len(nodos)
+
+        # Árbol en listas paralelas; la raíz es el 0. Las hojas tienen eje -1
+        self._eje = []
+        self._izquierda = []
+        self._derecha = []
+        self._padre = []
+        self._cuenta = []
+        self._caja = []  # (x mínima, x máxima, y mínima, y máxima) de los nodos de cada rama
+        self._hojas = []
+        self._hoja_de = {}
+        pendientes = [(nodos, -1, False)]
+        while pendientes:
+            grupo, padre, es_derecha = pendientes.pop()
+            t = len(self._eje)
+            self._padre.append(padre)
+            self._cuenta.append(len(grupo))
+            if padre >= 0:
+                (self._derecha if es_derecha else self._izquierda)[padre] = t
+            xs = self.x[grupo]
+            ys = self.y[grupo]
+            self._caja.append((float(xs.min()), float(xs.max()), float(ys.min()), float(ys.max()))
+                              if len(grupo) else _CAJA_VACIA)
+            if len(grupo) <= tamano_hoja:
+                hoja = grupo.tolist()
+                self._eje.append(-1)
+                self._izquierda.append(-1)
+                self._derecha.append(-1)
+                self._hojas.append(hoja)
+                for nodo in hoja:
+                    self._hoja_de[nodo] = t
+                continue
+            eje = 0 if xs.max() - xs.min() >= ys.max() - ys.min() else 1
+            valores = xs if eje == 0 else ys
+            medio = len(grupo) // 2
+            particion = np.argpartition(valores, medio)
+            self._eje.append(eje)
+            self._izquierda.append(-1)
+            self._derecha.append(-1)
+            self._hojas.append(None)
+            pendientes.append((grupo[particion[:medio]], t, False))
+            pendientes.append((grupo[particion[medio:]], t, True))
+
+    def __len__(self):
+        return self.activos
+
+    def retirar(self, nodo):
+        """Quita un nodo de los disponibles"""
+        t = self._hoja_de.pop(nodo)
+        hoja = self._hojas[t]
+        hoja.remove(nodo)
+        xs = self._xs
+        ys = self._ys
+        caja = self._caja
+        cuenta = self._cuenta
+        if hoja:
+            caja[t] = (min(xs[otro] for otro in hoja), max(xs[otro] for otro in hoja),
+                       min(ys[otro] for otro in hoja), max(ys[otro] for otro in hoja))
+        else:
+            caja[t] = _CAJA_VACIA
+        # Las cajas se ajustan a los nodos que quedan, mientras cambien, hacia la raíz
+        ajustar = True
+        cuenta[t] -= 1
+        t = self._padre[t]
+        while t >= 0:
+            cuenta[t] -= 1
+            if ajustar:
+                izquierda = caja[self._izquierda[t]]
+                derecha = caja[self._derecha[t]]
+                nueva = (min(izquierda[0], derecha[0]), max(izquierda[1], derecha[1]),
+                         min(izquierda[2], derecha[2]), max(izquierda[3], derecha[3]))
+                ajustar = nueva != caja[t]
+                caja[t] = nueva
+            t = self._padre[t]
+        self.activos -= 1
+
+    def mas_cercano(self, nodo):
+        """Devuelve el nodo disponible más cercano a `nodo` (distinto de él), o None si no queda ninguno"""
+        if self.activos == 0:
+            return None
+        xs = self._xs
+        ys = self._ys
+        qx = xs[nodo]
+        qy = ys[nodo]
+        eje = self._eje
+        cuenta = self._cuenta
+        caja = self._caja
+        izquierda = self._izquierda
+        derecha = self._derecha
+        hojas = self._hojas
+        mejor = None
+        mejor_d2 = math.inf
+        # Pila de (nodo del árbol, cota inferior de la distancia² a su caja)
+        pila = [(0, 0.0)]
+        while pila:
+            t, cota = pila.pop()
+            if cota >= mejor_d2 or cuenta[t] == 0:
+                continue
+            if eje[t] < 0:
+                for otro in hojas[t]:
+                    if otro == nodo:
+                        continue
+                    dx = xs[otro] - qx
+                    dy = ys[otro] - qy
+                    d2 = dx * dx + dy * dy
+                    if d2 < mejor_d2:
+                        mejor_d2 = d2
+                        mejor = otro
+                continue
+            cotas = []
+            for hijo in (izquierda[t], derecha[t]):
+                if cuenta[hijo]:
+                    x_min, x_max, y_min, y_max = caja[hijo]
+                    dx = x_min - qx if qx < x_min else (qx - x_max if qx > x_max else 0.0)
+                    dy = y_min - qy if qy < y_min else (qy - y_max if qy > y_max else 0.0)
+                    cotas.append((dx * dx + dy * dy, hijo))
+            # Se apila primero la rama más lejana para visitar antes la cercana
+            cotas.sort(reverse=True)
+            for cota_hijo, hijo in cotas:
+                if cota_hijo < mejor_d2:
+                    pila.append((hijo, cota_hijo))
+        return mejor
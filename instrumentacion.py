@@ -0,0 +1,295 @@
+"""Instrumentación de las resoluciones: tiempos por fase, contadores y perfilado opcional.
+
+Cada problema (`TSPGenerico`, `TSPCapacidad`) tiene un atributo
+`instrumentacion`. Por defecto es `SIN_INSTRUMENTACION`, cuyas operaciones
+no hacen nada: los métodos `resolver_*` solo consultan un atributo y las
+fases usan un gestor de contexto vacío compartido, así que puede quedarse
+siempre en el código. Con una `Instrumentacion` activa se miden:
+
+- el tiempo de cada fase (construcción, mejora, `evaluar_ruta`, registros,
+  conversión a etiquetas...), total y propio (sin el de las fases anidadas);
+- contadores (movimientos evaluados y aceptados, pasadas, nodos examinados
+  y, si se pide, consultas a las distancias);
+- opcionalmente, un perfil de cProfile y el pico de memoria de tracemalloc.
+
+Uso:
+    tsp.instrumentacion = Instrumentacion(perfilar=True)
+    tsp.resolver_3opt()
+    print(tsp.instrumentacion.informe())
+"""
+import cProfile
+import functools
+import pstats
+import time
+import tracemalloc
+from contextlib import nullcontext
+
+# Funciones del perfil que se conservan en el informe, por tiempo acumulado
+MAX_FUNCIONES_PERFIL = 20
+
+_SIN_FASE = nullcontext()
+
+
+class _Inactiva:
+    """Instrumentación desactivada: todas las operaciones son vacías"""
+
+    activa = False
+
+    def fase(self, nombre):
+        return _SIN_FASE
+
+    def contar(self, nombre, cantidad=1):
+        pass
+
+    def sesion(self, problema=None):
+        return _SIN_FASE
+
+
+SIN_INSTRUMENTACION = _Inactiva()
+
+
+class FilaContada:
+    """Fila de distancias que cuenta cada consulta `fila[j]`"""
+
+    __slots__ = ("fila", "contadores")
+
+    def __init__(self, fila, contadores):
+        self.fila = fila
+        self.contadores = contadores
+
+    def __len__(self):
+        return len(self.fila)
+
+    def __getitem__(self, j):
+        self.contadores["consultas_distancia"] += 1
+        return self.fila[j]
+
+
+class DistanciasContadas:
+    """Envoltorio de unas distancias que cuenta las consultas individuales y vectorizadas.
+
+    Solo se usa con `contar_distancias`, porque cada consulta pasa por Python:
+    ralentiza notablemente los bucles de mejora.
+    """
+
+    def __init__(self, distancias, contadores):
+        self.distancias = distancias
+        self.contadores = contadores
+
+    def __len__(self):
+        return len(self.distancias)
+
+    def __getitem__(self, i):
+        return FilaContada(self.distancias[i], self.contadores)
+
+    def pares(self, i, j):
+        resultado = self.distancias.pares(i, j)
+        self.contadores["consultas_distancia"] += resultado.size
+        return resultado
+
+    def __getattr__(self, nombre):
+        return getattr(self.distancias, nombre)
+
+
+def sin_contar(distancias):
+    """Distancias originales, sin el envoltorio que cuenta las consultas (si lo tienen)"""
+    return distancias.distancias if isinstance(distancias, DistanciasContadas) else distancias
+
+
+class _Fase:
+    """Gestor de contexto que mide una fase y descuenta su tiempo de la fase que la contiene"""
+
+    __slots__ = ("instrumentacion", "nombre", "inicio", "anidado")
+
+    def __init__(self, instrumentacion, nombre):
+        self.instrumentacion = instrumentacion
+        self.nombre = nombre
+
+    def __enter__(self):
+        self.anidado = 0.0
+        self.instrumentacion._pila.append(self)
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *excepcion):
+        duracion = time.perf_counter() - self.inicio
+        instrumentacion = self.instrumentacion
+        instrumentacion._pila.pop()
+        if instrumentacion._pila:
+            instrumentacion._pila[-1].anidado += duracion
+        fase = instrumentacion.fases.setdefault(self.nombre, [0, 0.0, 0.0])
+        fase[0] += 1
+        fase[1] += duracion
+        fase[2] += duracion - self.anidado
+        return False
+
+
+class Instrumentacion:
+    """Tiempos por fase y contadores de las resoluciones de un problema.
+
+    Con `perfilar` se registra un perfil de cProfile de cada resolución; con
+    `memoria`, el pico de memoria de tracemalloc; con `contar_distancias`, las
+    consultas a las distancias (el problema las usa envueltas en
+    `DistanciasContadas` mientras resuelve). Los valores se acumulan entre
+    resoluciones hasta llamar a `reiniciar`.
+    """
+
+    activa = True
+
+    def __init__(self, perfilar=False, memoria=False, contar_distancias=False):
+        self.perfilar = perfilar
+        self.memoria = memoria
+        self.contar_distancias = contar_distancias
+        self._pila = []
+        self._profundidad = 0
+        self._perfilador = None
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Pone a cero tiempos, contadores, perfil y memoria"""
+        self.fases = {}  # nombre -> [llamadas, tiempo total, tiempo propio]
+        self.contadores = {"consultas_distancia": 0}
+        self.tiempo_total = 0.0
+        self.memoria_pico = None
+        self.perfil = None
+
+    def fase(self, nombre):
+        """Gestor de contexto que mide el tiempo de la fase `nombre`"""
+        return _Fase(self, nombre)
+
+    def contar(self, nombre, cantidad=1):
+        """Suma `cantidad` al contador `nombre`"""
+        self.contadores[nombre] = self.contadores.get(nombre, 0) + cantidad
+
+    def sesion(self, problema=None):
+        """Gestor de contexto de una resolución; las anidadas se integran en la más externa.
+
+        La más externa mide el tiempo total y arranca el perfilador y
+        tracemalloc si se han pedido. Con `contar_distancias` y un `problema`,
+        sus distancias se envuelven en `DistanciasContadas` mientras dura.
+        """
+        return _Sesion(self, problema)
+
+    def informe(self):
+        """Informe con el estado actual de la instrumentación"""
+        return Informe(self.tiempo_total, self.fases, self.contadores, self.memoria_pico, self.perfil)
+
+
+class _Sesion:
+    __slots__ = ("instrumentacion", "problema", "distancias", "inicio", "memoria_propia")
+
+    def __init__(self, instrumentacion, problema):
+        self.instrumentacion = instrumentacion
+        self.problema = problema
+        self.distancias = None
+
+    def __enter__(self):
+        instrumentacion = self.instrumentacion
+        if (instrumentacion.contar_distancias and self.problema is not None
+                and not isinstance(self.problema.distancias, DistanciasContadas)):
+            self.distancias = self.problema.distancias
+            self.problema.distancias = DistanciasContadas(self.distancias, instrumentacion.contadores)
+        instrumentacion._profundidad += 1
+        if instrumentacion._profundidad > 1:
+            return self
+        self.memoria_propia = instrumentacion.memoria and not tracemalloc.is_tracing()
+        if self.memoria_propia:
+            tracemalloc.start()
+        elif instrumentacion.memoria:
+            tracemalloc.reset_peak()
+        if instrumentacion.perfilar:
+            instrumentacion._perfilador = cProfile.Profile()
+            instrumentacion._perfilador.enable()
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *excepcion):
+        instrumentacion = self.instrumentacion
+        if self.distancias is not None:
+            self.problema.distancias = self.distancias
+        instrumentacion._profundidad -= 1
+        if instrumentacion._profundidad > 0:
+            return False
+        instrumentacion.tiempo_total += time.perf_counter() - self.inicio
+        if instrumentacion._perfilador is not None:
+            instrumentacion._perfilador.disable()
+            if instrumentacion.perfil is None:
+                instrumentacion.perfil = pstats.Stats(instrumentacion._perfilador)
+            else:
+                instrumentacion.perfil.add(instrumentacion._perfilador)
+            instrumentacion._perfilador = None
+        if instrumentacion.memoria:
+            pico = tracemalloc.get_traced_memory()[1]
+            instrumentacion.memoria_pico = max(instrumentacion.memoria_pico or 0, pico)
+            if self.memoria_propia:
+                tracemalloc.stop()
+        return False
+
+
+def instrumentado(fase, contar_distancias=True):
+    """Decorador de los métodos `resolver_*`: los ejecuta como una sesión y una fase de la instrumentación.
+
+    Con la instrumentación desactivada solo añade la consulta de
+    `self.instrumentacion.activa`. `contar_distancias=False` es para los
+    métodos que reparten el trabajo entre procesos, que necesitan las
+    distancias originales.
+    """
+    def decorador(metodo):
+        @functools.wraps(metodo)
+        def envoltura(self, *args, **kwargs):
+            instrumentacion = self.instrumentacion
+            if not instrumentacion.activa:
+                return metodo(self, *args, **kwargs)
+            with instrumentacion.sesion(self if contar_distancias else None), instrumentacion.fase(fase):
+                return metodo(self, *args, **kwargs)
+        return envoltura
+    return decorador
+
+
+class Informe:
+    """Resultado de la instrumentación: tiempos por fase, contadores, memoria y perfil"""
+
+    def __init__(self, tiempo_total, fases, contadores, memoria_pico=None, perfil=None):
+        self.tiempo_total = tiempo_total
+        self.fases = {nombre: {"llamadas": llamadas, "tiempo": total, "tiempo_propio": propio}
+                      for nombre, (llamadas, total, propio) in fases.items()}
+        self.contadores = {nombre: valor for nombre, valor in contadores.items() if valor}
+        self.memoria_pico = memoria_pico
+        self.perfil = perfil
+
+    def funciones_perfil(self, limite=MAX_FUNCIONES_PERFIL):
+        """Funciones con más tiempo acumulado del perfil: (función, llamadas, tiempo propio, acumulado)"""
+        if self.perfil is None:
+            return []
+        filas = []
+        for (fichero, linea, funcion), (_, llamadas, propio, acumulado, _) in self.perfil.stats.items():
+            filas.append((f"{fichero}:{linea}({funcion})", llamadas, propio, acumulado))
+        filas.sort(key=lambda fila: fila[3], reverse=True)
+        return filas[:limite]
+
+    def como_diccionario(self):
+        """Informe como diccionario serializable en JSON"""
+        informe = {"tiempo_total": self.tiempo_total, "fases": self.fases, "contadores": self.contadores}
+        if self.memoria_pico is not None:
+            informe["memoria_pico"] = self.memoria_pico
+        if self.perfil is not None:
+            informe["perfil"] = [{"funcion": funcion, "llamadas": llamadas, "tiempo_propio": propio,
+                                  "tiempo_acumulado": acumulado}
+                                 for funcion, llamadas, propio, acumulado in self.funciones_perfil()]
+        return informe
+
+    def __str__(self):
+        lineas = [f"Tiempo total: {self.tiempo_total:.4f} s"]
+        if self.fases:
+            ancho = max(len(nombre) for nombre in self.fases)
+            lineas.append(f"{'Fase':<{ancho}}  {'llamadas':>9}  {'total (s)':>10}  {'propio (s)':>10}")
+            for nombre, fase in sorted(self.fases.items(), key=lambda par: -par[1]["tiempo_propio"]):
+                lineas.append(f"{nombre:<{ancho}}  {fase['llamadas']:>9}  {fase['tiempo']:>10.4f}  "
+                              f"{fase['tiempo_propio']:>10.4f}")
+        for nombre, valor in self.contadores.items():
+            lineas.append(f"{nombre}: {valor}")
+        if self.memoria_pico is not None:
+            lineas.append(f"Memoria pico: {self.memoria_pico / 1024 ** 2:.2f} MB")
+        for funcion, llamadas, propio, acumulado in self.funciones_perfil():
+            lineas.append(f"  {acumulado:10.4f} s {propio:10.4f} s {llamadas:>9}  {funcion}")
+        return "\n".join(lineas)
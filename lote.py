@@ -0,0 +1,320 @@
+"""Resolución por lotes sin menú interactivo.
+
+Cada instancia es un diccionario (un objeto JSON) con estos campos, todos
+opcionales salvo los que hagan falta para construir el problema:
+
+    id            identificador que se copia en el resultado
+    variante      "generico" (por defecto) o "capacidad"
+    fichero       instancia en formato binario (.tspb), TSPLIB (.tsp, .atsp) o CVRPLIB
+                  (.vrp); fija distancias, demandas y capacidad
+    num_nodos     tamaño de la instancia generada si no se da `distancias`
+    semilla       semilla de la generación y de los algoritmos aleatorios
+    distancias    matriz de distancias (lista de listas)
+    coordenadas   coordenadas (x, y) de los nodos: distancias euclídeas bajo demanda
+    euclidea      si es true y no hay coordenadas, se generan al azar con la semilla
+    capacidad     capacidad del camión (variante con capacidad, 100 por defecto)
+    demandas      demandas de cada nodo, con 0 en el almacén
+    algoritmo     nombre del método sin el prefijo `resolver_` (p. ej. "3opt"); por
+                  defecto "3opt", "vecino_mas_cercano" con distancias asimétricas
+                  (ATSP) o "busqueda_local" con capacidad
+    tiempo_limite segundos; al agotarse se devuelve la mejor solución hallada y el
+                  resultado lleva `interrupcion`
+    parametros    argumentos adicionales para el método de resolución
+    instrumentar  true para añadir al resultado los tiempos por fase y los contadores, o
+                  un objeto con las opciones de `Instrumentacion` (perfilar, memoria,
+                  contar_distancias)
+
+Los resultados se escriben como JSON Lines: un objeto por instancia, en el
+mismo orden, en cuanto se resuelve cada una. El proceso se mantiene vivo
+entre instancias, así que los módulos se importan una sola vez.
+
+Uso:
+    python main.py lote instancias.jsonl --salida resultados.jsonl
+    python main.py lote --nodos 200 --cantidad 10 --semilla 1 --algoritmo tabu --tiempo-limite 2
+    cat instancias.jsonl | python main.py lote - > resultados.jsonl
+    python main.py lote grande.tspb --algoritmo vecino_mas_cercano
+    python main.py lote berlin52.tsp X-n101-k25.vrp
+    python main.py lote --nodos 500 --algoritmo 3opt --instrumentar --perfilar
+    python main.py lote instancias.jsonl --cache cache/
+"""
+import argparse
+import contextlib
+import inspect
+import itertools
+import json
+import random
+import sys
+import time
+from tsp_generico import TSPGenerico
+from tsp_capacidad import TSPCapacidad
+from distancias_euclideas import DistanciasEuclideas
+from formato_binario import abrir_instancia, cargar_instancia
+from tsplib import cargar_tsplib, leer_cabecera
+from instrumentacion import Instrumentacion
+from cache_soluciones import CacheSoluciones
+from solucion import a_json
+
+# Extensiones de los ficheros de instancia que no son JSON
+EXTENSIONES_TSPLIB = (".tsp", ".atsp", ".vrp")
+EXTENSIONES_INSTANCIA = (".tspb",) + EXTENSIONES_TSPLIB
+
+VARIANTES = {"generico": TSPGenerico, "capacidad": TSPCapacidad}
+ALGORITMO_DEFECTO = {"generico": "3opt", "capacidad": "busqueda_local"}
+# 2-opt, Or-opt y 3-opt no admiten distancias asimétricas (ver `TSPGenerico.exigir_simetrica`)
+ALGORITMO_DEFECTO_ASIMETRICO = "vecino_mas_cercano"
+
+
+def algoritmos_disponibles(variante):
+    """Nombres de los métodos `resolver_*` de la variante, sin el prefijo"""
+    clase = VARIANTES[variante]
+    return sorted(nombre[len("resolver_"):] for nombre in dir(clase) if nombre.startswith("resolver_"))
+
+
+def _variante(instancia):
+    """Variante de una instancia; la de un fichero se deduce de si tiene demandas (o es CVRP)"""
+    fichero = instancia.get("fichero")
+    if "variante" not in instancia and fichero:
+        if fichero.lower().endswith(EXTENSIONES_TSPLIB):
+            return "capacidad" if leer_cabecera(fichero).get("TYPE", "").upper().startswith("CVRP") else "generico"
+        return "generico" if abrir_instancia(fichero)["demandas"] is None else "capacidad"
+    return instancia.get("variante", "generico")
+
+
+def crear_problema(instancia):
+    """Construye el TSPGenerico o TSPCapacidad descrito por una instancia"""
+    fichero = instancia.get("fichero")
+    if fichero:
+        if fichero.lower().endswith(EXTENSIONES_TSPLIB):
+            return cargar_tsplib(fichero, instancia.get("semilla"))
+        return cargar_instancia(fichero, instancia.get("semilla"))
+    variante = instancia.get("variante", "generico")
+    if variante not in VARIANTES:
+        raise ValueError(f"Variante desconocida: {variante}")
+    num_nodos = instancia.get("num_nodos", 12)
+    distancias = instancia.get("distancias")
+    coordenadas = instancia.get("coordenadas")
+    semilla = instancia.get("semilla")
+    if distancias is None and coordenadas is None and instancia.get("euclidea"):
+        distancias = DistanciasEuclideas.aleatoria(num_nodos, semilla=semilla)
+    if variante == "generico":
+        return TSPGenerico(num_nodos, distancias=distancias, semilla=semilla, coordenadas=coordenadas)
+    return TSPCapacidad(num_nodos, instancia.get("capacidad", 100), demandas=instancia.get("demandas"),
+                        distancias=distancias, semilla=semilla, coordenadas=coordenadas)
+
+
+def resolver_instancia(instancia, algoritmo=None, tiempo_limite=None, instrumentar=None, cancelacion=None,
+                       progreso=None, redirigir_salida=True, cache=None):
+    """Resuelve una instancia y devuelve su resultado como diccionario serializable.
+
+    `algoritmo`, `tiempo_limite` e `instrumentar` se usan cuando la instancia no los indica.
+    `cancelacion` y `progreso` se pasan al método de resolución (ver
+    `TSPGenerico.resolver_fuerza_bruta`). Con `redirigir_salida` los mensajes
+    de los algoritmos van a la salida de errores; desde varios hilos a la vez
+    no debe usarse, porque `sys.stdout` es global. Con una `CacheSoluciones`
+    en `cache` se reutilizan las soluciones de instancias ya resueltas.
+    Los errores no se propagan: el resultado lleva un campo `error`, para que
+    un lote no se detenga por una instancia incorrecta. Lo mismo con las
+    líneas ilegibles, que `leer_instancias` entrega como la excepción en
+    lugar de la instancia.
+    """
+    if isinstance(instancia, Exception):
+        return {"id": None, "error": f"{type(instancia).__name__}: {instancia}"}
+    if not isinstance(instancia, dict):
+        return {"id": None, "error": f"TypeError: Instancia que no es un objeto JSON: {type(instancia).__name__}"}
+    resultado = {"id": instancia.get("id")}
+    try:
+        variante = resultado["variante"] = _variante(instancia)
+        algoritmo = resultado["algoritmo"] = instancia.get("algoritmo") or algoritmo
+        tsp = crear_problema(instancia)
+        if not algoritmo:
+            algoritmo = ALGORITMO_DEFECTO.get(variante)
+            if variante == "generico" and not tsp.distancias.es_simetrica():
+                algoritmo = ALGORITMO_DEFECTO_ASIMETRICO
+            resultado["algoritmo"] = algoritmo
+        tsp.cache = cache
+        instrumentar = instancia.get("instrumentar", instrumentar)
+        if instrumentar:
+            tsp.instrumentacion = Instrumentacion(**(instrumentar if isinstance(instrumentar, dict) else {}))
+        metodo = getattr(tsp, "resolver_" + algoritmo, None)
+        if metodo is None:
+            raise ValueError(f"Algoritmo desconocido: {algoritmo}")
+        parametros = dict(instancia.get("parametros") or {})
+        limite = instancia.get("tiempo_limite", tiempo_limite)
+        aceptados = inspect.signature(metodo).parameters
+        for nombre, valor in (("tiempo_limite", limite), ("cancelacion", cancelacion), ("progreso", progreso)):
+            if valor is not None and nombre in aceptados:
+                parametros.setdefault(nombre, valor)
+
+        # Los mensajes que imprimen los algoritmos no deben mezclarse con los resultados
+        with contextlib.redirect_stdout(sys.stderr) if redirigir_salida else contextlib.nullcontext():
+            inicio = time.perf_counter()
+            metodo(**parametros)
+            segundos = time.perf_counter() - inicio
+    except Exception as error:
+        resultado["error"] = f"{type(error).__name__}: {error}"
+        return resultado
+
+    resultado["num_nodos"] = tsp.num_nodos
+    resultado["semilla"] = instancia.get("semilla")
+    resultado["tiempo"] = segundos
+    if tsp.instrumentacion.activa:
+        resultado["instrumentacion"] = tsp.instrumentacion.informe().como_diccionario()
+    if tsp.mejor_ruta_indices is None:
+        resultado["error"] = "El algoritmo no ha encontrado solución para esta instancia"
+        return resultado
+    if tsp.interrupcion is not None:
+        resultado["interrupcion"] = tsp.interrupcion
+    resultado["distancia"] = tsp.mejor_distancia
+    resultado["ruta"] = tsp.mejor_ruta
+    if getattr(tsp, "cota_inferior", None) is not None:
+        resultado["cota_inferior"] = tsp.cota_inferior
+        resultado["gap"] = tsp.gap
+    if variante == "capacidad":
+        resultado["capacidad"] = tsp.capacidad_camion
+        resultado["entregas"] = tsp.entregas_realizadas.como_diccionarios(tsp.etiquetas)
+        resultado["regresos"] = len(tsp.regresos_almacen)
+        if algoritmo == "flota":
+            resultado["makespan"] = tsp.makespan
+            resultado["vehiculos"] = [{"capacidad": ruta["capacidad"], "viajes": ruta["viajes"],
+                                       "distancia": ruta["distancia"]} for ruta in tsp.rutas_flota]
+    return resultado
+
+
+def resolver_lote(instancias, algoritmo=None, tiempo_limite=None, instrumentar=None, cache=None):
+    """Resuelve una secuencia (o un flujo) de instancias, devolviendo cada resultado en cuanto está listo"""
+    for instancia in instancias:
+        yield resolver_instancia(instancia, algoritmo, tiempo_limite, instrumentar, cache=cache)
+
+
+def leer_instancias(fichero):
+    """Lee instancias de un fichero abierto: JSON Lines, o un único documento JSON (objeto o lista).
+
+    Las líneas JSON se leen de una en una, de modo que se puede resolver un
+    flujo (por ejemplo, la entrada estándar) sin esperar a que termine. Una
+    línea que no es JSON no detiene la lectura: en su lugar se entrega el
+    error, que `resolver_instancia` convierte en un resultado con error.
+    """
+    primera = ""
+    numero = 0
+    for numero, linea in enumerate(fichero, 1):
+        if linea.strip():
+            primera = linea
+            break
+    if not primera:
+        return
+    try:
+        documento = json.loads(primera)
+    except json.JSONDecodeError as error_primera:
+        resto = fichero.read()
+        try:
+            # Un documento JSON repartido en varias líneas
+            documento = json.loads(primera + resto)
+        except json.JSONDecodeError:
+            # JSON Lines con la primera línea incorrecta
+            yield _linea_ilegible(error_primera, numero)
+            yield from _leer_lineas(resto.splitlines(), numero + 1)
+            return
+    yield from (documento if isinstance(documento, list) else [documento])
+    yield from _leer_lineas(fichero, numero + 1)
+
+
+def _leer_lineas(lineas, primera):
+    """Instancias de las líneas JSON no vacías; numeradas desde `primera` para los errores"""
+    for numero, linea in enumerate(lineas, primera):
+        if linea.strip():
+            try:
+                yield json.loads(linea)
+            except json.JSONDecodeError as error:
+                yield _linea_ilegible(error, numero)
+
+
+def _linea_ilegible(error, numero):
+    return ValueError(f"Línea {numero} ilegible: {error}")
+
+
+def generar_instancias(variante, num_nodos, cantidad, semilla=None, capacidad=100, euclidea=False):
+    """Genera descripciones de instancias aleatorias reproducibles a partir de una semilla"""
+    rng = random.Random(semilla)
+    for numero in range(cantidad):
+        instancia = {"id": numero, "variante": variante, "num_nodos": num_nodos, "semilla": rng.getrandbits(32)}
+        if variante == "capacidad":
+            instancia["capacidad"] = capacidad
+        if euclidea:
+            instancia["euclidea"] = True
+        yield instancia
+
+
+def escribir_resultados(resultados, salida):
+    """Escribe cada resultado como una línea JSON y la vuelca enseguida"""
+    for resultado in resultados:
+        salida.write(json.dumps(resultado, ensure_ascii=False, default=a_json) + "\n")
+        salida.flush()
+
+
+def _instancias_de_ficheros(nombres):
+    for nombre in nombres:
+        if nombre == "-":
+            yield from leer_instancias(sys.stdin)
+        elif nombre.lower().endswith(EXTENSIONES_INSTANCIA):
+            yield {"id": nombre, "fichero": nombre}
+        else:
+            with open(nombre, encoding="utf-8") as fichero:
+                yield from leer_instancias(fichero)
+
+
+def principal(argumentos=None):
+    """Punto de entrada de la línea de comandos del modo por lotes"""
+    parser = argparse.ArgumentParser(prog="main.py lote",
+                                     description="Resuelve instancias del TSP sin interacción y "
+                                                 "escribe los resultados como JSON Lines.")
+    parser.add_argument("ficheros", nargs="*",
+                        help="ficheros de instancias (JSON, JSON Lines, binarios .tspb o TSPLIB/CVRPLIB); "
+                             "'-' para la entrada estándar")
+    parser.add_argument("--variante", choices=sorted(VARIANTES), default="generico",
+                        help="variante de las instancias generadas")
+    parser.add_argument("--nodos", type=int, help="genera instancias aleatorias de este tamaño")
+    parser.add_argument("--cantidad", type=int, default=1, help="número de instancias generadas")
+    parser.add_argument("--capacidad", type=int, default=100, help="capacidad del camión de las instancias generadas")
+    parser.add_argument("--semilla", type=int, help="semilla de las instancias generadas")
+    parser.add_argument("--euclidea", action="store_true",
+                        help="genera nodos con coordenadas (sin matriz de distancias)")
+    parser.add_argument("--algoritmo", help="algoritmo por defecto (nombre sin 'resolver_')")
+    parser.add_argument("--tiempo-limite", type=float, help="segundos por instancia, si el algoritmo lo admite")
+    parser.add_argument("--instrumentar", action="store_true",
+                        help="añade a cada resultado los tiempos por fase y los contadores")
+    parser.add_argument("--perfilar", action="store_true",
+                        help="con --instrumentar, añade también el perfil de cProfile y la memoria pico")
+    parser.add_argument("--cache", metavar="DIRECTORIO",
+                        help="guarda las soluciones en este directorio y reutiliza las de instancias ya resueltas")
+    parser.add_argument("--salida", help="fichero de resultados (por defecto, la salida estándar)")
+    parser.add_argument("--listar", action="store_true", help="muestra los algoritmos disponibles y termina")
+    args = parser.parse_args(argumentos)
+
+    if args.listar:
+        for variante in sorted(VARIANTES):
+            print(f"{variante}: {', '.join(algoritmos_disponibles(variante))}")
+        return 0
+    if not args.ficheros and args.nodos is None:
+        parser.error("indique ficheros de instancias o --nodos para generarlas")
+
+    instancias = _instancias_de_ficheros(args.ficheros)
+    if args.nodos is not None:
+        generadas = generar_instancias(args.variante, args.nodos, args.cantidad, args.semilla, args.capacidad,
+                                       args.euclidea)
+        instancias = generadas if not args.ficheros else itertools.chain(instancias, generadas)
+
+    instrumentar = None
+    if args.instrumentar or args.perfilar:
+        instrumentar = {"perfilar": True, "memoria": True} if args.perfilar else True
+    cache = None if args.cache is None else CacheSoluciones(directorio=args.cache)
+    resultados = resolver_lote(instancias, args.algoritmo, args.tiempo_limite, instrumentar, cache)
+    if args.salida is None:
+        escribir_resultados(resultados, sys.stdout)
+    else:
+        with open(args.salida, "w", encoding="utf-8") as salida:
+            escribir_resultados(resultados, salida)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(principal())
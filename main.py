@@ -1,9 +1,11 @@
 import os
+import sys
 import time
 import random
 from tsp_generico import TSPGenerico
 from tsp_capacidad import TSPCapacidad
-from utils import validar_entrada, mostrar_matriz, generar_etiquetas
+from instrumentacion import Instrumentacion
+from utils import validar_entrada, generar_etiquetas, paginar_matriz, MAX_NODOS_MATRIZ_COMPLETA
 
 
 def limpiar_pantalla():
@@ -24,6 +26,34 @@ def mostrar_menu():
     print("=" * 60)
 
 
+def ofrecer_paginar_matriz(tsp):
+    """Si la matriz solo se ha mostrado resumida, ofrece recorrerla completa por páginas"""
+    if tsp.num_nodos <= MAX_NODOS_MATRIZ_COMPLETA:
+        return
+    if input("\n¿Desea recorrer la matriz completa por páginas? (s/N): ").strip().lower() == "s":
+        paginar_matriz(tsp.distancias, tsp.etiquetas)
+
+
+def mostrar_convergencia(traza):
+    """Muestra la traza de convergencia (segundos, mejor distancia) de una metaheurística"""
+    print("\nConvergencia (segundos -> mejor distancia):")
+    # Como mucho unas 10 líneas, repartidas a lo largo de la traza
+    paso = max(1, len(traza) // 10)
+    for segundos, distancia in traza[::paso] + ([traza[-1]] if (len(traza) - 1) % paso else []):
+        print(f"  {segundos:8.3f} s -> {distancia} km")
+
+
+def mostrar_progreso(distancia, segundos):
+    """Muestra, en la misma línea, la mejor distancia encontrada hasta el momento"""
+    print(f"\r  {segundos:8.3f} s -> mejor distancia: {distancia}", end="", flush=True)
+
+
+def mostrar_instrumentacion(tsp):
+    """Muestra el desglose del tiempo por fases y los contadores de la resolución"""
+    print("\nDesglose de la resolución:")
+    print(tsp.instrumentacion.informe())
+
+
 def tsp_generico():
     """Función para el TSP genérico"""
     limpiar_pantalla()
@@ -46,36 +76,68 @@ def tsp_generico():
 
     # Crear instancia del TSP genérico
     tsp = TSPGenerico(num_nodos)
+    tsp.instrumentacion = Instrumentacion()
 
     # Mostrar información del problema
     tsp.mostrar_informacion_problema()
+    ofrecer_paginar_matriz(tsp)
 
     # Pausar hasta que el usuario presione Enter
     input("\nPresione Enter para continuar...")
 
     # Seleccionar algoritmo
     print("\nSeleccione el algoritmo de resolución:")
-    print("1. Fuerza Bruta (solo para n ≤ 10)")
+    print("1. Exacto: programación dinámica Held-Karp (solo para n ≤ 22)")
     print("2. Vecino más cercano")
     print("3. Búsqueda local 2-opt")
+    print("4. Búsqueda local Or-opt (segmentos de 1 a 3 nodos)")
+    print("5. Búsqueda local 3-opt (2-opt + inversión y reinserción de segmentos)")
+    print("6. Multiarranque en paralelo (vecino más cercano + 3-opt)")
+    print("7. Recocido simulado (10 segundos)")
+    print("8. Búsqueda tabú (10 segundos)")
+    print("9. Exacto: ramificación y poda con cotas de 1-árbol (hasta 60 segundos)")
 
-    algoritmo = validar_entrada("Opción: ", int, 1, 3)
+    algoritmo = validar_entrada("Opción: ", int, 1, 9)
 
     print("\nResolviendo el problema...")
-    start_time = time.time()
+    start_time = time.perf_counter()
 
     if algoritmo == 1:
-        ruta, distancia = tsp.resolver_fuerza_bruta()
+        ruta, distancia = tsp.resolver_held_karp(progreso=mostrar_progreso)
     elif algoritmo == 2:
-        ruta, distancia = tsp.resolver_vecino_mas_cercano()
+        ruta, distancia = tsp.resolver_vecino_mas_cercano(progreso=mostrar_progreso)
+    elif algoritmo == 3:
+        ruta, distancia = tsp.resolver_2opt(progreso=mostrar_progreso)
+    elif algoritmo == 4:
+        ruta, distancia = tsp.resolver_or_opt(progreso=mostrar_progreso)
+    elif algoritmo == 5:
+        ruta, distancia = tsp.resolver_3opt(progreso=mostrar_progreso)
+    elif algoritmo == 6:
+        ruta, distancia = tsp.resolver_multiarranque(tiempo_limite=10, progreso=mostrar_progreso)
+    elif algoritmo == 7:
+        ruta, distancia = tsp.resolver_recocido_simulado(tiempo_limite=10, progreso=mostrar_progreso)
+    elif algoritmo == 8:
+        ruta, distancia = tsp.resolver_tabu(tiempo_limite=10, progreso=mostrar_progreso)
     else:
-        ruta, distancia = tsp.resolver_2opt()
+        ruta, distancia = tsp.resolver_ramificacion_poda(tiempo_limite=60, progreso=mostrar_progreso)
+
+    end_time = time.perf_counter()
+    print()
 
-    end_time = time.time()
+    if ruta is None:
+        input("\nPresione Enter para continuar...")
+        return
 
     # Mostrar resultados
     tsp.mostrar_resultados()
     print(f"\nTiempo de ejecución: {end_time - start_time:.4f} segundos")
+    mostrar_instrumentacion(tsp)
+    if algoritmo == 1:
+        print(f"Memoria pico: {tsp.memoria_pico / 1024 ** 2:.2f} MB")
+    elif algoritmo in (7, 8):
+        mostrar_convergencia(tsp.traza_convergencia)
+    elif algoritmo == 9:
+        print(f"Cota inferior: {tsp.cota_inferior} (gap {tsp.gap:.2%})")
 
     input("\nPresione Enter para continuar...")
 
@@ -128,9 +190,11 @@ def tsp_capacidad():
 
     # Crear instancia del TSP con capacidad
     tsp = TSPCapacidad(num_nodos, capacidad, demandas)
+    tsp.instrumentacion = Instrumentacion()
 
     # Mostrar información del viaje
     tsp.mostrar_informacion_viaje()
+    ofrecer_paginar_matriz(tsp)
 
     # Pausar hasta que el usuario presione Enter
     input("\nPresione Enter para empezar el viaje...")
@@ -138,23 +202,49 @@ def tsp_capacidad():
     # Seleccionar algoritmo
     print("\nSeleccione el algoritmo de resolución:")
     print("1. Algoritmo Greedy")
-    print("2. Búsqueda Local")
-
-    algoritmo = validar_entrada("Opción: ", int, 1, 2)
+    print("2. Ahorros de Clarke-Wright")
+    print("3. Búsqueda Local")
+    print("4. Multiarranque en paralelo (búsquedas locales independientes)")
+    print("5. Recocido simulado (10 segundos)")
+    print("6. Búsqueda tabú (10 segundos)")
+    print("7. Flota de vehículos (varios camiones a la vez)")
+    print("8. Ruta gigante dividida en viajes (2-opt + división óptima)")
+
+    algoritmo = validar_entrada("Opción: ", int, 1, 8)
+    if algoritmo == 7:
+        num_vehiculos = validar_entrada("Número de vehículos (1-50): ", int, 1, 50)
 
     print("\nResolviendo el problema...")
-    start_time = time.time()
+    start_time = time.perf_counter()
 
     if algoritmo == 1:
-        ruta, distancia, entregas = tsp.resolver_greedy()
+        ruta, distancia, entregas = tsp.resolver_greedy(progreso=mostrar_progreso)
+    elif algoritmo == 2:
+        ruta, distancia, entregas = tsp.resolver_clarke_wright(progreso=mostrar_progreso)
+    elif algoritmo == 3:
+        ruta, distancia, entregas = tsp.resolver_busqueda_local(progreso=mostrar_progreso)
+    elif algoritmo == 4:
+        ruta, distancia, entregas = tsp.resolver_multiarranque(tiempo_limite=10, progreso=mostrar_progreso)
+    elif algoritmo == 5:
+        ruta, distancia, entregas = tsp.resolver_recocido_simulado(tiempo_limite=10, progreso=mostrar_progreso)
+    elif algoritmo == 6:
+        ruta, distancia, entregas = tsp.resolver_tabu(tiempo_limite=10, progreso=mostrar_progreso)
+    elif algoritmo == 7:
+        ruta, distancia, entregas = tsp.resolver_flota(num_vehiculos, tiempo_limite=10, progreso=mostrar_progreso)
     else:
-        ruta, distancia, entregas = tsp.resolver_busqueda_local()
+        ruta, distancia, entregas = tsp.resolver_division_ruta(progreso=mostrar_progreso)
 
-    end_time = time.time()
+    end_time = time.perf_counter()
+    print()
 
     # Mostrar resultados
     tsp.mostrar_resultados()
+    if algoritmo == 7:
+        tsp.mostrar_flota()
     print(f"\nTiempo de ejecución: {end_time - start_time:.4f} segundos")
+    mostrar_instrumentacion(tsp)
+    if algoritmo in (5, 6):
+        mostrar_convergencia(tsp.traza_convergencia)
 
     input("\nPresione Enter para continuar...")
 
@@ -177,4 +267,12 @@ def main():
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "lote":
+        # Modo por lotes, sin menú: python main.py lote --help
+        from lote import principal
+        sys.exit(principal(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "servicio":
+        # Servicio asíncrono por TCP: python main.py servicio --help
+        from servicio import principal
+        sys.exit(principal(sys.argv[2:]))
     main()
\ No newline at end of file
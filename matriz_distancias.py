@@ -0,0 +1,169 @@
+import numpy as np
+
+
+def tipo_compacto(maximo):
+    """Devuelve el tipo entero sin signo más pequeño capaz de representar `maximo`"""
+    for tipo in (np.uint8, np.uint16, np.uint32):
+        if maximo <= np.iinfo(tipo).max:
+            return tipo
+    return np.uint64
+
+
+class MatrizDistancias:
+    """Matriz de distancias respaldada por un array contiguo de NumPy.
+
+    `matriz[i][j]` sigue funcionando como con una lista de listas: cada fila se
+    expone como un memoryview sobre el array, de modo que los bucles en Python
+    puro reciben enteros nativos (sin desbordamiento del tipo compacto) y sin
+    copiar datos. Para operaciones vectorizadas se usa `fila(i)` o `datos`.
+    """
+
+    def __init__(self, datos, compactar=True):
+        datos = np.asarray(datos)
+        if datos.ndim != 2 or datos.shape[0] != datos.shape[1]:
+            raise ValueError("La matriz de distancias debe ser cuadrada")
+        tipo = datos.dtype
+        # Sin `compactar` se usa el array tal cual (p. ej. una proyección en memoria de un fichero)
+        if compactar and tipo.kind in "iu" and (datos.size == 0 or datos.min() >= 0):
+            tipo = tipo_compacto(int(datos.max()) if datos.size else 0)
+        self.datos = np.ascontiguousarray(datos, dtype=tipo)
+        self.num_nodos = len(self.datos)
+        self._filas = [memoryview(fila) for fila in self.datos]
+        # (fichero, desplazamiento) si los datos se han proyectado desde un fichero binario
+        self.origen = None
+        self._simetrica = None  # Se calcula en la primera consulta de `es_simetrica`
+
+    @classmethod
+    def aleatoria(cls, num_nodos, minimo=10, maximo=500, semilla=None):
+        """Genera una matriz simétrica con distancias enteras aleatorias en [minimo, maximo]"""
+        rng = np.random.default_rng(semilla)
+        tipo = tipo_compacto(maximo)
+        valores = rng.integers(minimo, maximo, size=(num_nodos, num_nodos), dtype=tipo, endpoint=True)
+        superior = np.triu(valores, 1)
+        del valores
+        return cls(superior + superior.T)
+
+    def __len__(self):
+        return self.num_nodos
+
+    def __getitem__(self, i):
+        return self._filas[i]
+
+    def fila(self, i):
+        """Devuelve la fila `i` como array de NumPy (vista, sin copia)"""
+        return self.datos[i]
+
+    def pares(self, i, j):
+        """Distancias entre los nodos `i[k]` y `j[k]` (arrays de índices), vectorizado"""
+        return self.datos[i, j]
+
+    def mas_cercano(self, nodo, disponibles):
+        """Devuelve el nodo disponible más cercano a `nodo` (argmin enmascarado), o None"""
+        candidatos = np.flatnonzero(disponibles)
+        if len(candidatos) == 0:
+            return None
+        return int(candidatos[self.datos[nodo, candidatos].argmin()])
+
+    def es_simetrica(self, bloque=256):
+        """Indica si d[i][j] == d[j][i] para todos los pares; se comprueba una vez, por bloques de filas"""
+        if self._simetrica is None:
+            datos = self.datos
+            self._simetrica = all(np.array_equal(datos[inicio:inicio + bloque], datos[:, inicio:inicio + bloque].T)
+                                  for inicio in range(0, self.num_nodos, bloque))
+        return self._simetrica
+
+    def buscador(self, disponibles):
+        """Conjunto de nodos disponibles para consultas repetidas del más cercano, con retirada"""
+        return BuscadorMatriz(self, disponibles)
+
+    def vecinos_cercanos(self, k, bloque=256):
+        """Devuelve, para cada nodo, sus k vecinos más cercanos ordenados por distancia"""
+        n = self.num_nodos
+        k = min(k, n - 1)
+        if k <= 0:
+            return [[] for _ in range(n)]
+        vecinos = np.empty((n, k), dtype=np.int64)
+        tope = np.iinfo(np.int64).max
+        # Se procesa por bloques de filas para no duplicar la matriz completa en memoria
+        for inicio in range(0, n, bloque):
+            fin = min(inicio + bloque, n)
+            filas = self.datos[inicio:fin].astype(np.int64 if self.datos.dtype.kind in "iu" else np.float64)
+            filas[np.arange(fin - inicio), np.arange(inicio, fin)] = tope
+            candidatos = np.argpartition(filas, k - 1, axis=1)[:, :k]
+            orden = np.argsort(np.take_along_axis(filas, candidatos, axis=1), axis=1, kind="stable")
+            vecinos[inicio:fin] = np.take_along_axis(candidatos, orden, axis=1)
+        return vecinos.tolist()
+
+    def con_nodo(self, distancias_nodo):
+        """Nueva matriz con un nodo más al final, a `distancias_nodo[j]` de cada nodo j (simétrica).
+
+        Copia la matriz: O(n²), pero una sola copia contigua.
+        """
+        fila = np.asarray(distancias_nodo)
+        if fila.shape != (self.num_nodos,):
+            raise ValueError(f"Se esperaban {self.num_nodos} distancias para el nuevo nodo")
+        tipo = np.promote_types(self.datos.dtype, tipo_compacto(int(fila.max())) if fila.size else np.uint8)
+        n = self.num_nodos
+        datos = np.empty((n + 1, n + 1), dtype=tipo)
+        datos[:n, :n] = self.datos
+        datos[n, :n] = fila
+        datos[:n, n] = fila
+        datos[n, n] = 0
+        return MatrizDistancias(datos, compactar=False)
+
+    def cambiar(self, i, j, distancia):
+        """Cambia la distancia entre i y j (en ambos sentidos) en la propia matriz.
+
+        Si el tipo de la matriz no admite el nuevo valor o la matriz es de
+        solo lectura (proyectada de un fichero), se pasa antes a una copia
+        propia de un tipo que lo admita, como en el constructor: el entero
+        más pequeño que basta o, si la distancia no es entera, coma flotante.
+        """
+        tipo = self.datos.dtype
+        if tipo.kind in "iu":
+            if not float(distancia).is_integer():
+                tipo = np.dtype(np.float64)
+            else:
+                distancia = int(distancia)
+                if not np.iinfo(tipo).min <= distancia <= np.iinfo(tipo).max:
+                    tipo = np.promote_types(tipo, tipo_compacto(distancia) if distancia >= 0 else np.int64)
+        if tipo != self.datos.dtype or not self.datos.flags.writeable:
+            self.datos = np.array(self.datos, dtype=tipo)
+            self._filas = [memoryview(fila) for fila in self.datos]
+            self.origen = None
+        self.datos[i, j] = distancia
+        self.datos[j, i] = distancia
+        if self._simetrica is False:
+            self._simetrica = None  # Quizá era este el único par asimétrico
+
+
+class BuscadorMatriz:
+    """Nodos disponibles de una `MatrizDistancias` con consulta del más cercano por argmin enmascarado.
+
+    Tiene la misma interfaz que el `ArbolKD` que devuelve
+    `DistanciasEuclideas.buscador` (`mas_cercano`, `retirar`, `len`), de
+    modo que los algoritmos constructivos no dependen del tipo de
+    distancias.
+    """
+
+    def __init__(self, distancias, disponibles):
+        self.distancias = distancias
+        self.disponibles = np.array(disponibles, dtype=bool)
+        self.activos = int(self.disponibles.sum())
+
+    def __len__(self):
+        return self.activos
+
+    def mas_cercano(self, nodo):
+        """Devuelve el nodo disponible más cercano a `nodo` (distinto de él), o None"""
+        if self.disponibles[nodo]:
+            self.disponibles[nodo] = False
+            siguiente = self.distancias.mas_cercano(nodo, self.disponibles)
+            self.disponibles[nodo] = True
+            return siguiente
+        return self.distancias.mas_cercano(nodo, self.disponibles)
+
+    def retirar(self, nodo):
+        """Quita un nodo de los disponibles"""
+        self.disponibles[nodo] = False
+        self.activos -= 1
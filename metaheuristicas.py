@@ -0,0 +1,446 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+from busqueda_local import BusquedaLocal
+from evaluador_rutas import EvaluadorIncremental
+
+# Presupuesto por defecto si no se indica ni tiempo ni número de evaluaciones
+MAX_EVALUACIONES_DEFECTO = 100000
+# Evaluaciones o consultas entre dos lecturas del reloj y de la cancelación
+CONSULTAS_POR_LECTURA = 256
+# Segundos mínimos entre dos avisos de progreso
+INTERVALO_PROGRESO = 0.1
+# Proporción de intercambios al azar entre los propuestos con listas de vecinos
+PROPORCION_AL_AZAR = 0.1
+
+
+class Cancelacion:
+    """Señal para detener una resolución desde otro hilo, que devuelve la mejor solución hasta entonces"""
+
+    def __init__(self):
+        self._evento = threading.Event()
+
+    def cancelar(self):
+        self._evento.set()
+
+    @property
+    def cancelada(self):
+        return self._evento.is_set()
+
+
+class Presupuesto:
+    """Límite de ejecución por tiempo de reloj y/o número de movimientos evaluados.
+
+    Además admite una `Cancelacion` y una función `progreso(mejor_costo,
+    segundos)` a la que se avisa de las mejoras (como mucho cada
+    `INTERVALO_PROGRESO` segundos). `evaluaciones_defecto` es el límite de
+    evaluaciones cuando no se indica ni tiempo ni evaluaciones; None para los
+    algoritmos que terminan por sí solos.
+    """
+
+    def __init__(self, tiempo_limite=None, max_evaluaciones=None, cancelacion=None, progreso=None,
+                 evaluaciones_defecto=MAX_EVALUACIONES_DEFECTO):
+        if tiempo_limite is None and max_evaluaciones is None:
+            max_evaluaciones = evaluaciones_defecto
+        self.inicio = time.perf_counter()
+        self.fin = None if tiempo_limite is None else self.inicio + tiempo_limite
+        self.max_evaluaciones = max_evaluaciones
+        self.cancelacion = cancelacion
+        self.progreso = progreso
+        self.evaluaciones = 0
+        self.aceptados = 0  # Movimientos aplicados, incluidos los que empeoran
+        # "tiempo" o "cancelacion" si hay que detenerse antes de terminar
+        self.interrupcion = None
+        self._consultas = 0
+        self._proxima_lectura = 0
+        self._ultimo_aviso = None
+
+    def transcurrido(self):
+        return time.perf_counter() - self.inicio
+
+    def restante(self):
+        """Segundos que quedan hasta el límite de tiempo, o None si no lo hay"""
+        return None if self.fin is None else max(self.fin - time.perf_counter(), 0.0)
+
+    def fraccion(self):
+        """Parte del presupuesto ya consumida, entre 0 y 1"""
+        fraccion = 0.0
+        if self.max_evaluaciones:
+            fraccion = self.evaluaciones / self.max_evaluaciones
+        if self.fin is not None and self.fin > self.inicio:
+            fraccion = max(fraccion, self.transcurrido() / (self.fin - self.inicio))
+        return min(fraccion, 1.0)
+
+    def agotado(self, inmediato=False):
+        """Indica si hay que parar: evaluaciones agotadas, tiempo cumplido o resolución cancelada.
+
+        El reloj y la cancelación se leen cada `CONSULTAS_POR_LECTURA`
+        evaluaciones o llamadas, que es mucho más barato, o siempre con
+        `inmediato` (para los bucles con pocas iteraciones largas). Una vez
+        interrumpido, sigue agotado.
+        """
+        if self.interrupcion is not None:
+            return True
+        if self.max_evaluaciones is not None and self.evaluaciones >= self.max_evaluaciones:
+            return True
+        self._consultas += 1
+        trabajo = self.evaluaciones + self._consultas
+        if not inmediato and trabajo < self._proxima_lectura:
+            return False
+        self._proxima_lectura = trabajo + CONSULTAS_POR_LECTURA
+        if self.cancelacion is not None and self.cancelacion.cancelada:
+            self.interrupcion = "cancelacion"
+        elif self.fin is not None and time.perf_counter() >= self.fin:
+            self.interrupcion = "tiempo"
+        return self.interrupcion is not None
+
+    def informar(self, costo, forzar=False):
+        """Avisa a la función de progreso del mejor coste, salvo que el último aviso sea muy reciente"""
+        if self.progreso is None:
+            return
+        ahora = time.perf_counter()
+        if forzar or self._ultimo_aviso is None or ahora - self._ultimo_aviso >= INTERVALO_PROGRESO:
+            self._ultimo_aviso = ahora
+            self.progreso(costo, ahora - self.inicio)
+
+
+@contextmanager
+def presupuesto_compartido(problema, tiempo_limite=None, cancelacion=None, progreso=None, max_evaluaciones=None,
+                           evaluaciones_defecto=None):
+    """Presupuesto de una resolución de `problema`, compartido con las resoluciones anidadas.
+
+    La resolución más externa crea el `Presupuesto` y lo deja en
+    `problema._presupuesto`, de modo que la construcción de partida de una
+    búsqueda local consume el mismo límite de tiempo y atiende la misma
+    cancelación. Al terminar guarda en `problema.interrupcion` si se detuvo
+    antes de acabar (None, "tiempo" o "cancelacion") y avisa al progreso con
+    la distancia final.
+    """
+    if problema._presupuesto is not None:
+        yield problema._presupuesto
+        return
+    presupuesto = Presupuesto(tiempo_limite, max_evaluaciones, cancelacion, progreso, evaluaciones_defecto)
+    problema._presupuesto = presupuesto
+    try:
+        yield presupuesto
+    finally:
+        problema._presupuesto = None
+    problema.interrupcion = presupuesto.interrupcion
+    if problema.mejor_ruta_indices is not None:
+        presupuesto.informar(problema.mejor_distancia, forzar=True)
+
+
+class MovimientosTour:
+    """Vecindario 2-opt de un tour cíclico (TSP genérico) para las metaheurísticas.
+
+    Un movimiento une un nodo con uno de sus k vecinos más cercanos; su coste se
+    evalúa en O(1) con las cuatro aristas afectadas.
+    """
+
+    def __init__(self, ruta_indices, distancias, vecinos, distancia_inicial=None):
+        self.motor = BusquedaLocal(ruta_indices, distancias, vecinos, distancia_inicial)
+        self.distancias = distancias
+        self.vecinos = vecinos
+
+    @property
+    def costo(self):
+        return self.motor.distancia
+
+    def proponer(self, rng):
+        motor = self.motor
+        a = rng.randrange(motor.n)
+        vecinos = self.vecinos[a]
+        if not vecinos:
+            return None
+        c = vecinos[rng.randrange(len(vecinos))]
+        b = motor.siguiente(a)
+        d = motor.siguiente(c)
+        if c == b or d == a:
+            return None
+        return a, b, c, d
+
+    def origenes(self):
+        """Nodos de los que parten los movimientos (ver `movimientos_desde`)"""
+        return list(range(self.motor.n))
+
+    def movimientos_desde(self, a):
+        """Movimientos que unen `a` con cada uno de sus vecinos más cercanos"""
+        motor = self.motor
+        b = motor.siguiente(a)
+        movimientos = []
+        for c in self.vecinos[a]:
+            d = motor.siguiente(c)
+            if c != b and d != a:
+                movimientos.append((a, b, c, d))
+        return movimientos
+
+    def delta(self, movimiento):
+        a, b, c, d = movimiento
+        distancias = self.distancias
+        return distancias[a][c] + distancias[b][d] - distancias[a][b] - distancias[c][d]
+
+    def factible(self, movimiento):
+        return True
+
+    def aplicar(self, movimiento, delta):
+        self.motor.intercambiar(*movimiento)
+        self.motor.distancia += delta
+
+    def atributos(self, movimiento):
+        return movimiento[0], movimiento[2]
+
+    def solucion(self):
+        return self.motor.ruta_desde(0)
+
+
+class MovimientosCapacidad:
+    """Vecindario de intercambios de visitas de una ruta con capacidad para las metaheurísticas.
+
+    Con listas de `vecinos`, un movimiento lleva la visita de una posición
+    al lado de una visita de uno de sus vecinos más cercanos (intercambiándola
+    con la que ocupa ese lugar); sin ellas se intercambian dos visitas al azar.
+    Aun con listas, una fracción `PROPORCION_AL_AZAR` de los movimientos son
+    intercambios al azar, para no quedar atrapados en soluciones a las que
+    no se llega por vecinos, y si las listas ya cubren todos los nodos solo
+    se usan intercambios al azar. `regreso` es el coste de volver al almacén
+    desde cada nodo.
+    """
+
+    def __init__(self, ruta_indices, distancias, demandas, capacidad, vecinos=None, regreso=None):
+        self.evaluador = EvaluadorIncremental(ruta_indices, distancias, demandas, capacidad, regreso)
+        if vecinos is not None and min(map(len, vecinos), default=0) >= len(vecinos) - 1:
+            vecinos = None
+        self.vecinos = vecinos
+
+    @property
+    def costo(self):
+        return self.evaluador.distancia
+
+    def proponer(self, rng):
+        evaluador = self.evaluador
+        clientes = evaluador.clientes
+        if len(clientes) < 2:
+            return None
+        if self.vecinos is None or rng.random() < PROPORCION_AL_AZAR:
+            i, j = rng.sample(clientes, 2)
+        else:
+            i = clientes[rng.randrange(len(clientes))]
+            vecinos = self.vecinos[evaluador.ruta[i]]
+            visitas = evaluador.visitas.get(vecinos[rng.randrange(len(vecinos))]) if vecinos else None
+            if not visitas:
+                return None
+            j = visitas[rng.randrange(len(visitas))] + rng.choice((-1, 1))
+            if j == i or evaluador.ruta[j] == 0:
+                return None
+        return (i, j) if i < j else (j, i)
+
+    def origenes(self):
+        """Posiciones de las visitas a clientes, de las que parten los movimientos (ver `movimientos_desde`)"""
+        return list(self.evaluador.clientes)
+
+    def movimientos_desde(self, i):
+        """Intercambios que llevan la visita de la posición `i` junto a cada visita de sus vecinos más cercanos
+
+        Sin listas de vecinos, los intercambios con todas las demás visitas.
+        """
+        evaluador = self.evaluador
+        ruta = evaluador.ruta
+        if self.vecinos is None:
+            return [(i, j) if i < j else (j, i) for j in evaluador.clientes if j != i]
+        movimientos = []
+        for vecino in self.vecinos[ruta[i]]:
+            for p in evaluador.visitas.get(vecino, ()):
+                for j in (p - 1, p + 1):
+                    if j != i and ruta[j] != 0:
+                        movimientos.append((i, j) if i < j else (j, i))
+        return movimientos
+
+    def delta(self, movimiento):
+        return self.evaluador.delta_intercambio(*movimiento)
+
+    def factible(self, movimiento):
+        return self.evaluador.intercambio_factible(*movimiento)
+
+    def aplicar(self, movimiento, delta):
+        self.evaluador.aplicar_intercambio(movimiento[0], movimiento[1], delta)
+
+    def atributos(self, movimiento):
+        ruta = self.evaluador.ruta
+        return ruta[movimiento[0]], ruta[movimiento[1]]
+
+    def solucion(self):
+        return list(self.evaluador.ruta)
+
+
+class _Seguimiento:
+    """Guarda la mejor solución y la traza de convergencia (segundos, mejor coste).
+
+    La copia de la mejor solución se hace de forma perezosa: solo antes de
+    aceptar un movimiento que empeora, o al terminar.
+    """
+
+    def __init__(self, vecindario, presupuesto):
+        self.vecindario = vecindario
+        self.presupuesto = presupuesto
+        self.mejor_costo = vecindario.costo
+        self.mejor_solucion = vecindario.solucion()
+        self.sin_guardar = False
+        self.traza = [(0.0, self.mejor_costo)]
+
+    def actualizar(self):
+        self.presupuesto.aceptados += 1
+        costo = self.vecindario.costo
+        if costo < self.mejor_costo:
+            self.mejor_costo = costo
+            self.sin_guardar = True
+            self.traza.append((self.presupuesto.transcurrido(), costo))
+            self.presupuesto.informar(costo)
+
+    def antes_de_empeorar(self):
+        if self.sin_guardar:
+            self.mejor_solucion = self.vecindario.solucion()
+            self.sin_guardar = False
+
+    def resultado(self):
+        self.antes_de_empeorar()
+        return self.mejor_solucion, self.mejor_costo, self.traza
+
+
+def descenso(vecindario, presupuesto):
+    """Aplica movimientos de mejora de `movimientos_desde` hasta un óptimo local (primera mejora).
+
+    Es el punto de partida de las metaheurísticas cuando la construcción
+    no es ya un óptimo local: sin él, el recocido y la búsqueda tabú gastan
+    el presupuesto en mejoras que un descenso encuentra enseguida.
+    Devuelve el número de movimientos aplicados.
+    """
+    aplicados = 0
+    mejora = True
+    while mejora:
+        mejora = False
+        for origen in vecindario.origenes():
+            if presupuesto.agotado():
+                return aplicados
+            for movimiento in vecindario.movimientos_desde(origen):
+                presupuesto.evaluaciones += 1
+                delta = vecindario.delta(movimiento)
+                if delta < 0 and vecindario.factible(movimiento):
+                    # Los demás movimientos del origen ya no son válidos tras aplicar este
+                    vecindario.aplicar(movimiento, delta)
+                    aplicados += 1
+                    mejora = True
+                    break
+    return aplicados
+
+
+def temperatura_inicial_estimada(vecindario, rng, muestras=200, aceptacion=0.05, cuantil=0.1):
+    """Estima la temperatura inicial a partir de una muestra de movimientos que empeoran.
+
+    Se toma el empeoramiento del `cuantil` indicado (no la media, que dominan
+    unos pocos movimientos muy malos) y se busca la temperatura a la que se
+    acepta con probabilidad `aceptacion`.
+    """
+    empeoramientos = []
+    for _ in range(muestras):
+        movimiento = vecindario.proponer(rng)
+        if movimiento is not None:
+            delta = vecindario.delta(movimiento)
+            if delta > 0:
+                empeoramientos.append(delta)
+    if not empeoramientos:
+        return 1.0
+    empeoramientos.sort()
+    referencia = empeoramientos[int(cuantil * (len(empeoramientos) - 1))]
+    return -referencia / math.log(aceptacion)
+
+
+def recocido_simulado(vecindario, rng, presupuesto, temperatura_inicial=None, enfriamiento=None,
+                      iteraciones_por_temperatura=100, temperatura_minima=1e-3):
+    """Recocido simulado con enfriamiento geométrico sobre un vecindario con evaluación delta.
+
+    Con `enfriamiento` la temperatura se multiplica por ese factor cada
+    `iteraciones_por_temperatura` movimientos. Sin él, el enfriamiento se
+    ajusta al presupuesto: la temperatura baja geométricamente desde la
+    inicial hasta la mínima a medida que se consume el tiempo o las
+    evaluaciones, así que el recocido siempre termina en fase de mejora.
+    `temperatura_minima` es relativa a la temperatura inicial.
+    Devuelve (mejor_solucion, mejor_costo, traza).
+    """
+    if temperatura_inicial is None:
+        temperatura_inicial = temperatura_inicial_estimada(vecindario, rng)
+    temperatura_final = temperatura_inicial * temperatura_minima
+    temperatura = temperatura_inicial
+    seguimiento = _Seguimiento(vecindario, presupuesto)
+    en_temperatura = 0
+
+    while not presupuesto.agotado():
+        movimiento = vecindario.proponer(rng)
+        if movimiento is None:
+            presupuesto.evaluaciones += 1
+            continue
+        delta = vecindario.delta(movimiento)
+        presupuesto.evaluaciones += 1
+        if delta <= 0 or rng.random() < math.exp(-delta / temperatura):
+            if vecindario.factible(movimiento):
+                if delta > 0:
+                    seguimiento.antes_de_empeorar()
+                vecindario.aplicar(movimiento, delta)
+                seguimiento.actualizar()
+
+        en_temperatura += 1
+        if en_temperatura >= iteraciones_por_temperatura:
+            en_temperatura = 0
+            if enfriamiento is None:
+                temperatura = temperatura_inicial * temperatura_minima ** presupuesto.fraccion()
+            else:
+                temperatura = max(temperatura * enfriamiento, temperatura_final)
+
+    return seguimiento.resultado()
+
+
+def busqueda_tabu(vecindario, rng, presupuesto, tenencia=10, candidatos=50):
+    """Búsqueda tabú sobre los movimientos de las listas de vecinos.
+
+    En cada iteración se valoran todos los movimientos que parten de
+    `candidatos` orígenes al azar (de todos, si hay menos) y se aplica el
+    mejor que no sea tabú (o que mejore la mejor solución: criterio de
+    aspiración), aunque empeore. La factibilidad, más cara, solo se
+    comprueba en orden de delta hasta dar con el primero válido. Los nodos
+    movidos quedan tabú durante `tenencia` iteraciones.
+    Devuelve (mejor_solucion, mejor_costo, traza).
+    """
+    seguimiento = _Seguimiento(vecindario, presupuesto)
+    origenes = vecindario.origenes()
+    tabu_hasta = {}
+    iteracion = 0
+
+    while not presupuesto.agotado():
+        iteracion += 1
+        elegidos = origenes if len(origenes) <= candidatos else rng.sample(origenes, candidatos)
+        valorados = [(vecindario.delta(movimiento), movimiento)
+                     for origen in elegidos for movimiento in vecindario.movimientos_desde(origen)]
+        presupuesto.evaluaciones += max(len(valorados), 1)
+        valorados.sort(key=lambda valorado: valorado[0])
+        elegido = None
+        mejor_delta = None
+        for delta, movimiento in valorados:
+            es_tabu = any(tabu_hasta.get(nodo, 0) >= iteracion for nodo in vecindario.atributos(movimiento))
+            if es_tabu and vecindario.costo + delta >= seguimiento.mejor_costo:
+                continue
+            if not vecindario.factible(movimiento):
+                continue
+            elegido = movimiento
+            mejor_delta = delta
+            break
+
+        if elegido is None:
+            continue
+        if mejor_delta > 0:
+            seguimiento.antes_de_empeorar()
+        for nodo in vecindario.atributos(elegido):
+            tabu_hasta[nodo] = iteracion + tenencia
+        vecindario.aplicar(elegido, mejor_delta)
+        seguimiento.actualizar()
+
+    return seguimiento.resultado()
@@ -0,0 +1,147 @@
+import os
+import time
+import random
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from multiprocessing import shared_memory
+import numpy as np
+from matriz_distancias import MatrizDistancias
+from distancias_euclideas import DistanciasEuclideas
+from metaheuristicas import Presupuesto, INTERVALO_PROGRESO
+from solucion import ruta_compacta
+
+# Estado de cada proceso trabajador: la matriz compartida y los datos fijos del problema
+_trabajador = {}
+
+
+def _inicializar_trabajador(origen, forma, tipo, euclidea, variante, parametros):
+    """Conecta el trabajador a la matriz (o a las coordenadas) compartida, una vez por proceso.
+
+    `origen` es ("memoria", nombre) para un bloque de memoria compartida o
+    ("fichero", ruta, desplazamiento) para un fichero binario de instancia,
+    que cada trabajador proyecta en memoria en modo de solo lectura.
+    """
+    if origen[0] == "fichero":
+        datos = np.memmap(origen[1], dtype=tipo, mode="r", offset=origen[2], shape=forma)
+    else:
+        memoria = shared_memory.SharedMemory(name=origen[1])
+        datos = np.ndarray(forma, dtype=tipo, buffer=memoria.buf)
+        _trabajador["memoria"] = memoria
+    _trabajador["distancias"] = DistanciasEuclideas(datos) if euclidea else MatrizDistancias(datos, compactar=False)
+    _trabajador["variante"] = variante
+    _trabajador["parametros"] = parametros
+
+
+def estado_trabajador():
+    """Estado del proceso trabajador actual (distancias, variante y parámetros)"""
+    return _trabajador
+
+
+@contextmanager
+def ejecutor_compartido(distancias, max_procesos=None, variante=None, parametros=None):
+    """ProcessPoolExecutor cuyos trabajadores comparten las distancias sin copiarlas en cada tarea.
+
+    La matriz (o las coordenadas, en instancias euclídeas) se copia una sola
+    vez a memoria compartida; si la instancia se cargó de un fichero binario,
+    los trabajadores proyectan ese fichero. Al salir se cancelan las tareas
+    pendientes y se libera la memoria compartida.
+    """
+    euclidea = isinstance(distancias, DistanciasEuclideas)
+    datos = distancias.coordenadas if euclidea else distancias.datos
+    memoria = None
+    if distancias.origen is not None:
+        # Instancia cargada de un fichero binario: los trabajadores lo proyectan directamente
+        origen = ("fichero",) + distancias.origen
+    else:
+        memoria = shared_memory.SharedMemory(create=True, size=max(datos.nbytes, 1))
+        np.ndarray(datos.shape, dtype=datos.dtype, buffer=memoria.buf)[:] = datos
+        origen = ("memoria", memoria.name)
+    try:
+        ejecutor = ProcessPoolExecutor(max_procesos, initializer=_inicializar_trabajador,
+                                       initargs=(origen, datos.shape, datos.dtype.str, euclidea,
+                                                 variante, parametros))
+        try:
+            yield ejecutor
+        finally:
+            ejecutor.shutdown(wait=False, cancel_futures=True)
+    finally:
+        if memoria is not None:
+            memoria.close()
+            memoria.unlink()
+
+
+def _arranque(semilla, fin, max_iteraciones, obligatorio=False):
+    """Ejecuta una construcción más búsqueda local con su propia semilla.
+
+    Un arranque que empieza después de `fin` se descarta, salvo el
+    `obligatorio`; el que empieza a tiempo se detiene al llegar a `fin` con
+    su mejor solución.
+    """
+    restante = None if fin is None else max(fin - time.time(), 0.0)
+    if restante == 0 and not obligatorio:
+        return None
+    distancias = _trabajador["distancias"]
+    if _trabajador["variante"] == "generico":
+        from tsp_generico import TSPGenerico
+        tsp = TSPGenerico(distancias=distancias, semilla=semilla)
+        tsp.resolver_vecino_mas_cercano(tsp.rng.randrange(tsp.num_nodos), tiempo_limite=restante)
+        tsp.resolver_3opt(max_iteraciones, tiempo_limite=None if fin is None else max(fin - time.time(), 0.0))
+    else:
+        from tsp_capacidad import TSPCapacidad
+        tsp = TSPCapacidad(distancias=distancias, semilla=semilla, **_trabajador["parametros"])
+        tsp.resolver_busqueda_local(max_iteraciones, tiempo_limite=restante)
+    return tsp.mejor_ruta_indices, tsp.mejor_distancia
+
+
+def resolver_multiarranque(tsp, num_arranques=8, tiempo_limite=None, max_procesos=None,
+                           max_iteraciones=1000, semilla=None, presupuesto=None):
+    """Lanza `num_arranques` soluciones independientes en un pool de procesos y se queda con la mejor.
+
+    Los trabajadores comparten la matriz de distancias mediante
+    `ejecutor_compartido`, en lugar de serializarla en cada tarea. Si
+    se indica `tiempo_limite` (segundos), al agotarse se devuelve la mejor
+    solución recibida y se descartan los arranques pendientes; los que están
+    en marcha se detienen a la vez con su mejor solución. El `presupuesto`
+    (por defecto, uno con `tiempo_limite`) aporta además la cancelación y el
+    aviso de progreso con cada mejora recibida.
+    """
+    if hasattr(tsp, "capacidad_camion"):
+        variante = "capacidad"
+        # Los caminos de regreso al almacén se calculan aquí una vez, no en cada arranque
+        parametros = {"capacidad_camion": tsp.capacidad_camion, "demandas": list(tsp.demandas),
+                      "caminos_almacen": tsp.caminos_almacen}
+    else:
+        variante = "generico"
+        parametros = {}
+    if presupuesto is None:
+        presupuesto = Presupuesto(tiempo_limite, evaluaciones_defecto=None)
+    restante = presupuesto.restante()
+    fin = None if restante is None else time.time() + restante
+    rng = random.Random(semilla)
+    semillas = [rng.getrandbits(64) for _ in range(num_arranques)]
+    max_procesos = min(max_procesos or os.cpu_count() or 1, num_arranques)
+
+    mejor_ruta_indices = None
+    mejor_distancia = float('inf')
+    with ejecutor_compartido(tsp.distancias, max_procesos, variante, parametros) as ejecutor:
+        # El primer arranque es obligatorio para garantizar al menos una solución
+        pendientes = {ejecutor.submit(_arranque, s, fin, max_iteraciones, i == 0) for i, s in enumerate(semillas)}
+        while pendientes:
+            if mejor_ruta_indices is not None and presupuesto.agotado(inmediato=True):
+                break
+            espera = None if mejor_ruta_indices is None else presupuesto.restante()
+            if presupuesto.cancelacion is not None:
+                # La cancelación llega desde otro hilo: se consulta periódicamente mientras se espera
+                espera = INTERVALO_PROGRESO if espera is None else min(espera, INTERVALO_PROGRESO)
+            terminados, pendientes = wait(pendientes, espera, FIRST_COMPLETED)
+            for futuro in terminados:
+                resultado = futuro.result()
+                if resultado is not None and resultado[1] < mejor_distancia:
+                    mejor_ruta_indices, mejor_distancia = resultado
+                    presupuesto.informar(mejor_distancia)
+
+    tsp.mejor_ruta_indices = ruta_compacta(mejor_ruta_indices)
+    tsp.mejor_distancia = mejor_distancia
+    if variante == "capacidad":
+        _, tsp.entregas_realizadas, tsp.regresos_almacen = tsp.evaluar_ruta(mejor_ruta_indices)
+    return tsp.resultado()
@@ -0,0 +1,342 @@
+"""Ramificación y poda exacta para el TSP genérico con cotas de 1-árbol (Held–Karp).
+
+Un 1-árbol es un árbol generador mínimo de los nodos 1..n-1 más las dos
+aristas más baratas del nodo 0. Todo tour es un 1-árbol, así que el coste
+del mínimo es una cota inferior del óptimo. Con una penalización π por nodo
+(la arista i–j cuesta d[i][j] + π[i] + π[j] y a la cota se le resta 2·Σπ)
+la cota sigue siendo válida, y el ascenso por subgradiente de Held y Karp
+sube π en los nodos de grado 1 y la baja en los de grado mayor que 2 hasta
+que el 1-árbol se parece a un tour: en instancias aleatorias la cota queda
+a un 1 % o menos del óptimo.
+
+La búsqueda ramifica sobre un nodo de grado mayor que 2 del 1-árbol
+(Volgenant y Jonker): con e1 y e2, sus dos aristas más baratas del árbol,
+los hijos prohíben e1; obligan e1 y prohíben e2; u obligan e1 y e2 (y
+prohíben el resto de aristas del nodo). Ninguno contiene el 1-árbol del
+padre y entre los tres cubren todos los tours. Cada hijo parte de las π
+del padre con unas pocas iteraciones de subgradiente. Se expande primero
+el nodo abierto de menor cota (best-first) y, cuando hay `max_abiertos`,
+los hijos se exploran en profundidad, sin que crezca la memoria. Primero
+el mejor apenas llega a hojas, así que cada `INTERVALO_INMERSION` nodos
+se baja en profundidad hasta cerrar la rama por el hijo que más aristas
+obliga (el de menor cota entre iguales), dejando abiertos sus hermanos:
+al fijar el grado de un nodo tras otro, el 1-árbol acaba siendo un tour,
+y esas inmersiones son las que mejoran la ruta de partida. La cota global es la menor de los nodos
+abiertos: al vaciarse, la mejor ruta es óptima; antes, el gap (mejor
+distancia - cota) / mejor distancia indica cuánto podría mejorar todavía.
+"""
+import heapq
+import math
+import numpy as np
+
+# Iteraciones de subgradiente en la raíz (por nodo, con un mínimo) y en cada hijo
+ITERACIONES_RAIZ_POR_NODO = 5
+MIN_ITERACIONES_RAIZ = 100
+ITERACIONES_HIJO = 20
+# Iteraciones seguidas sin mejorar la cota tras las que se reduce el paso a la mitad
+PACIENCIA = 10
+# Nodos abiertos a partir de los cuales los hijos se exploran en profundidad
+MAX_ABIERTOS = 20000
+# Nodos expandidos por defecto: con 100 nodos se expanden unos 25 por segundo
+MAX_RAMIFICACIONES = 2000
+# Cada cuántos nodos expandidos se hace una inmersión en profundidad en busca de tours
+INTERVALO_INMERSION = 50
+# Por encima de este tamaño solo el ascenso de la raíz, O(n³) y sin
+# interrupción posible, tarda varios segundos (casi un minuto con 800 nodos)
+MAX_NODOS_RAMIFICACION_PODA = 200
+# Peso de las aristas obligatorias en el árbol: entran antes que cualquier otra
+_OBLIGATORIA = -1e12
+
+
+def arbol_1(costes, pi, ajuste):
+    """1-árbol mínimo con los costes d[i][j] + π[i] + π[j] + ajuste[i, j].
+
+    `ajuste` vale 0 en las aristas libres, infinito en las prohibidas y
+    `_OBLIGATORIA` en las obligatorias. El árbol de los nodos 1..n-1 se
+    calcula con Prim vectorizado (O(n²)). Devuelve (cota, grados, aristas)
+    con la cota calculada sin el ajuste y las n aristas en un array (n, 2),
+    o None si las aristas prohibidas no dejan ningún 1-árbol.
+    """
+    n = len(costes)
+    penalizados = costes + pi[:, None] + pi[None, :]
+    pesos = penalizados + ajuste
+    resto = pesos[1:, 1:]
+    m = n - 1
+    en_arbol = np.zeros(m, dtype=bool)
+    en_arbol[0] = True
+    clave = resto[0].copy()
+    clave[0] = np.inf
+    padre = np.zeros(m, dtype=np.int64)
+    for _ in range(m - 1):
+        v = int(np.argmin(clave))
+        if clave[v] == np.inf:
+            return None
+        en_arbol[v] = True
+        clave[v] = np.inf
+        fila = resto[v]
+        mejora = (fila < clave) & ~en_arbol
+        clave[mejora] = fila[mejora]
+        padre[mejora] = v
+    extremos = np.argpartition(pesos[0, 1:], 1)[:2] + 1
+    if np.isinf(pesos[0, extremos]).any():
+        return None
+    aristas = np.empty((n, 2), dtype=np.int64)
+    aristas[:m - 1, 0] = np.arange(2, n)
+    aristas[:m - 1, 1] = padre[1:] + 1
+    aristas[m - 1:, 0] = 0
+    aristas[m - 1:, 1] = extremos
+    cota = penalizados[aristas[:, 0], aristas[:, 1]].sum() - 2 * pi.sum()
+    grados = np.bincount(aristas.ravel(), minlength=n)
+    return cota, grados, aristas
+
+
+def _ajuste(n, decisiones):
+    """Matriz de ajuste de un nodo del árbol de búsqueda a partir de sus decisiones (i, j, obligatoria)
+
+    Un nodo con dos aristas obligatorias tiene prohibidas las demás. Devuelve
+    None si las decisiones son incompatibles: más de dos obligatorias en un
+    nodo, obligatorias que cierran un ciclo antes de pasar por todos o un
+    nodo sin dos aristas posibles.
+    """
+    ajuste = np.zeros((n, n))
+    np.fill_diagonal(ajuste, np.inf)
+    padre = list(range(n))
+
+    def raiz(nodo):
+        while padre[nodo] != nodo:
+            padre[nodo] = padre[padre[nodo]]
+            nodo = padre[nodo]
+        return nodo
+
+    obligatorias = 0
+    for i, j, obligatoria in decisiones:
+        if not obligatoria:
+            ajuste[i, j] = ajuste[j, i] = np.inf
+            continue
+        ajuste[i, j] = ajuste[j, i] = _OBLIGATORIA
+        obligatorias += 1
+        a, b = raiz(i), raiz(j)
+        if a == b and obligatorias < n:
+            return None
+        padre[a] = b
+    fijas = ajuste == _OBLIGATORIA
+    cuenta = fijas.sum(axis=1)
+    if (cuenta > 2).any():
+        return None
+    llenos = cuenta == 2
+    ajuste[(llenos[:, None] | llenos[None, :]) & ~fijas] = np.inf
+    if (np.isfinite(ajuste).sum(axis=1) < 2).any():
+        return None
+    return ajuste
+
+
+def _ascenso(costes, pi, ajuste, cota_superior, iteraciones, paso, limite_poda):
+    """Subgradiente de Held–Karp desde `pi`: devuelve (cota, pi, aristas, grados) de la mejor cota
+
+    El paso se mide con `cota_superior`, la longitud del mejor tour. Se
+    detiene antes si la cota pasa de `limite_poda` (el nodo se poda) o si
+    el 1-árbol es un tour (todos los grados son 2). Devuelve None si no hay
+    1-árbol posible.
+    """
+    mejor = None
+    sin_mejora = 0
+    for _ in range(iteraciones):
+        arbol = arbol_1(costes, pi, ajuste)
+        if arbol is None:
+            return None
+        cota, grados, aristas = arbol
+        if mejor is None or cota > mejor[0]:
+            mejor = (cota, pi, aristas, grados)
+            sin_mejora = 0
+        else:
+            sin_mejora += 1
+            if sin_mejora >= PACIENCIA:
+                paso /= 2
+                sin_mejora = 0
+        subgradiente = grados - 2
+        norma = int((subgradiente * subgradiente).sum())
+        if norma == 0 or cota > limite_poda:
+            # Tour (la cota es su longitud) o nodo que se poda: no hace falta subir más
+            return cota, pi, aristas, grados
+        pi = pi + paso * (cota_superior - cota) / norma * subgradiente
+    return mejor
+
+
+def _ruta_de_aristas(aristas, n):
+    """Ruta cerrada desde el nodo 0 de un 1-árbol que es un tour"""
+    adyacentes = [[] for _ in range(n)]
+    for a, b in aristas.tolist():
+        adyacentes[a].append(b)
+        adyacentes[b].append(a)
+    ruta = [0]
+    anterior, actual = -1, 0
+    while len(ruta) < n:
+        siguiente = adyacentes[actual][0] if adyacentes[actual][0] != anterior else adyacentes[actual][1]
+        anterior, actual = actual, siguiente
+        ruta.append(actual)
+    ruta.append(0)
+    return ruta
+
+
+class _Busqueda:
+    """Estado de una ramificación y poda: costes, mejor tour y redondeo de las cotas"""
+
+    def __init__(self, distancias, ruta_inicial, distancia_inicial, presupuesto):
+        datos = np.asarray(distancias.datos)
+        self.costes = datos.astype(np.float64)
+        self.n = len(datos)
+        # Con distancias enteras un tour cuesta un entero: la cota se redondea hacia arriba
+        self.entera = datos.dtype.kind in "iu"
+        self.mejor_ruta = list(ruta_inicial)
+        self.mejor_distancia = distancia_inicial
+        self.presupuesto = presupuesto
+
+    def redondear(self, cota):
+        return math.ceil(cota - 1e-6) if self.entera else cota
+
+    def podar(self, cota):
+        return self.redondear(cota) >= self.mejor_distancia
+
+    def limite_poda(self):
+        """Cota a partir de la cual `podar` descarta un nodo"""
+        return self.mejor_distancia - 1 + 1e-6 if self.entera else self.mejor_distancia - 1e-9
+
+    def evaluar(self, decisiones, pi, iteraciones, paso):
+        """Cota de un nodo del árbol de búsqueda; registra el tour si lo encuentra.
+
+        Devuelve (cota, pi) si el nodo queda abierto, o None si se cierra
+        (incompatible, podado o resuelto con un tour).
+        """
+        ajuste = _ajuste(self.n, decisiones)
+        if ajuste is None:
+            return None
+        resultado = _ascenso(self.costes, pi, ajuste, self.mejor_distancia, iteraciones, paso, self.limite_poda())
+        if resultado is None:
+            return None
+        cota, pi, aristas, grados = resultado
+        if (grados == 2).all():
+            distancia = self.costes[aristas[:, 0], aristas[:, 1]].sum().item()
+            if self.entera:
+                distancia = round(distancia)
+            if distancia < self.mejor_distancia:
+                self.mejor_distancia = distancia
+                self.mejor_ruta = _ruta_de_aristas(aristas, self.n)
+                if self.presupuesto is not None:
+                    self.presupuesto.informar(distancia)
+            return None
+        if self.podar(cota):
+            return None
+        return cota, pi
+
+    def hijos(self, decisiones, pi):
+        """Decisiones de los hijos de un nodo: ramificación sobre su nodo de mayor grado en el 1-árbol"""
+        ajuste = _ajuste(self.n, decisiones)
+        _, grados, aristas = arbol_1(self.costes, pi, ajuste)
+        v = int(np.argmax(grados))
+        if grados[v] <= 2:
+            # Con las mismas π el 1-árbol ya es un tour (empate al recalcularlo): se evalúa como hoja
+            return [decisiones]
+        otros = np.concatenate((aristas[aristas[:, 0] == v, 1], aristas[aristas[:, 1] == v, 0]))
+        libres = [int(u) for u in otros if ajuste[v, u] != _OBLIGATORIA]
+        libres.sort(key=lambda u: self.costes[v, u] + pi[u])
+        if (ajuste[v] == _OBLIGATORIA).any():
+            e1 = libres[0]
+            return [decisiones + ((v, e1, False),), decisiones + ((v, e1, True),)]
+        e1, e2 = libres[:2]
+        return [decisiones + ((v, e1, False),),
+                decisiones + ((v, e1, True), (v, e2, False)),
+                decisiones + ((v, e1, True), (v, e2, True))]
+
+
+def ramificacion_poda(distancias, ruta_inicial, distancia_inicial, presupuesto=None, gap_objetivo=0.0,
+                      max_ramificaciones=MAX_RAMIFICACIONES, max_abiertos=MAX_ABIERTOS):
+    """Ramificación y poda con cotas de 1-árbol desde la ruta cerrada `ruta_inicial`.
+
+    Termina al demostrar el óptimo, al bajar el gap de `gap_objetivo` (p.
+    ej. 0.01 para un 1 %), tras `max_ramificaciones` nodos expandidos (None
+    para no limitarlos) o al agotarse el `presupuesto`. Devuelve (ruta,
+    distancia, cota_inferior, ramificaciones); la ruta es óptima si la cota
+    es igual a la distancia.
+    """
+    busqueda = _Busqueda(distancias, ruta_inicial, distancia_inicial, presupuesto)
+    n = busqueda.n
+    if n <= 3:
+        return busqueda.mejor_ruta, busqueda.mejor_distancia, busqueda.mejor_distancia, 0
+
+    iteraciones_raiz = max(MIN_ITERACIONES_RAIZ, ITERACIONES_RAIZ_POR_NODO * n)
+    raiz = busqueda.evaluar((), np.zeros(n), iteraciones_raiz, 2.0)
+    abiertos = []  # (cota, orden, decisiones, pi): montículo por cota
+    pila = []  # Los mismos nodos, en profundidad, cuando hay demasiados abiertos
+    orden = 0
+    if raiz is not None:
+        abiertos.append((raiz[0], orden, (), raiz[1]))
+    ramificaciones = 0
+
+    def cota_global():
+        cotas = [nodo[0] for nodo in pila]
+        if abiertos:
+            cotas.append(abiertos[0][0])
+        return min(busqueda.redondear(min(cotas)), busqueda.mejor_distancia) if cotas else busqueda.mejor_distancia
+
+    def detener():
+        return ((presupuesto is not None and presupuesto.agotado(inmediato=True))
+                or (max_ramificaciones is not None and ramificaciones >= max_ramificaciones))
+
+    def expandir(decisiones, pi):
+        nonlocal orden
+        hijos = []
+        for decisiones_hijo in busqueda.hijos(decisiones, pi):
+            evaluado = busqueda.evaluar(decisiones_hijo, pi, ITERACIONES_HIJO, 0.5)
+            if evaluado is not None:
+                orden += 1
+                hijos.append((evaluado[0], orden, decisiones_hijo, evaluado[1]))
+        return hijos
+
+    def guardar(hijos):
+        if pila or len(abiertos) + len(hijos) > max_abiertos:
+            # En profundidad: el hijo de menor cota queda el último, para expandirlo el primero
+            pila.extend(sorted(hijos, reverse=True))
+        else:
+            for hijo in hijos:
+                heapq.heappush(abiertos, hijo)
+
+    while abiertos or pila:
+        if detener():
+            break
+        if gap_objetivo > 0 and busqueda.mejor_distancia - cota_global() <= gap_objetivo * busqueda.mejor_distancia:
+            break
+        cota, _, decisiones, pi = pila.pop() if pila else heapq.heappop(abiertos)
+        if busqueda.podar(cota):
+            continue
+        ramificaciones += 1
+        hijos = expandir(decisiones, pi)
+        if ramificaciones % INTERVALO_INMERSION == 1:
+            # Inmersión: se sigue por el hijo que más aristas obliga y los demás quedan abiertos
+            while hijos and not detener():
+                hijos.sort(key=lambda hijo: (-sum(obliga for _, _, obliga in hijo[2]), hijo[0]))
+                cota, _, decisiones, pi = hijos.pop(0)
+                guardar(hijos)
+                if busqueda.podar(cota):
+                    hijos = []
+                    break
+                ramificaciones += 1
+                hijos = expandir(decisiones, pi)
+        guardar(hijos)
+
+    return busqueda.mejor_ruta, busqueda.mejor_distancia, cota_global(), ramificaciones
+
+
+def cota_held_karp(distancias, cota_superior, max_iteraciones=None):
+    """Cota inferior de Held–Karp (1-árbol con subgradiente) de la longitud del tour óptimo
+
+    `cota_superior` es la longitud de un tour conocido, que fija el paso del
+    subgradiente.
+    """
+    busqueda = _Busqueda(distancias, [], cota_superior, None)
+    n = busqueda.n
+    if n <= 3:
+        return cota_superior
+    iteraciones = max_iteraciones or max(MIN_ITERACIONES_RAIZ, ITERACIONES_RAIZ_POR_NODO * n)
+    resultado = _ascenso(busqueda.costes, np.zeros(n), _ajuste(n, ()), cota_superior, iteraciones, 2.0,
+                         busqueda.limite_poda())
+    return min(busqueda.redondear(resultado[0]), cota_superior)
@@ -0,0 +1,216 @@
+"""Reoptimización incremental del TSP con capacidad cuando cambia la instancia.
+
+Durante el día aparecen clientes nuevos, otros se dan de baja y cambian
+demandas y distancias. En lugar de generar otra instancia y resolverla
+entera, la solución actual se guarda como viajes de pedidos (los de
+`flota.MejoraViajes`) y cada cambio se repara sobre ella:
+
+1. los pedidos que sobran se quitan de su viaje y los que faltan se
+   insertan donde menos alargan la ruta, junto a los pedidos de sus
+   vecinos más cercanos o en un viaje propio;
+2. la búsqueda local entre viajes (recolocar, intercambiar, 2-opt*) solo
+   parte de los pedidos afectados, y los viajes que cambian se repasan con
+   2-opt.
+
+El trabajo de cada cambio depende de su tamaño y no del de la instancia;
+solo el primer cambio construye el estado a partir de la ruta (O(n)). La
+ruta y el registro de entregas resultantes se guardan por viajes y solo se
+reescriben los viajes que cambian: el resto se encadena en bloque, sin
+recorrer sus pedidos en Python.
+"""
+from array import array
+from operator import itemgetter
+import numpy as np
+from flota import MejoraViajes
+from solucion import RegistroEntregas, TIPO_ENTERO
+
+# Vecinos por nodo en los que se buscan las posiciones de inserción y los movimientos
+K_VECINOS = 10
+
+
+class ReoptimizacionCapacidad:
+    """Solución de un `TSPCapacidad` como viajes de pedidos, lista para repararse tras cada cambio.
+
+    Se construye simulando las entregas de la ruta (como `evaluar_ruta`):
+    cada visita es un pedido, con cantidad 0 si pasa por un nodo ya servido.
+    `ruta` es la última ruta escrita desde el estado; si la del problema ya
+    no es esa, porque se ha vuelto a resolver, el estado está obsoleto y se
+    construye de nuevo.
+    """
+
+    def __init__(self, ruta_indices, demandas, capacidad, distancias, regreso, k_vecinos=K_VECINOS):
+        self.capacidad = capacidad
+        self.k_vecinos = k_vecinos
+        self.vecinos = distancias.vecinos_cercanos(k_vecinos)
+        # Distancia de cada nodo a su último vecino: un nodo más cercano entra en su lista
+        completas = np.array([len(lista) == k_vecinos for lista in self.vecinos], dtype=bool)
+        ultimos = np.array([lista[-1] if lista else 0 for lista in self.vecinos], dtype=np.int64)
+        self.radio = np.where(completas, distancias.pares(np.arange(len(distancias)), ultimos), np.inf)
+
+        nodos = []
+        cantidades = []
+        viajes = []
+        viaje = []
+        pendientes = list(demandas)
+        carga = capacidad
+        for nodo in ruta_indices[1:]:
+            if nodo == 0:
+                if viaje:
+                    viajes.append(viaje)
+                    viaje = []
+                carga = capacidad
+                continue
+            cantidad = min(carga, pendientes[nodo])
+            viaje.append(len(nodos))
+            nodos.append(nodo)
+            cantidades.append(cantidad)
+            pendientes[nodo] -= cantidad
+            carga -= cantidad
+        if viaje:
+            viajes.append(viaje)
+        # Por viaje: bytes de su tramo de ruta y de las columnas de sus entregas, y su último nodo
+        self._escritos = {}
+        self.motor = MejoraViajes(viajes, [0] * len(viajes), [capacidad], nodos, cantidades, distancias, regreso,
+                                  self.vecinos, makespan=False)
+        # Lo que la ruta dejaba sin entregar se inserta como pedidos nuevos
+        for nodo in np.flatnonzero(np.asarray(pendientes) > 0).tolist():
+            self.cambiar_demanda(nodo, demandas[nodo])
+        self.ruta = ruta_indices
+
+    def _nuevo_pedido(self, nodo, cantidad):
+        motor = self.motor
+        p = len(motor.nodos)
+        motor.nodos.append(nodo)
+        motor.cantidades.append(cantidad)
+        motor.insertar(p)
+        return p
+
+    def _acercar(self, nodo, otro, distancia):
+        """Coloca `otro` en la lista de vecinos de `nodo`, a `distancia`, manteniendo el orden"""
+        lista = self.vecinos[nodo]
+        if otro in lista:
+            lista.remove(otro)
+        fila = self.motor.distancias[nodo]
+        k = 0
+        while k < len(lista) and fila[lista[k]] <= distancia:
+            k += 1
+        lista.insert(k, otro)
+        del lista[self.k_vecinos:]
+        self.radio[nodo] = fila[lista[-1]] if len(lista) == self.k_vecinos else np.inf
+
+    def ampliar(self, distancias, regreso):
+        """Incorpora el último nodo de `distancias`, recién añadido, a las listas de vecinos
+
+        Su lista se calcula con su fila (O(n) vectorizado) y entra en la de
+        los nodos que lo tienen más cerca que su último vecino.
+        """
+        nodo = len(distancias) - 1
+        fila = np.asarray(distancias.fila(nodo), dtype=np.float64)
+        fila[nodo] = np.inf
+        k = min(self.k_vecinos, nodo)
+        cercanos = np.argpartition(fila, k - 1)[:k] if k > 0 else np.empty(0, dtype=np.int64)
+        cercanos = cercanos[np.argsort(fila[cercanos], kind="stable")]
+        self.vecinos.append(cercanos.tolist())
+        self.radio = np.append(self.radio, fila[cercanos[-1]] if k == self.k_vecinos else np.inf)
+        self.motor.distancias = distancias
+        self.motor.regreso = regreso
+        for otro in np.flatnonzero(fila[:nodo] < self.radio[:nodo]).tolist():
+            self._acercar(otro, nodo, fila[otro])
+
+    def acercar(self, i, j, distancia):
+        """Actualiza las listas de vecinos de i y j tras cambiar la distancia entre ellos"""
+        for nodo, otro in ((i, j), (j, i)):
+            if nodo != 0 and distancia < self.radio[nodo]:
+                self._acercar(nodo, otro, distancia)
+
+    def cambiar_demanda(self, nodo, demanda):
+        """Ajusta los pedidos de `nodo` a su nueva demanda y devuelve los pedidos que hay que reparar
+
+        Si baja, se descuenta de sus últimos pedidos y se quitan los que se
+        quedan a cero (sus vecinos de viaje también cuentan como afectados);
+        si sube, se llenan primero los huecos de los viajes donde ya está y
+        el resto va en pedidos nuevos de como mucho la capacidad, insertados
+        donde menos cuestan.
+        """
+        motor = self.motor
+        cantidades = motor.cantidades
+        pedidos = list(motor.pedidos_de_nodo.get(nodo, ()))
+        diferencia = demanda - sum(cantidades[p] for p in pedidos)
+        afectados = []
+        if diferencia < 0:
+            for p in reversed(pedidos):
+                descuento = min(-diferencia, cantidades[p])
+                diferencia += descuento
+                if descuento == cantidades[p]:
+                    viaje = motor.viajes[motor.viaje_de[p]]
+                    i = motor.posicion[p]
+                    afectados.extend(viaje[max(i - 1, 0):i] + viaje[i + 1:i + 2])
+                    motor.quitar(p)
+                else:
+                    motor.cambiar_cantidad(p, cantidades[p] - descuento)
+                if diferencia == 0:
+                    break
+        else:
+            for p in pedidos:
+                extra = min(diferencia, motor.hueco(p))
+                if extra > 0:
+                    motor.cambiar_cantidad(p, cantidades[p] + extra)
+                    diferencia -= extra
+            while diferencia > 0:
+                cantidad = min(diferencia, self.capacidad)
+                afectados.append(self._nuevo_pedido(nodo, cantidad))
+                diferencia -= cantidad
+        return afectados + motor.pedidos_de_nodo.get(nodo, [])
+
+    def recalcular(self, nodos):
+        """Actualiza los viajes que pasan por `nodos`, cuyas distancias o regresos han cambiado
+
+        Devuelve los pedidos de esos viajes.
+        """
+        return self.motor.recalcular_costes(nodos)
+
+    def reparar(self, pedidos, presupuesto, rng):
+        """Búsqueda local en el entorno de `pedidos` (ver `MejoraViajes.reparar`)"""
+        self.motor.reparar(pedidos, presupuesto, rng)
+
+    def _escribir(self, t):
+        """Tramo de ruta (con el regreso al almacén) y columnas de entregas del viaje t, en bytes"""
+        motor = self.motor
+        viaje = motor.viajes[t]
+        nodos = motor.nodos
+        cantidades = motor.cantidades
+        entregados = [(p, carga) for p, carga in zip(viaje, motor.acumulada[t]) if cantidades[p] > 0]
+        tramo = array(TIPO_ENTERO, map(nodos.__getitem__, viaje))
+        tramo.append(0)
+        self._escritos[t] = (tramo.tobytes(),
+                             array(TIPO_ENTERO, [nodos[p] for p, _ in entregados]).tobytes(),
+                             array(TIPO_ENTERO, [cantidades[p] for p, _ in entregados]).tobytes(),
+                             array(TIPO_ENTERO, [self.capacidad - carga for _, carga in entregados]).tobytes(),
+                             nodos[viaje[-1]])
+
+    def solucion(self):
+        """(ruta, entregas, regresos, distancia) de los viajes actuales; la ruta queda como `ruta`
+
+        Los viajes se ordenan antes con `MejoraViajes.ajustar_a_ruta`, de
+        modo que `evaluar_ruta` reproduce las entregas de la ruta. Solo se
+        vuelven a escribir los viajes cambiados desde la llamada anterior
+        (`MejoraViajes.sin_escribir`); la carga restante sale de las cargas
+        acumuladas que ya lleva `MejoraViajes`.
+        """
+        motor = self.motor
+        viajes = motor.ajustar_a_ruta()
+        for t in motor.sin_escribir:
+            if motor.viajes[t]:
+                self._escribir(t)
+            else:
+                self._escritos.pop(t, None)
+        motor.sin_escribir = set()
+        escritos = list(map(self._escritos.__getitem__, viajes))
+        ruta_indices = array(TIPO_ENTERO, [0])
+        ruta_indices.frombytes(b"".join(map(itemgetter(0), escritos)))
+        entregas = RegistroEntregas()
+        for columna, k in ((entregas.nodos, 1), (entregas.cantidades, 2), (entregas.cargas, 3)):
+            columna.frombytes(b"".join(map(itemgetter(k), escritos)))
+        regresos = array(TIPO_ENTERO, map(itemgetter(4), escritos))
+        self.ruta = ruta_indices
+        return ruta_indices, entregas, regresos, motor.distancia
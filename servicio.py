@@ -0,0 +1,397 @@
+"""Servicio asíncrono de resolución: colas de solicitudes y reparto entre procesos.
+
+El servicio acepta solicitudes (una instancia en el formato de `lote`, con su
+algoritmo y su límite de tiempo) y las resuelve en un `ProcessPoolExecutor`,
+de modo que el bucle de asyncio queda libre para atender a los clientes:
+
+- Contrapresión: las solicitudes esperan en colas acotadas; `enviar` espera
+  a que haya hueco (o lanza `ServicioSaturado` con `esperar=False`).
+- Concurrencia limitada: como mucho `max_procesos` resoluciones a la vez, de
+  las que solo `max_grandes` pueden ser de instancias grandes; las pequeñas
+  tienen su propia cola y no esperan detrás de ellas.
+- Progreso: mientras se resuelve, cada solicitud emite la mejor distancia
+  hallada hasta el momento, y puede cancelarse (devuelve la mejor solución).
+
+Con `en_proceso=True` las resoluciones se hacen en hilos del propio proceso,
+lo que permite probar el servicio con un cliente local sin lanzar procesos.
+
+Uso desde asyncio:
+    async with ServicioResolucion(max_procesos=4) as servicio:
+        solicitud = await servicio.enviar({"num_nodos": 500, "semilla": 1}, algoritmo="tabu", tiempo_limite=2)
+        async for distancia, segundos in solicitud.progresos():
+            print(distancia, segundos)
+        resultado = await solicitud.resultado()
+
+Como servidor TCP: cada línea recibida es una instancia JSON (o
+`{"cancelar": id}`) y se responde con líneas `{"id": ..., "progreso": ...}`
+y, al final, el resultado de `lote.resolver_instancia`:
+    python main.py servicio --puerto 8765 --procesos 4
+"""
+import argparse
+import asyncio
+import functools
+import itertools
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from lote import resolver_instancia, EXTENSIONES_TSPLIB
+from formato_binario import abrir_instancia
+from tsplib import leer_cabecera
+from metaheuristicas import Cancelacion
+from cache_soluciones import CacheSoluciones
+from solucion import a_json
+
+# Nodos a partir de los cuales una instancia va a la cola de las grandes
+UMBRAL_GRANDES = 1000
+# Solicitudes que pueden esperar en cada cola antes de aplicar contrapresión
+MAX_PENDIENTES = 100
+
+# Caché de soluciones de cada directorio en este proceso (cada trabajador tiene las suyas)
+_caches = {}
+
+
+class ServicioSaturado(Exception):
+    """La cola de solicitudes está llena y no se ha querido esperar a que haya hueco"""
+
+
+def tamano_instancia(instancia):
+    """Número de nodos de una instancia, sin construir el problema; None si no se puede saber"""
+    try:
+        fichero = instancia.get("fichero")
+        if fichero:
+            if fichero.lower().endswith(EXTENSIONES_TSPLIB):
+                return int(leer_cabecera(fichero)["DIMENSION"])
+            return len(abrir_instancia(fichero)["distancias"])
+        for campo in ("distancias", "coordenadas"):
+            if instancia.get(campo) is not None:
+                return len(instancia[campo])
+        return instancia.get("num_nodos", 12)
+    except (OSError, KeyError, ValueError, TypeError):
+        return None
+
+
+def _resolver(instancia, algoritmo, tiempo_limite, identificador, canal, evento, redirigir_salida,
+              directorio_cache=None):
+    """Resuelve una solicitud en un trabajador: envía el progreso por `canal` y se cancela con `evento`"""
+    cancelacion = Cancelacion()
+    cache = None if directorio_cache is None else _caches.get(directorio_cache)
+    if directorio_cache is not None and cache is None:
+        cache = _caches.setdefault(directorio_cache, CacheSoluciones(directorio=directorio_cache))
+
+    def vigilar():
+        # En el modo con procesos consultar el evento es una llamada al gestor: se espera en un hilo aparte
+        evento.wait()
+        cancelacion.cancelar()
+
+    vigilante = threading.Thread(target=vigilar, daemon=True)
+    vigilante.start()
+    try:
+        return resolver_instancia(instancia, algoritmo, tiempo_limite, cancelacion=cancelacion,
+                                  progreso=lambda distancia, segundos: canal.put((identificador, distancia, segundos)),
+                                  redirigir_salida=redirigir_salida, cache=cache)
+    finally:
+        # Activar el evento al terminar libera al vigilante
+        evento.set()
+        vigilante.join()
+
+
+class Solicitud:
+    """Solicitud enviada al servicio: permite seguir su progreso, esperar el resultado o cancelarla.
+
+    Sus métodos deben llamarse desde el bucle de asyncio del servicio.
+    """
+
+    def __init__(self, identificador, instancia, algoritmo, tiempo_limite):
+        self.id = identificador
+        self.instancia = instancia
+        self.algoritmo = algoritmo
+        self.tiempo_limite = tiempo_limite
+        self.estado = "pendiente"  # "en_curso" y "terminada"
+        self.mejor_distancia = None
+        self.cancelada = False
+        self._evento = None
+        self._avisos = asyncio.Queue()
+        self._resultado = asyncio.get_running_loop().create_future()
+
+    def _avisar(self, distancia, segundos):
+        if self.estado != "en_curso":
+            return
+        self.mejor_distancia = distancia
+        self._avisos.put_nowait((distancia, segundos))
+
+    def _terminar(self, resultado):
+        self.estado = "terminada"
+        self._resultado.set_result(resultado)
+        self._avisos.put_nowait(None)
+
+    async def progresos(self):
+        """Genera (mejor distancia, segundos) a medida que mejora la solución, hasta que termina"""
+        while True:
+            aviso = await self._avisos.get()
+            if aviso is None:
+                # Se deja la marca de fin para otros consumidores
+                self._avisos.put_nowait(None)
+                return
+            yield aviso
+
+    async def resultado(self):
+        """Espera y devuelve el resultado, con el formato de `lote.resolver_instancia`"""
+        return await asyncio.shield(self._resultado)
+
+    def __await__(self):
+        return self.resultado().__await__()
+
+    def cancelar(self):
+        """Cancela la solicitud: si no ha empezado no se resuelve; si está en curso devuelve la mejor solución"""
+        self.cancelada = True
+        if self._evento is not None:
+            self._evento.set()
+
+
+class ServicioResolucion:
+    """Servicio asíncrono que reparte las solicitudes de resolución entre varios procesos.
+
+    `max_procesos` limita las resoluciones simultáneas (por defecto, una por
+    CPU) y `max_grandes` las de instancias con `umbral_grandes` nodos o más
+    (por defecto, la mitad). Cada una de las dos colas admite
+    `max_pendientes` solicitudes en espera. `algoritmo` y `tiempo_limite` se
+    usan cuando ni la solicitud ni la instancia los indican. Con
+    `directorio_cache` los trabajadores guardan sus soluciones en ese
+    directorio y reutilizan las de cualquiera de ellos.
+    """
+
+    def __init__(self, max_procesos=None, max_grandes=None, max_pendientes=MAX_PENDIENTES,
+                 umbral_grandes=UMBRAL_GRANDES, algoritmo=None, tiempo_limite=None, en_proceso=False,
+                 directorio_cache=None):
+        self.max_procesos = max_procesos or os.cpu_count() or 1
+        self.max_grandes = min(max_grandes or max(1, self.max_procesos // 2), self.max_procesos)
+        self.max_pendientes = max_pendientes
+        self.umbral_grandes = umbral_grandes
+        self.algoritmo = algoritmo
+        self.tiempo_limite = tiempo_limite
+        self.en_proceso = en_proceso
+        self.directorio_cache = directorio_cache
+        self.en_marcha = False
+        self._contador = itertools.count()
+        self._solicitudes = {}  # identificador -> Solicitud sin terminar
+        self._gestor = None
+
+    async def iniciar(self):
+        """Arranca el ejecutor, los trabajadores de las colas y el lector del progreso"""
+        if self.en_marcha:
+            return
+        if self.en_proceso:
+            self._ejecutor = ThreadPoolExecutor(self.max_procesos)
+            self._canal = queue.Queue()
+            self._nuevo_evento = threading.Event
+        else:
+            # Los trabajadores reciben la cola de progreso y los eventos como objetos del gestor. Se
+            # lanzan con "spawn" para que no hereden los sockets de los clientes abiertos al crearlos
+            contexto = multiprocessing.get_context("spawn")
+            self._gestor = contexto.Manager()
+            self._ejecutor = ProcessPoolExecutor(self.max_procesos, mp_context=contexto)
+            self._canal = self._gestor.Queue()
+            self._nuevo_evento = self._gestor.Event
+        self._simultaneas = asyncio.Semaphore(self.max_procesos)
+        self._pequenas = asyncio.Queue(self.max_pendientes)
+        self._grandes = asyncio.Queue(self.max_pendientes)
+        self._tareas = ([asyncio.create_task(self._atender(self._pequenas)) for _ in range(self.max_procesos)]
+                        + [asyncio.create_task(self._atender(self._grandes)) for _ in range(self.max_grandes)])
+        self._lector = threading.Thread(target=self._leer_progreso, args=(asyncio.get_running_loop(),), daemon=True)
+        self._lector.start()
+        self.en_marcha = True
+
+    async def cerrar(self, cancelar=False):
+        """Deja de aceptar solicitudes y espera a que terminen las enviadas (o las cancela con `cancelar`)"""
+        if not self.en_marcha:
+            return
+        self.en_marcha = False
+        if cancelar:
+            for solicitud in list(self._solicitudes.values()):
+                solicitud.cancelar()
+        await self._pequenas.join()
+        await self._grandes.join()
+        for tarea in self._tareas:
+            tarea.cancel()
+        await asyncio.gather(*self._tareas, return_exceptions=True)
+        self._canal.put(None)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._lector.join)
+        await loop.run_in_executor(None, self._ejecutor.shutdown)
+        if self._gestor is not None:
+            self._gestor.shutdown()
+            self._gestor = None
+
+    async def __aenter__(self):
+        await self.iniciar()
+        return self
+
+    async def __aexit__(self, tipo, excepcion, traza):
+        await self.cerrar(cancelar=excepcion is not None)
+        return False
+
+    def es_grande(self, instancia):
+        """True si la instancia va a la cola de las grandes (también si no se conoce su tamaño)"""
+        tamano = tamano_instancia(instancia)
+        return tamano is None or tamano >= self.umbral_grandes
+
+    async def enviar(self, instancia, algoritmo=None, tiempo_limite=None, esperar=True):
+        """Pone una instancia en cola y devuelve su `Solicitud`.
+
+        Si la cola está llena espera a que haya hueco, o lanza
+        `ServicioSaturado` con `esperar=False`.
+        """
+        if not self.en_marcha:
+            raise RuntimeError("El servicio no está en marcha")
+        if not isinstance(instancia, dict):
+            raise ValueError("La instancia debe ser un diccionario")
+        solicitud = Solicitud(next(self._contador), instancia, algoritmo or self.algoritmo,
+                              tiempo_limite if tiempo_limite is not None else self.tiempo_limite)
+        cola = self._grandes if self.es_grande(instancia) else self._pequenas
+        if esperar:
+            await cola.put(solicitud)
+        else:
+            try:
+                cola.put_nowait(solicitud)
+            except asyncio.QueueFull:
+                raise ServicioSaturado(f"Hay {self.max_pendientes} solicitudes en espera") from None
+        self._solicitudes[solicitud.id] = solicitud
+        return solicitud
+
+    async def resolver(self, instancia, algoritmo=None, tiempo_limite=None):
+        """Envía una instancia y espera su resultado"""
+        solicitud = await self.enviar(instancia, algoritmo, tiempo_limite)
+        return await solicitud.resultado()
+
+    async def _atender(self, cola):
+        loop = asyncio.get_running_loop()
+        while True:
+            solicitud = await cola.get()
+            try:
+                if solicitud.cancelada:
+                    resultado = {"id": solicitud.instancia.get("id"), "error": "Solicitud cancelada antes de empezar"}
+                else:
+                    async with self._simultaneas:
+                        solicitud._evento = self._nuevo_evento()
+                        if solicitud.cancelada:
+                            solicitud._evento.set()
+                        solicitud.estado = "en_curso"
+                        try:
+                            resultado = await loop.run_in_executor(
+                                self._ejecutor, _resolver, solicitud.instancia, solicitud.algoritmo,
+                                solicitud.tiempo_limite, solicitud.id, self._canal, solicitud._evento,
+                                not self.en_proceso, self.directorio_cache)
+                        except Exception as error:
+                            # Por ejemplo, un proceso trabajador que ha muerto
+                            resultado = {"id": solicitud.instancia.get("id"), "error": f"{type(error).__name__}: {error}"}
+                del self._solicitudes[solicitud.id]
+                solicitud._terminar(resultado)
+            finally:
+                cola.task_done()
+
+    def _leer_progreso(self, loop):
+        # Hilo que lee la cola de progreso y entrega cada aviso a su solicitud en el bucle de asyncio
+        while True:
+            mensaje = self._canal.get()
+            if mensaje is None:
+                return
+            loop.call_soon_threadsafe(self._avisar, *mensaje)
+
+    def _avisar(self, identificador, distancia, segundos):
+        solicitud = self._solicitudes.get(identificador)
+        if solicitud is not None:
+            solicitud._avisar(distancia, segundos)
+
+
+async def atender_cliente(servicio, lector, escritor):
+    """Atiende una conexión: una instancia JSON (o `{"cancelar": id}`) por línea, respuestas en JSON Lines"""
+    cerrojo = asyncio.Lock()
+    solicitudes = {}
+    seguimientos = set()
+
+    async def escribir(objeto):
+        async with cerrojo:
+            escritor.write((json.dumps(objeto, ensure_ascii=False, default=a_json) + "\n").encode("utf-8"))
+            await escritor.drain()
+
+    async def seguir(identificador, solicitud):
+        async for distancia, segundos in solicitud.progresos():
+            await escribir({"id": identificador, "progreso": {"distancia": distancia, "segundos": segundos}})
+        resultado = await solicitud.resultado()
+        solicitudes.pop(identificador, None)
+        await escribir(resultado)
+
+    numero = 0
+    try:
+        async for linea in lector:
+            if not linea.strip():
+                continue
+            try:
+                instancia = json.loads(linea)
+                if not isinstance(instancia, dict):
+                    raise ValueError("se esperaba un objeto JSON")
+            except ValueError as error:
+                await escribir({"error": f"{type(error).__name__}: {error}"})
+                continue
+            if "cancelar" in instancia:
+                solicitud = solicitudes.get(instancia["cancelar"])
+                if solicitud is not None:
+                    solicitud.cancelar()
+                continue
+            identificador = instancia.setdefault("id", numero)
+            numero += 1
+            # Mientras la cola está llena no se leen más líneas: la contrapresión llega al cliente por TCP
+            solicitud = await servicio.enviar(instancia)
+            solicitudes[identificador] = solicitud
+            seguimiento = asyncio.create_task(seguir(identificador, solicitud))
+            seguimientos.add(seguimiento)
+            seguimiento.add_done_callback(seguimientos.discard)
+        await asyncio.gather(*seguimientos)
+    except ConnectionError:
+        # El cliente se ha ido: sus solicitudes ya no interesan
+        for solicitud in solicitudes.values():
+            solicitud.cancelar()
+    finally:
+        escritor.close()
+
+
+async def servir(host="127.0.0.1", puerto=8765, **opciones):
+    """Arranca el servicio y lo atiende por TCP hasta que se interrumpe"""
+    async with ServicioResolucion(**opciones) as servicio:
+        servidor = await asyncio.start_server(functools.partial(atender_cliente, servicio), host, puerto)
+        async with servidor:
+            await servidor.serve_forever()
+
+
+def principal(argumentos=None):
+    """Punto de entrada de la línea de comandos del servicio"""
+    parser = argparse.ArgumentParser(prog="main.py servicio",
+                                     description="Atiende solicitudes de resolución por TCP (JSON Lines).")
+    parser.add_argument("--host", default="127.0.0.1", help="dirección en la que escuchar")
+    parser.add_argument("--puerto", type=int, default=8765, help="puerto en el que escuchar")
+    parser.add_argument("--procesos", type=int, help="resoluciones simultáneas (por defecto, una por CPU)")
+    parser.add_argument("--max-grandes", type=int, help="resoluciones simultáneas de instancias grandes")
+    parser.add_argument("--umbral-grandes", type=int, default=UMBRAL_GRANDES,
+                        help="nodos a partir de los cuales una instancia es grande")
+    parser.add_argument("--max-pendientes", type=int, default=MAX_PENDIENTES,
+                        help="solicitudes en espera en cada cola antes de dejar de leer")
+    parser.add_argument("--algoritmo", help="algoritmo por defecto (nombre sin 'resolver_')")
+    parser.add_argument("--tiempo-limite", type=float, help="segundos por solicitud por defecto")
+    parser.add_argument("--cache", metavar="DIRECTORIO", help="guarda y reutiliza soluciones en este directorio")
+    args = parser.parse_args(argumentos)
+    try:
+        asyncio.run(servir(args.host, args.puerto, max_procesos=args.procesos, max_grandes=args.max_grandes,
+                           max_pendientes=args.max_pendientes, umbral_grandes=args.umbral_grandes,
+                           algoritmo=args.algoritmo, tiempo_limite=args.tiempo_limite,
+                           directorio_cache=args.cache))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(principal())
@@ -0,0 +1,126 @@
+"""Representación compacta de las soluciones.
+
+Las rutas se guardan como `array('q')` (ocho bytes por parada, sin un objeto
+`int` por nodo), las entregas en columnas (`RegistroEntregas`) y los regresos
+al almacén solo con el nodo de partida: su camino y su distancia salen de los
+caminos mínimos al almacén cuando se consultan. Las etiquetas ("A", "B",
+...) solo se generan al mostrar o exportar una solución.
+"""
+from array import array
+
+# Código de tipo de los arrays de índices y cantidades: enteros con signo de 64 bits
+TIPO_ENTERO = "q"
+
+
+def a_json(valor):
+    """Convierte a tipos JSON los números y arrays de NumPy, los `array` y los `RegistroEntregas`
+
+    Es la función `default` de `json.dumps` para las soluciones y resultados.
+    """
+    if hasattr(valor, "item"):
+        return valor.item()
+    if hasattr(valor, "tolist"):
+        return valor.tolist()
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+
+def ruta_compacta(ruta_indices):
+    """Devuelve la ruta como array de enteros, sin copiarla si ya lo es"""
+    if isinstance(ruta_indices, array):
+        return ruta_indices
+    return array(TIPO_ENTERO, ruta_indices)
+
+
+class RegistroEntregas:
+    """Entregas de una solución en columnas: nodo, cantidad entregada y carga restante tras entregar.
+
+    Con `vehiculos` (un iterable, aunque esté vacío) se guarda también el
+    vehículo de cada entrega, como en el modo flota. Recorrerlo da tuplas
+    (nodo, cantidad, carga_restante[, vehiculo]) con el índice del nodo.
+    """
+
+    __slots__ = ("nodos", "cantidades", "cargas", "vehiculos")
+
+    def __init__(self, nodos=(), cantidades=(), cargas=(), vehiculos=None):
+        self.nodos = array(TIPO_ENTERO, nodos)
+        self.cantidades = array(TIPO_ENTERO, cantidades)
+        self.cargas = array(TIPO_ENTERO, cargas)
+        self.vehiculos = None if vehiculos is None else array(TIPO_ENTERO, vehiculos)
+
+    def agregar(self, nodo, cantidad, carga_restante, vehiculo=None):
+        """Añade una entrega al final del registro"""
+        self.nodos.append(nodo)
+        self.cantidades.append(cantidad)
+        self.cargas.append(carga_restante)
+        if self.vehiculos is not None:
+            self.vehiculos.append(vehiculo)
+
+    def __len__(self):
+        return len(self.nodos)
+
+    def __iter__(self):
+        if self.vehiculos is None:
+            return zip(self.nodos, self.cantidades, self.cargas)
+        return zip(self.nodos, self.cantidades, self.cargas, self.vehiculos)
+
+    def __eq__(self, otro):
+        if not isinstance(otro, RegistroEntregas):
+            return NotImplemented
+        return self.tolist() == otro.tolist()
+
+    def entregado(self, num_nodos):
+        """Cantidad total entregada a cada nodo"""
+        totales = [0] * num_nodos
+        for nodo, cantidad in zip(self.nodos, self.cantidades):
+            totales[nodo] += cantidad
+        return totales
+
+    def tolist(self):
+        """Columnas del registro como listas (las de `RegistroEntregas(*columnas)`)"""
+        columnas = [self.nodos.tolist(), self.cantidades.tolist(), self.cargas.tolist()]
+        if self.vehiculos is not None:
+            columnas.append(self.vehiculos.tolist())
+        return columnas
+
+    def como_diccionarios(self, etiquetas):
+        """Entregas como diccionarios con la etiqueta del nodo, para mostrarlas o exportarlas"""
+        entregas = [{'nodo': etiquetas[nodo], 'cantidad': cantidad, 'carga_restante': carga}
+                    for nodo, cantidad, carga in zip(self.nodos, self.cantidades, self.cargas)]
+        if self.vehiculos is not None:
+            for entrega, vehiculo in zip(entregas, self.vehiculos):
+                entrega['vehiculo'] = vehiculo
+        return entregas
+
+
+class Resultado:
+    """Valor de retorno de los métodos `resolver_*`.
+
+    Se desempaqueta como (ruta, distancia) en el TSP genérico y como (ruta,
+    distancia, entregas) con capacidad. La ruta se guarda en índices; la lista
+    de etiquetas solo se genera al consultar `ruta` o al desempaquetarlo.
+    """
+
+    __slots__ = ("etiquetas", "ruta_indices", "distancia", "entregas")
+
+    def __init__(self, etiquetas, ruta_indices, distancia, entregas=None):
+        self.etiquetas = etiquetas
+        self.ruta_indices = ruta_indices
+        self.distancia = distancia
+        self.entregas = entregas
+
+    @property
+    def ruta(self):
+        etiquetas = self.etiquetas
+        return [etiquetas[i] for i in self.ruta_indices]
+
+    def _campos(self):
+        return ("ruta", "distancia") if self.entregas is None else ("ruta", "distancia", "entregas")
+
+    def __len__(self):
+        return len(self._campos())
+
+    def __iter__(self):
+        return (getattr(self, campo) for campo in self._campos())
+
+    def __getitem__(self, posicion):
+        return getattr(self, self._campos()[posicion])
@@ -0,0 +1,122 @@
+"""La caché de soluciones acierta con la misma instancia, expulsa por LRU y arranca en caliente."""
+import tempfile
+import unittest
+
+from cache_soluciones import CacheSoluciones
+from tsp_capacidad import TSPCapacidad
+from tsp_generico import TSPGenerico
+
+
+class Aciertos(unittest.TestCase):
+
+    def test_misma_instancia(self):
+        cache = CacheSoluciones()
+        tsp = TSPGenerico(num_nodos=12, semilla=1)
+        tsp.cache = cache
+        ruta, distancia = tsp.resolver_vecino_mas_cercano()
+        self.assertEqual((cache.aciertos, cache.fallos, len(cache)), (0, 1, 1))
+
+        otro = TSPGenerico(distancias=tsp.distancias)
+        otro.cache = cache
+        self.assertEqual(tuple(otro.resolver_vecino_mas_cercano()), (ruta, distancia))
+        self.assertEqual((cache.aciertos, cache.fallos, len(cache)), (1, 1, 1))
+        # Otros parámetros u otro algoritmo son otra clave
+        otro.resolver_vecino_mas_cercano(inicio=3)
+        otro.mejor_ruta_indices = None
+        otro.resolver_held_karp()
+        self.assertEqual((cache.aciertos, cache.fallos, len(cache)), (1, 3, 3))
+
+    def test_capacidad(self):
+        cache = CacheSoluciones()
+        tsp = TSPCapacidad(num_nodos=30, capacidad_camion=60, semilla=2)
+        tsp.cache = cache
+        tsp.resolver_greedy()
+        otro = TSPCapacidad(distancias=tsp.distancias, demandas=list(tsp.demandas), capacidad_camion=60)
+        otro.cache = cache
+        otro.resolver_greedy()
+        self.assertEqual(cache.aciertos, 1)
+        self.assertEqual(list(otro.mejor_ruta_indices), list(tsp.mejor_ruta_indices))
+        self.assertEqual(otro.entregas_realizadas, tsp.entregas_realizadas)
+        self.assertEqual(list(otro.regresos_almacen), list(tsp.regresos_almacen))
+        # Con otra capacidad la instancia es otra
+        distinta = TSPCapacidad(distancias=tsp.distancias, demandas=list(tsp.demandas), capacidad_camion=70)
+        distinta.cache = cache
+        distinta.resolver_greedy()
+        self.assertEqual(cache.aciertos, 1)
+
+    def test_directorio(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            tsp = TSPGenerico(num_nodos=30, semilla=3)
+            tsp.cache = CacheSoluciones(directorio=directorio)
+            tsp.resolver_vecino_mas_cercano()
+            # Una caché nueva sobre el mismo directorio la encuentra en disco
+            otro = TSPGenerico(distancias=tsp.distancias)
+            otro.cache = CacheSoluciones(directorio=directorio)
+            otro.resolver_vecino_mas_cercano()
+            self.assertEqual(otro.cache.aciertos, 1)
+            self.assertEqual(otro.mejor_distancia, tsp.mejor_distancia)
+
+
+class Expulsion(unittest.TestCase):
+
+    def test_por_entradas(self):
+        cache = CacheSoluciones(max_entradas=2)
+        for clave in ("a", "b"):
+            cache.guardar(clave, {"valor": clave})
+        cache.obtener("a")  # "a" pasa a ser la más reciente
+        cache.guardar("c", {"valor": "c"})
+        self.assertEqual(len(cache), 2)
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertIsNone(cache.obtener("b"))
+        self.assertEqual(cache.obtener("c"), {"valor": "c"})
+
+    def test_por_bytes(self):
+        cache = CacheSoluciones(max_bytes=100)
+        for clave in "abcde":
+            cache.guardar(clave, {"valor": clave * 30})
+            self.assertLessEqual(cache.bytes, 100)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual([clave for clave in "abcde" if clave in cache], ["d", "e"])
+        cache.vaciar()
+        self.assertEqual((len(cache), cache.bytes), (0, 0))
+
+
+class ArranqueEnCaliente(unittest.TestCase):
+
+    def _resolver(self, cache, demandas):
+        tsp = TSPCapacidad(distancias=self.distancias, demandas=demandas, capacidad_camion=100, semilla=0)
+        tsp.cache = cache
+        tsp.resolver_busqueda_local()
+        self.assertEqual(tsp.evaluar_ruta(list(tsp.mejor_ruta_indices))[0], tsp.mejor_distancia)
+        self.assertEqual(tsp.entregas_realizadas.entregado(len(demandas)), list(demandas))
+        return tsp
+
+    def setUp(self):
+        base = TSPCapacidad(num_nodos=120, capacidad_camion=100, semilla=5)
+        self.distancias = base.distancias
+        self.demandas = list(base.demandas)
+
+    def test_demanda_parecida(self):
+        cache = CacheSoluciones()
+        tabu = TSPCapacidad(distancias=self.distancias, demandas=self.demandas, capacidad_camion=100)
+        tabu.cache = cache
+        tabu.resolver_tabu(max_evaluaciones=20000)
+        # Con las mismas demandas, otro método parte de la ruta de la tabú en lugar del greedy
+        tsp = self._resolver(cache, self.demandas)
+        self.assertEqual(cache.arranques_en_caliente, 1)
+        self.assertLessEqual(tsp.mejor_distancia, tabu.mejor_distancia)
+
+    def test_demanda_distinta(self):
+        cache = CacheSoluciones()
+        self._resolver(cache, self.demandas)
+        # Con la mitad de la demanda la ruta guardada no sirve: se parte del greedy, como en frío
+        mitad = [demanda // 2 for demanda in self.demandas]
+        caliente = self._resolver(cache, mitad)
+        self.assertEqual(cache.arranques_en_caliente, 1)
+        frio = self._resolver(None, mitad)
+        self.assertEqual(caliente.mejor_distancia, frio.mejor_distancia)
+
+
+if __name__ == "__main__":
+    unittest.main()
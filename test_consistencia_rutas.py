@@ -0,0 +1,66 @@
+"""La ruta de cada resolutor, simulada con `evaluar_ruta`, da la solución que anuncia.
+
+`mejor_ruta_indices` es lo que se guarda, se exporta y se vuelve a cargar,
+así que su simulación tiene que reproducir la distancia, las entregas y los
+regresos de la solución y servir toda la demanda, también cuando un nodo se
+reparte entre varios viajes.
+"""
+import random
+import unittest
+
+from tsp_capacidad import TSPCapacidad
+
+
+class ConsistenciaRutas(unittest.TestCase):
+
+    def assertRutaReproduce(self, tsp):
+        distancia, entregas, regresos = tsp.evaluar_ruta(tsp.mejor_ruta_indices)
+        self.assertEqual(distancia, tsp.mejor_distancia)
+        simuladas = [(nodo, cantidad) for nodo, cantidad in zip(entregas.nodos, entregas.cantidades) if cantidad > 0]
+        self.assertEqual(simuladas, list(zip(tsp.entregas_realizadas.nodos, tsp.entregas_realizadas.cantidades)))
+        self.assertEqual(list(regresos), list(tsp.regresos_almacen))
+        servido = [0] * tsp.num_nodos
+        for nodo, cantidad in simuladas:
+            servido[nodo] += cantidad
+        self.assertEqual(servido, list(tsp.demandas))
+
+    def test_flota(self):
+        for semilla in range(10):
+            for capacidad in (25, 60):
+                with self.subTest(semilla=semilla, capacidad=capacidad):
+                    tsp = TSPCapacidad(num_nodos=60, capacidad_camion=capacidad, semilla=semilla)
+                    tsp.resolver_flota(max_evaluaciones=5000, max_procesos=1)
+                    self.assertRutaReproduce(tsp)
+
+    def test_descomposicion(self):
+        for semilla in range(10):
+            for capacidad in (25, 60):
+                with self.subTest(semilla=semilla, capacidad=capacidad):
+                    tsp = TSPCapacidad(num_nodos=80, capacidad_camion=capacidad, semilla=semilla)
+                    tsp.resolver_descomposicion(tamano_grupo=20, max_procesos=1)
+                    self.assertRutaReproduce(tsp)
+
+    def test_reoptimizacion(self):
+        """Tras cada cambio de una secuencia aleatoria, la ruta sigue cuadrando con la solución"""
+        for semilla in range(10):
+            rng = random.Random(semilla)
+            tsp = TSPCapacidad(num_nodos=40, capacidad_camion=rng.choice([20, 40, 60]), semilla=semilla)
+            getattr(tsp, "resolver_" + rng.choice(["greedy", "clarke_wright", "flota", "descomposicion"]))()
+            for paso in range(20):
+                cambio = rng.random()
+                if cambio < 0.4:
+                    tsp.cambiar_demanda(rng.randrange(1, tsp.num_nodos), rng.randint(0, 90), max_evaluaciones=1000)
+                elif cambio < 0.55:
+                    tsp.eliminar_nodo(rng.randrange(1, tsp.num_nodos), max_evaluaciones=1000)
+                elif cambio < 0.8:
+                    distancias = [0] + [rng.randint(10, 500) for _ in range(tsp.num_nodos - 1)]
+                    tsp.agregar_nodo(rng.randint(1, 70), distancias=distancias, max_evaluaciones=1000)
+                else:
+                    i, j = rng.sample(range(tsp.num_nodos), 2)
+                    tsp.cambiar_distancia(i, j, rng.randint(5, 500), max_evaluaciones=1000)
+                with self.subTest(semilla=semilla, paso=paso):
+                    self.assertRutaReproduce(tsp)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+"""Los métodos exactos del TSP genérico coinciden entre sí y sus cotas no superan la ruta hallada."""
+import unittest
+
+from distancias_euclideas import DistanciasEuclideas
+from tsp_generico import TSPGenerico
+
+
+class Exactos(unittest.TestCase):
+
+    def _comprobar_ruta(self, tsp):
+        ruta = list(tsp.mejor_ruta_indices)
+        self.assertEqual(ruta[0], ruta[-1])
+        self.assertEqual(sorted(ruta[:-1]), list(range(tsp.num_nodos)))
+        self.assertEqual(tsp.distancia_total(ruta[:-1]), tsp.mejor_distancia)
+
+    def test_held_karp_igual_a_fuerza_bruta(self):
+        for num_nodos in range(3, 11):
+            for semilla in range(3 if num_nodos < 10 else 1):
+                with self.subTest(num_nodos=num_nodos, semilla=semilla):
+                    bruta = TSPGenerico(num_nodos=num_nodos, semilla=semilla)
+                    bruta.resolver_fuerza_bruta()
+                    dinamica = TSPGenerico(distancias=bruta.distancias)
+                    dinamica.resolver_held_karp()
+                    self.assertEqual(dinamica.mejor_distancia, bruta.mejor_distancia)
+                    self._comprobar_ruta(dinamica)
+
+    def test_cota_de_ramificacion_poda(self):
+        for num_nodos, semilla, max_ramificaciones in ((8, 0, None), (12, 1, None), (30, 2, 20), (60, 3, 50)):
+            with self.subTest(num_nodos=num_nodos, semilla=semilla):
+                tsp = TSPGenerico(num_nodos=num_nodos, semilla=semilla)
+                tsp.resolver_ramificacion_poda(max_ramificaciones=max_ramificaciones)
+                self._comprobar_ruta(tsp)
+                self.assertLessEqual(tsp.cota_inferior, tsp.mejor_distancia)
+                if max_ramificaciones is None:
+                    exacta = TSPGenerico(distancias=tsp.distancias)
+                    exacta.resolver_held_karp()
+                    self.assertEqual(tsp.mejor_distancia, exacta.mejor_distancia)
+                    self.assertEqual(tsp.gap, 0)
+
+    def test_cota_euclidea(self):
+        tsp = TSPGenerico(distancias=DistanciasEuclideas.aleatoria(40, semilla=4))
+        tsp.resolver_ramificacion_poda(max_ramificaciones=30)
+        self._comprobar_ruta(tsp)
+        self.assertLessEqual(tsp.cota_inferior, tsp.mejor_distancia + 1e-6)
+
+
+if __name__ == "__main__":
+    unittest.main()
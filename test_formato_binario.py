@@ -0,0 +1,57 @@
+"""Una instancia o solución guardada en formato binario se carga tal como era."""
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from distancias_euclideas import DistanciasEuclideas
+from formato_binario import (abrir_instancia, cargar_instancia, cargar_solucion, escribir_instancia,
+                             guardar_instancia, guardar_solucion)
+from tsp_capacidad import TSPCapacidad
+from tsp_generico import TSPGenerico
+
+
+class IdaVuelta(unittest.TestCase):
+
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.fichero = os.path.join(self.directorio.name, "instancia.tspb")
+
+    def tearDown(self):
+        self.directorio.cleanup()
+
+    def test_capacidad(self):
+        tsp = TSPCapacidad(num_nodos=30, capacidad_camion=60, semilla=1)
+        tsp.resolver_greedy()
+        guardar_instancia(self.fichero, tsp)
+        guardar_solucion(self.fichero[:-5] + ".tspsol", tsp)
+        cargado = cargar_instancia(self.fichero)
+        np.testing.assert_array_equal(cargado.distancias.datos, tsp.distancias.datos)
+        self.assertEqual(cargado.demandas, list(tsp.demandas))
+        self.assertEqual(cargado.capacidad_camion, 60)
+        cargar_solucion(self.fichero[:-5] + ".tspsol", cargado)
+        self.assertEqual(list(cargado.mejor_ruta_indices), list(tsp.mejor_ruta_indices))
+        self.assertEqual(cargado.mejor_distancia, tsp.mejor_distancia)
+        self.assertEqual(cargado.entregas_realizadas, tsp.entregas_realizadas)
+        self.assertEqual(list(cargado.regresos_almacen), list(tsp.regresos_almacen))
+
+    def test_euclidea(self):
+        tsp = TSPGenerico(distancias=DistanciasEuclideas.aleatoria(50, semilla=2))
+        guardar_instancia(self.fichero, tsp)
+        cargado = cargar_instancia(self.fichero)
+        np.testing.assert_array_equal(cargado.distancias.coordenadas, tsp.distancias.coordenadas)
+
+    def test_tipos(self):
+        for demandas, capacidad in (([0, 2.5, 3.7, 1.2], 7.5), ([0, 300, 5, 70000], 100000), ([0, -3, 4, 1], 10),
+                                    ([0, 1, 2, 3], None)):
+            with self.subTest(demandas=demandas, capacidad=capacidad):
+                escribir_instancia(self.fichero, [[0, 1, 2, 3]] * 4, demandas, capacidad)
+                instancia = abrir_instancia(self.fichero)
+                self.assertEqual(instancia["demandas"].tolist(), demandas)
+                self.assertEqual(instancia["capacidad"], capacidad)
+                self.assertIs(type(instancia["capacidad"]), type(capacidad))
+
+
+if __name__ == "__main__":
+    unittest.main()
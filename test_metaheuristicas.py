@@ -0,0 +1,39 @@
+"""El recocido simulado y la búsqueda tabú nunca devuelven una ruta peor que su punto de partida.
+
+En el TSP genérico parten del óptimo local de 2-opt de la ruta del vecino
+más cercano; en el TSP con capacidad, del greedy llevado a un óptimo local
+de intercambios.
+"""
+import unittest
+
+from tsp_capacidad import TSPCapacidad
+from tsp_generico import TSPGenerico
+
+
+class NoEmpeoran(unittest.TestCase):
+
+    def test_generico(self):
+        for semilla in range(5):
+            partida = TSPGenerico(num_nodos=80, semilla=semilla)
+            partida.resolver_2opt()
+            for metodo in ("recocido_simulado", "tabu"):
+                with self.subTest(semilla=semilla, metodo=metodo):
+                    tsp = TSPGenerico(num_nodos=80, semilla=semilla)
+                    getattr(tsp, "resolver_" + metodo)(max_evaluaciones=5000)
+                    self.assertLessEqual(tsp.mejor_distancia, partida.mejor_distancia)
+                    self.assertEqual(tsp.distancia_total(tsp.mejor_ruta_indices), tsp.mejor_distancia)
+
+    def test_capacidad(self):
+        for semilla in range(5):
+            partida = TSPCapacidad(num_nodos=80, capacidad_camion=100, semilla=semilla)
+            partida.resolver_greedy()
+            for metodo in ("recocido_simulado", "tabu"):
+                with self.subTest(semilla=semilla, metodo=metodo):
+                    tsp = TSPCapacidad(num_nodos=80, capacidad_camion=100, semilla=semilla)
+                    getattr(tsp, "resolver_" + metodo)(max_evaluaciones=5000)
+                    self.assertLessEqual(tsp.mejor_distancia, partida.mejor_distancia)
+                    self.assertEqual(tsp.evaluar_ruta(tsp.mejor_ruta_indices)[0], tsp.mejor_distancia)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+"""Lectura y escritura de instancias TSPLIB y CVRPLIB."""
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from distancias_euclideas import DistanciasEuclideas
+from matriz_distancias import MatrizDistancias
+from tsp_capacidad import TSPCapacidad
+from tsp_generico import TSPGenerico
+from tsplib import cargar_tsplib, escribir_tsplib, guardar_tsplib, leer_tsplib
+
+
+class IdaVuelta(unittest.TestCase):
+
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.fichero = os.path.join(self.directorio.name, "instancia.tsp")
+
+    def tearDown(self):
+        self.directorio.cleanup()
+
+    def test_matriz(self):
+        tsp = TSPGenerico(num_nodos=25, semilla=1)
+        guardar_tsplib(self.fichero, tsp)
+        cargado = cargar_tsplib(self.fichero)
+        self.assertIsInstance(cargado, TSPGenerico)
+        np.testing.assert_array_equal(cargado.distancias.datos, tsp.distancias.datos)
+
+    def test_euclidea(self):
+        tsp = TSPGenerico(distancias=DistanciasEuclideas.aleatoria(40, semilla=2))
+        guardar_tsplib(self.fichero, tsp)
+        cargado = cargar_tsplib(self.fichero)
+        np.testing.assert_allclose(cargado.distancias.coordenadas, tsp.distancias.coordenadas, rtol=1e-9)
+
+    def test_capacidad(self):
+        tsp = TSPCapacidad(num_nodos=30, capacidad_camion=80, semilla=3)
+        guardar_tsplib(self.fichero, tsp)
+        cargado = cargar_tsplib(self.fichero)
+        self.assertIsInstance(cargado, TSPCapacidad)
+        np.testing.assert_array_equal(cargado.distancias.datos, tsp.distancias.datos)
+        self.assertEqual(cargado.demandas, list(tsp.demandas))
+        self.assertEqual(cargado.capacidad_camion, 80)
+        self.assertEqual(cargado.resolver_greedy()[1], tsp.resolver_greedy()[1])
+
+    def test_asimetrica(self):
+        datos = np.array([[0, 1, 9], [5, 0, 2], [3, 8, 0]])
+        escribir_tsplib(self.fichero, MatrizDistancias(datos))
+        instancia = leer_tsplib(self.fichero)
+        self.assertEqual(instancia["tipo"], "ATSP")
+        np.testing.assert_array_equal(instancia["distancias"].datos, datos)
+
+    def test_almacen_y_triangulo(self):
+        # Matriz en triángulo inferior con el almacén en el nodo 3: pasa a ser el índice 0
+        with open(self.fichero, "w", encoding="utf-8") as fichero:
+            fichero.write("NAME: t\nTYPE: CVRP\nDIMENSION: 3\nEDGE_WEIGHT_TYPE: EXPLICIT\n"
+                          "EDGE_WEIGHT_FORMAT: LOWER_ROW\nCAPACITY: 7\nEDGE_WEIGHT_SECTION\n4\n6 5\n"
+                          "DEMAND_SECTION\n1 2\n2 3\n3 0\nDEPOT_SECTION\n3\n-1\nEOF\n")
+        instancia = leer_tsplib(self.fichero)
+        np.testing.assert_array_equal(instancia["distancias"].datos, [[0, 6, 5], [6, 0, 4], [5, 4, 0]])
+        self.assertEqual(instancia["demandas"].tolist(), [0, 2, 3])
+        self.assertEqual(instancia["ids"].tolist(), [3, 1, 2])
+        self.assertEqual(instancia["capacidad"], 7)
+
+
+class Errores(unittest.TestCase):
+
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.fichero = os.path.join(self.directorio.name, "instancia.vrp")
+
+    def tearDown(self):
+        self.directorio.cleanup()
+
+    def _leer(self, texto):
+        with open(self.fichero, "w", encoding="utf-8") as fichero:
+            fichero.write(texto)
+        return leer_tsplib(self.fichero)
+
+    def test_valor_no_numerico(self):
+        cabecera = "NAME: x\nTYPE: CVRP\nDIMENSION: 3\nEDGE_WEIGHT_TYPE: EUC_2D\nCAPACITY: 10\n"
+        nodos = "NODE_COORD_SECTION\n1 0 0\n2 1 1\n3 2 2\n"
+        for texto, seccion, linea in ((cabecera + nodos.replace("2 1 1", "2 1 x1"), "NODE_COORD_SECTION", "2 1 x1"),
+                                      (cabecera + nodos + "DEMAND_SECTION\n1 0\n2 x\n3 4\n", "DEMAND_SECTION", "2 x"),
+                                      (cabecera + nodos + "DEPOT_SECTION\nA\n-1\n", "DEPOT_SECTION", "A")):
+            with self.subTest(seccion=seccion):
+                with self.assertRaises(ValueError) as error:
+                    self._leer(texto)
+                mensaje = str(error.exception)
+                self.assertTrue(mensaje.startswith(self.fichero + ": "), mensaje)
+                self.assertIn(seccion, mensaje)
+                self.assertIn(repr(linea), mensaje)
+
+
+if __name__ == "__main__":
+    unittest.main()
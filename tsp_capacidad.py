@@ -1,102 +1,189 @@
 import random
 import math
+import sys
+import numpy as np
+from array import array
 from collections import deque
-from utils import generar_etiquetas, indice_a_letra, mostrar_matriz
+from utils import etiqueta_de_indice, generar_etiquetas, indice_a_letra, indices_de_etiquetas, mostrar_matriz
+from matriz_distancias import MatrizDistancias
+from distancias_euclideas import DistanciasEuclideas
+from multiarranque import resolver_multiarranque
+from evaluador_rutas import EvaluadorIncremental
+from ahorros import clarke_wright, viajes_por_caminos
+from division_ruta import viajes_de_ruta_gigante
+from descomposicion import descomponer_capacidad, TAMANO_GRUPO
+from metaheuristicas import (MovimientosCapacidad, MAX_EVALUACIONES_DEFECTO, presupuesto_compartido,
+                             recocido_simulado, busqueda_tabu, descenso)
+from caminos_minimos import CaminosAlmacen, MAX_NODOS_FLOYD_WARSHALL, floyd_warshall
+from flota import resolver_flota
+from tsp_generico import TSPGenerico
+from instrumentacion import SIN_INSTRUMENTACION, instrumentado, sin_contar
+from cache_soluciones import cacheado, olvidar_huella
+from reoptimizacion import ReoptimizacionCapacidad
+from solucion import RegistroEntregas, Resultado, TIPO_ENTERO, ruta_compacta
+
+
+# Nodos que se listan uno a uno en la información del viaje; el resto se resume
+MAX_NODOS_LISTADO = 50
+# Parte de la demanda que puede cambiar para que aún se adapte la ruta de otra instancia
+MAX_CAMBIO_ADAPTACION = 0.01
+# Exceso sobre la distancia esperada con que aún se parte de una ruta adaptada en lugar del greedy
+TOLERANCIA_ADAPTACION = 0.01
 
 
 class TSPCapacidad:
-    def __init__(self, num_nodos=12, capacidad_camion=100, demandas=None):
-        self.num_nodos = num_nodos
-        self.etiquetas = generar_etiquetas(num_nodos)
+    def __init__(self, num_nodos=12, capacidad_camion=100, demandas=None, distancias=None, semilla=None,
+                 coordenadas=None, caminos_almacen=None):
+        self.rng = random.Random(semilla)
+        if coordenadas is not None:
+            # Instancia euclídea: distancias bajo demanda, sin matriz
+            distancias = DistanciasEuclideas(coordenadas)
+        if distancias is None:
+            self.num_nodos = num_nodos
+            self.distancias = self.generar_distancias()
+        else:
+            self.num_nodos = len(distancias)
+            self.distancias = (distancias if isinstance(distancias, (MatrizDistancias, DistanciasEuclideas))
+                               else MatrizDistancias(distancias))
+        self.etiquetas = generar_etiquetas(self.num_nodos)
+        self.indices_etiquetas = indices_de_etiquetas(self.etiquetas)
         self.capacidad_camion = capacidad_camion
-        self.distancias = self.generar_distancias()
         if demandas is None:
             self.demandas = self.generar_demandas()
         else:
             self.demandas = demandas
-        self.mejor_ruta_indices = None
-        self.mejor_ruta = None
+        self.mejor_ruta_indices = None  # array('q') con la ruta cerrada (ver `solucion.py`)
         self.mejor_distancia = float('inf')
-        self.entregas_realizadas = []
-        self.regresos_almacen = []  # Para registrar los viajes de regreso al almacén
+        self.entregas_realizadas = RegistroEntregas()
+        # Nodos desde los que se regresa al almacén; el camino y la distancia salen de `caminos_almacen`
+        self.regresos_almacen = array(TIPO_ENTERO)
+        self.traza_convergencia = []  # (segundos, mejor distancia) de la última metaheurística
+        # Caminos mínimos de regreso al almacén: se calculan la primera vez que se necesitan
+        self._caminos_almacen = caminos_almacen
+        self.rutas_flota = []  # Ruta de cada vehículo de la última resolución en modo flota
+        self.makespan = None
+        # Tiempos por fase y contadores de las resoluciones (ver `instrumentacion.py`)
+        self.instrumentacion = SIN_INSTRUMENTACION
+        # Caché de soluciones que consultan los métodos `resolver_*` (ver `cache_soluciones.py`)
+        self.cache = None
+        # Por qué se detuvo la última resolución antes de terminar: None, "tiempo" o "cancelacion"
+        self.interrupcion = None
+        self._presupuesto = None  # Presupuesto de la resolución en curso (ver `presupuesto_compartido`)
+        self._reoptimizacion = None  # Estado para reparar la solución tras cambios (ver `reoptimizacion.py`)
+
+    @property
+    def caminos_almacen(self):
+        """CaminosAlmacen de la instancia (distancia y camino mínimo de cada nodo al almacén)"""
+        if self._caminos_almacen is None:
+            with self.instrumentacion.fase("caminos_almacen"):
+                self._caminos_almacen = CaminosAlmacen(sin_contar(self.distancias))
+        return self._caminos_almacen
 
     def generar_distancias(self):
         """Genera una matriz de distancias aleatorias entre nodos (en km)"""
-        distancias = [[0] * self.num_nodos for _ in range(self.num_nodos)]
-        for i in range(self.num_nodos):
-            for j in range(i + 1, self.num_nodos):
-                dist = random.randint(10, 500)
-                distancias[i][j] = dist
-                distancias[j][i] = dist
-        return distancias
+        return MatrizDistancias.aleatoria(self.num_nodos, 10, 500, semilla=self.rng.getrandbits(64))
 
     def generar_demandas(self):
         """Genera demandas aleatorias para cada nodo (excepto el almacén)"""
         demandas = [0]  # El almacén (nodo 0) no tiene demanda
         for i in range(1, self.num_nodos):
             # Demanda entre 5 y 30
-            demanda = random.randint(5, 30)
+            demanda = self.rng.randint(5, 30)
             demandas.append(demanda)
         return demandas
 
     def distancia_total(self, ruta_indices):
-        """Calcula la distancia total de una ruta (dada en índices)"""
+        """Calcula la distancia total de una ruta (dada en índices); los regresos van por el camino mínimo"""
+        regreso = self.caminos_almacen.distancia
         total = 0
         for i in range(len(ruta_indices) - 1):
-            total += self.distancias[ruta_indices[i]][ruta_indices[i + 1]]
+            if ruta_indices[i + 1] == 0:
+                total += regreso[ruta_indices[i]]
+            else:
+                total += self.distancias[ruta_indices[i]][ruta_indices[i + 1]]
         return total
 
+    def etiquetar_ruta(self, ruta_indices):
+        """Convierte una ruta de índices en la lista de etiquetas de sus nodos"""
+        with self.instrumentacion.fase("etiquetas"):
+            return [indice_a_letra(i, self.etiquetas) for i in ruta_indices]
+
+    @property
+    def mejor_ruta(self):
+        """Etiquetas de la mejor ruta; se generan al consultarlas, no en cada resolución"""
+        return None if self.mejor_ruta_indices is None else self.etiquetar_ruta(self.mejor_ruta_indices)
+
+    def resultado(self):
+        """Resultado de la última resolución, con la ruta en índices"""
+        return Resultado(self.etiquetas, self.mejor_ruta_indices, self.mejor_distancia, self.entregas_realizadas)
+
     def obtener_ruta_optima_a_almacen(self, nodo_actual):
         """Obtiene la ruta óptima desde un nodo hasta el almacén (A)"""
-        # En este caso, como no hay restricciones adicionales, la ruta óptima es directa
-        # Pero en una implementación más compleja, podríamos usar Dijkstra o Floyd-Warshall
-        # Para este ejemplo, asumimos que la ruta directa es la óptima
-        return [nodo_actual, 0]
-
-    def resolver_greedy(self):
-        """Resuelve el TSP con capacidad usando un algoritmo greedy"""
+        # La matriz no cumple la desigualdad triangular: pasar por otros nodos puede
+        # ser más corto que el regreso directo. Los caminos mínimos están precalculados
+        return self.caminos_almacen.camino(nodo_actual)
+
+    def regreso_almacen(self, nodo_actual):
+        """Registro del regreso al almacén desde un nodo por su camino mínimo, con etiquetas (para mostrarlo)"""
+        with self.instrumentacion.fase("registros"):
+            return {
+                'nodo_inicio': indice_a_letra(nodo_actual, self.etiquetas),
+                'ruta': [indice_a_letra(i, self.etiquetas) for i in self.obtener_ruta_optima_a_almacen(nodo_actual)],
+                'distancia': self.caminos_almacen.distancia[nodo_actual]
+            }
+
+    @instrumentado("construccion")
+    @cacheado()
+    def resolver_greedy(self, tiempo_limite=None, cancelacion=None, progreso=None):
+        """Resuelve el TSP con capacidad usando un algoritmo greedy
+
+        La ruta solo anota las visitas y los pasos por el almacén; cada regreso
+        cuesta su camino mínimo, que queda en `regresos_almacen`.
+
+        Todos los métodos `resolver_*` admiten `tiempo_limite` (segundos),
+        una `Cancelacion` y una función `progreso(mejor_distancia, segundos)`;
+        si se agota el tiempo o se cancela devuelven la mejor solución hallada
+        hasta entonces y lo indican en `interrupcion`. El greedy interrumpido
+        termina las entregas pendientes en orden de índice, sin buscar el más
+        cercano.
+        """
+        with presupuesto_compartido(self, tiempo_limite, cancelacion, progreso) as presupuesto:
+            return self._greedy(presupuesto)
+
+    def _greedy(self, presupuesto):
         ruta_indices = [0]  # Empezamos en el almacén
         carga_actual = self.capacidad_camion
         distancia_total = 0
-        entregas = []
+        regreso = self.caminos_almacen.distancia
+        entregas = RegistroEntregas()
+        regresos = array(TIPO_ENTERO)
         demandas_pendientes = self.demandas.copy()
-        nodos_visitados = [False] * self.num_nodos
-        nodos_visitados[0] = True
+        # Nodos con demanda pendiente que aún no han recibido su entrega completa
+        disponibles = np.array(demandas_pendientes) > 0
+        disponibles[0] = False
+        pendientes = self.distancias.buscador(disponibles)
+        en_orden = 1  # Primer nodo que puede tener demanda pendiente, si se interrumpe la búsqueda
 
-        while not all(d == 0 for d in demandas_pendientes[1:]):
+        while len(pendientes):
             actual = ruta_indices[-1]
-            mejor_siguiente = None
-            mejor_distancia = float('inf')
 
-            # Buscar el nodo más cercano con demanda pendiente
-            for nodo in range(1, self.num_nodos):
-                if demandas_pendientes[nodo] > 0 and not nodos_visitados[nodo]:
-                    if self.distancias[actual][nodo] < mejor_distancia:
-                        mejor_distancia = self.distancias[actual][nodo]
-                        mejor_siguiente = nodo
+            if presupuesto.agotado():
+                # Interrumpido: el siguiente nodo con demanda pendiente, sin buscar el más cercano
+                while demandas_pendientes[en_orden] <= 0:
+                    en_orden += 1
+                mejor_siguiente = en_orden if en_orden != actual else None
+            else:
+                # Buscar el nodo más cercano con demanda pendiente
+                mejor_siguiente = pendientes.mas_cercano(actual)
+            if mejor_siguiente is not None:
+                mejor_distancia = self.distancias[actual][mejor_siguiente]
 
             if mejor_siguiente is None:
                 # No hay nodos accesibles, regresar al almacén por la ruta óptima
                 if actual != 0:
-                    ruta_optima = self.obtener_ruta_optima_a_almacen(actual)
-                    # Eliminar el primer nodo (actual) porque ya está en la ruta
-                    ruta_regreso = ruta_optima[1:]
-
-                    # Añadir la ruta de regreso a la ruta principal
-                    ruta_indices.extend(ruta_regreso)
-
-                    # Calcular la distancia del regreso
-                    distancia_regreso = 0
-                    for i in range(len(ruta_optima) - 1):
-                        distancia_regreso += self.distancias[ruta_optima[i]][ruta_optima[i + 1]]
-                    distancia_total += distancia_regreso
-
-                    # Registrar el regreso al almacén
-                    self.regresos_almacen.append({
-                        'nodo_inicio': indice_a_letra(actual, self.etiquetas),
-                        'ruta': [indice_a_letra(i, self.etiquetas) for i in ruta_optima],
-                        'distancia': distancia_regreso
-                    })
+                    ruta_indices.append(0)
+                    distancia_total += regreso[actual]
+                    regresos.append(actual)
 
                     # Recargar el camión
                     carga_actual = self.capacidad_camion
@@ -107,7 +194,7 @@ class TSPCapacidad:
                 # Entrega completa
                 cantidad_entregada = demandas_pendientes[mejor_siguiente]
                 demandas_pendientes[mejor_siguiente] = 0
-                nodos_visitados[mejor_siguiente] = True
+                pendientes.retirar(mejor_siguiente)
             else:
                 # Entrega parcial
                 cantidad_entregada = carga_actual
@@ -119,94 +206,495 @@ class TSPCapacidad:
             distancia_total += mejor_distancia
 
             # Registrar entrega
-            entregas.append({
-                'nodo': indice_a_letra(mejor_siguiente, self.etiquetas),
-                'cantidad': cantidad_entregada,
-                'carga_restante': carga_actual
-            })
+            entregas.agregar(mejor_siguiente, cantidad_entregada, carga_actual)
 
             # Si la carga es 0, regresar al almacén por la ruta óptima
             if carga_actual == 0:
-                ruta_optima = self.obtener_ruta_optima_a_almacen(mejor_siguiente)
-                # Eliminar el primer nodo (mejor_siguiente) porque ya está en la ruta
-                ruta_regreso = ruta_optima[1:]
-
-                # Añadir la ruta de regreso a la ruta principal
-                ruta_indices.extend(ruta_regreso)
-
-                # Calcular la distancia del regreso
-                distancia_regreso = 0
-                for i in range(len(ruta_optima) - 1):
-                    distancia_regreso += self.distancias[ruta_optima[i]][ruta_optima[i + 1]]
-                distancia_total += distancia_regreso
-
-                # Registrar el regreso al almacén
-                self.regresos_almacen.append({
-                    'nodo_inicio': indice_a_letra(mejor_siguiente, self.etiquetas),
-                    'ruta': [indice_a_letra(i, self.etiquetas) for i in ruta_optima],
-                    'distancia': distancia_regreso
-                })
+                ruta_indices.append(0)
+                distancia_total += regreso[mejor_siguiente]
+                regresos.append(mejor_siguiente)
 
                 # Recargar el camión
                 carga_actual = self.capacidad_camion
 
         # Regresar al almacén si no estamos allí
         if ruta_indices[-1] != 0:
-            ruta_optima = self.obtener_ruta_optima_a_almacen(ruta_indices[-1])
-            # Eliminar el primer nodo porque ya está en la ruta
-            ruta_regreso = ruta_optima[1:]
-
-            # Añadir la ruta de regreso a la ruta principal
-            ruta_indices.extend(ruta_regreso)
-
-            # Calcular la distancia del regreso
-            distancia_regreso = 0
-            for i in range(len(ruta_optima) - 1):
-                distancia_regreso += self.distancias[ruta_optima[i]][ruta_optima[i + 1]]
-            distancia_total += distancia_regreso
-
-            # Registrar el regreso al almacén
-            self.regresos_almacen.append({
-                'nodo_inicio': indice_a_letra(ruta_indices[-1], self.etiquetas),
-                'ruta': [indice_a_letra(i, self.etiquetas) for i in ruta_optima],
-                'distancia': distancia_regreso
-            })
-
-        self.mejor_ruta_indices = ruta_indices
+            distancia_total += regreso[ruta_indices[-1]]
+            regresos.append(ruta_indices[-1])
+            ruta_indices.append(0)
+
+        self.mejor_ruta_indices = ruta_compacta(ruta_indices)
         self.mejor_distancia = distancia_total
-        self.mejor_ruta = [indice_a_letra(i, self.etiquetas) for i in ruta_indices]
         self.entregas_realizadas = entregas
-        return self.mejor_ruta, distancia_total, entregas
-
-    def resolver_busqueda_local(self, max_iteraciones=100):
-        """Resuelve el TSP con capacidad usando búsqueda local"""
-        # Primero obtener una solución inicial con el método greedy
-        self.resolver_greedy()
-        mejor_ruta_indices = self.mejor_ruta_indices.copy()
-        mejor_distancia = self.mejor_distancia
-        mejor_entregas = self.entregas_realizadas.copy()
-        mejor_regresos = self.regresos_almacen.copy()
-
-        for _ in range(max_iteraciones):
-            # Generar una solución vecina
-            nueva_ruta_indices = self.generar_vecino(mejor_ruta_indices)
-
-            # Evaluar la nueva solución
-            nueva_distancia, nuevas_entregas, nuevos_regresos = self.evaluar_ruta(nueva_ruta_indices)
-
-            # Si es mejor, actualizar
-            if nueva_distancia < mejor_distancia:
-                mejor_ruta_indices = nueva_ruta_indices
-                mejor_distancia = nueva_distancia
-                mejor_entregas = nuevas_entregas
-                mejor_regresos = nuevos_regresos
-
-        self.mejor_ruta_indices = mejor_ruta_indices
-        self.mejor_distancia = mejor_distancia
-        self.mejor_ruta = [indice_a_letra(i, self.etiquetas) for i in mejor_ruta_indices]
-        self.entregas_realizadas = mejor_entregas
-        self.regresos_almacen = mejor_regresos
-        return self.mejor_ruta, mejor_distancia, mejor_entregas
+        self.regresos_almacen = regresos
+        return self.resultado()
+
+    @instrumentado("construccion")
+    @cacheado()
+    def resolver_clarke_wright(self, k_vecinos=50, forma=1.0, tiempo_limite=None, cancelacion=None, progreso=None):
+        """Resuelve el TSP con capacidad con el algoritmo de ahorros de Clarke–Wright
+
+        En matrices que no cumplen la desigualdad triangular los ahorros de
+        las distancias directas no reflejan lo que cuesta unir dos viajes.
+        Con hasta `MAX_NODOS_FLOYD_WARSHALL` nodos se calculan sobre los
+        caminos mínimos entre todos los pares (Floyd–Warshall) y cada viaje
+        pasa por los nodos intermedios de esos caminos (ver
+        `ahorros.viajes_por_caminos`); lo que esos pasos entregan de más se
+        repara con `adaptar_ruta`. Así queda por debajo del greedy (un 25-35 %
+        con 50 a 300 nodos aleatorios); en matrices no métricas mayores los
+        ahorros son los directos y suele quedar bastante peor (un 40 % más
+        largo con 1000 nodos).
+        """
+        with presupuesto_compartido(self, tiempo_limite, cancelacion, progreso) as presupuesto:
+            distancias = self.distancias
+            matriz = sin_contar(distancias)
+            siguiente = None
+            if isinstance(matriz, MatrizDistancias) and len(matriz) <= MAX_NODOS_FLOYD_WARSHALL:
+                with self.instrumentacion.fase("caminos_minimos"):
+                    todas, siguientes = floyd_warshall(matriz.datos)
+                if not np.array_equal(todas, matriz.datos):
+                    distancias = MatrizDistancias(todas.astype(np.int64) if np.array_equal(todas, np.floor(todas))
+                                                  else todas)
+                    siguiente = siguientes.tolist()
+            viajes = clarke_wright(distancias, self.demandas, self.capacidad_camion, k_vecinos, forma,
+                                   self.caminos_almacen.distancia, presupuesto)
+            if siguiente is not None:
+                viajes = viajes_por_caminos(viajes, siguiente)
+            ruta_indices = [0]
+            for viaje in viajes:
+                ruta_indices.extend(viaje)
+                ruta_indices.append(0)
+
+            if siguiente is None:
+                distancia_total, entregas, regresos = self.evaluar_ruta(ruta_indices)
+            else:
+                ruta_indices, entregas, regresos, distancia_total = self.adaptar_ruta(ruta_indices)
+
+            self.mejor_ruta_indices = ruta_compacta(ruta_indices)
+            self.mejor_distancia = distancia_total
+            self.entregas_realizadas = entregas
+            self.regresos_almacen = regresos
+        return self.resultado()
+
+    @instrumentado("construccion")
+    @cacheado()
+    def resolver_division_ruta(self, max_iteraciones=1000, k_vecinos=10, tiempo_limite=None, cancelacion=None,
+                               progreso=None):
+        """Resuelve el TSP con capacidad en dos fases: ruta gigante primero, viajes después
+
+        Construye un tour por todos los nodos con el TSP genérico (vecino más
+        cercano + 2-opt, sin capacidad) y lo corta en viajes con la división
+        óptima de `division_ruta.py`: para ese orden de visita, los regresos
+        al almacén quedan donde el coste total es mínimo. El tour consume el
+        límite de tiempo y atiende la cancelación de esta resolución; la
+        división siempre se completa.
+        """
+        with presupuesto_compartido(self, tiempo_limite, cancelacion, progreso) as presupuesto:
+            generico = TSPGenerico(distancias=sin_contar(self.distancias), semilla=self.rng.getrandbits(64))
+            generico.instrumentacion = self.instrumentacion
+            generico.cache = self.cache
+            with self.instrumentacion.fase("ruta_gigante"):
+                generico.resolver_2opt(max_iteraciones, k_vecinos, tiempo_limite=presupuesto.restante(),
+                                       cancelacion=presupuesto.cancelacion)
+            # Si el tour se ha interrumpido, la resolución también
+            presupuesto.agotado(inmediato=True)
+
+            with self.instrumentacion.fase("division"):
+                viajes = viajes_de_ruta_gigante(generico.mejor_ruta_indices, self.distancias, self.demandas,
+                                                self.capacidad_camion, self.caminos_almacen.distancia)
+            ruta_indices = [0]
+            for viaje in viajes:
+                ruta_indices.extend(viaje)
+                ruta_indices.append(0)
+
+            distancia_total, entregas, regresos = self.evaluar_ruta(ruta_indices)
+
+            self.mejor_ruta_indices = ruta_compacta(ruta_indices)
+            self.mejor_distancia = distancia_total
+            self.entregas_realizadas = entregas
+            self.regresos_almacen = regresos
+        return self.resultado()
+
+    @instrumentado("mejora")
+    @cacheado()
+    def resolver_busqueda_local(self, max_iteraciones=100, inicial="greedy", tiempo_limite=None, cancelacion=None,
+                                progreso=None):
+        """Resuelve el TSP con capacidad usando búsqueda local sobre una solución inicial
+
+        `inicial` indica la construcción de partida: "greedy", "clarke_wright",
+        "division_ruta" o una ruta cuyo orden de visita se reparte en viajes (ver `construir_inicial`).
+        Por defecto se parte del greedy, que es el mejor arranque en matrices
+        no métricas grandes; en instancias euclídeas y en matrices de hasta
+        `MAX_NODOS_FLOYD_WARSHALL` nodos suele convenir "clarke_wright".
+        """
+        with presupuesto_compartido(self, tiempo_limite, cancelacion, progreso) as presupuesto:
+            # Primero obtener una solución inicial con el método constructivo indicado
+            self.construir_inicial(inicial)
+            evaluador = EvaluadorIncremental(self.mejor_ruta_indices, self.distancias,
+                                             self.demandas, self.capacidad_camion, self.caminos_almacen.distancia)
+            clientes = evaluador.clientes
+            evaluados = 0
+            aceptados = 0
+
+            if len(clientes) >= 2:
+                while evaluados < max_iteraciones and not presupuesto.agotado():
+                    evaluados += 1
+                    # Intercambiar dos visitas a clientes (los pasos por el almacén no se mueven)
+                    i, j = sorted(self.rng.sample(clientes, 2))
+
+                    # Se valora primero la distancia en O(1) y solo si mejora se comprueban las entregas
+                    delta = evaluador.delta_intercambio(i, j)
+                    if delta < 0 and evaluador.intercambio_factible(i, j):
+                        evaluador.aplicar_intercambio(i, j, delta)
+                        aceptados += 1
+                        presupuesto.informar(evaluador.distancia)
+            self.instrumentacion.contar("movimientos_evaluados", evaluados)
+            self.instrumentacion.contar("movimientos_aceptados", aceptados)
+
+            # Los registros de entregas y regresos se construyen una sola vez, para la solución final
+            mejor_ruta_indices = evaluador.ruta
+            mejor_distancia, mejor_entregas, mejor_regresos = self.evaluar_ruta(mejor_ruta_indices)
+
+            self.mejor_ruta_indices = ruta_compacta(mejor_ruta_indices)
+            self.mejor_distancia = mejor_distancia
+            self.entregas_realizadas = mejor_entregas
+            self.regresos_almacen = mejor_regresos
+        return self.resultado()
+
+    @instrumentado("mejora")
+    @cacheado()
+    def resolver_recocido_simulado(self, tiempo_limite=None, max_evaluaciones=None, enfriamiento=None,
+                                   temperatura_inicial=None, inicial="greedy", k_vecinos=10, cancelacion=None,
+                                   progreso=None):
+        """Resuelve el TSP con capacidad con recocido simulado sobre intercambios de visitas"""
+        return self._resolver_metaheuristica(recocido_simulado, tiempo_limite, max_evaluaciones, inicial, k_vecinos,
+                                             cancelacion, progreso, temperatura_inicial=temperatura_inicial,
+                                             enfriamiento=enfriamiento)
+
+    @instrumentado("mejora")
+    @cacheado()
+    def resolver_tabu(self, tiempo_limite=None, max_evaluaciones=None, tenencia=10, candidatos=50,
+                      inicial="greedy", k_vecinos=10, cancelacion=None, progreso=None):
+        """Resuelve el TSP con capacidad con búsqueda tabú sobre intercambios de visitas"""
+        return self._resolver_metaheuristica(busqueda_tabu, tiempo_limite, max_evaluaciones, inicial, k_vecinos,
+                                             cancelacion, progreso, tenencia=tenencia, candidatos=candidatos)
+
+    def _resolver_metaheuristica(self, metaheuristica, tiempo_limite, max_evaluaciones, inicial, k_vecinos,
+                                 cancelacion, progreso, **parametros):
+        """Ejecuta una metaheurística de `metaheuristicas` y guarda su traza de convergencia
+
+        La metaheurística parte del óptimo local de la construcción `inicial`
+        (ver `metaheuristicas.descenso`), así que nunca devuelve nada peor.
+        """
+        with presupuesto_compartido(self, tiempo_limite, cancelacion, progreso, max_evaluaciones,
+                                    MAX_EVALUACIONES_DEFECTO) as presupuesto:
+            self.construir_inicial(inicial)
+            with self.instrumentacion.fase("listas_vecinos"):
+                vecinos = self.distancias.vecinos_cercanos(k_vecinos) if k_vecinos else None
+            vecindario = MovimientosCapacidad(self.mejor_ruta_indices, self.distancias, self.demandas,
+                                              self.capacidad_camion, vecinos, self.caminos_almacen.distancia)
+            with self.instrumentacion.fase("descenso"):
+                descenso(vecindario, presupuesto)
+            mejor_ruta_indices, _, self.traza_convergencia = metaheuristica(vecindario, self.rng, presupuesto,
+                                                                            **parametros)
+            self.instrumentacion.contar("movimientos_evaluados", presupuesto.evaluaciones)
+            self.instrumentacion.contar("movimientos_aceptados", presupuesto.aceptados)
+            mejor_distancia, mejor_entregas, mejor_regresos = self.evaluar_ruta(mejor_ruta_indices)
+
+            self.mejor_ruta_indices = ruta_compacta(mejor_ruta_indices)
+            self.mejor_distancia = mejor_distancia
+            self.entregas_realizadas = mejor_entregas
+            self.regresos_almacen = mejor_regresos
+        return self.resultado()
+
+    @instrumentado("multiarranque", contar_distancias=False)
+    @cacheado()
+    def resolver_multiarranque(self, num_arranques=8, tiempo_limite=None, max_procesos=None,
+                               max_iteraciones=1000, semilla=None, cancelacion=None, progreso=None):
+        """Resuelve el problema con varias búsquedas locales independientes en paralelo"""
+        with presupuesto_compartido(self, tiempo_limite, cancelacion, progreso) as presupuesto:
+            return resolver_multiarranque(self, num_arranques, tiempo_limite, max_procesos, max_iteraciones, semilla,
+                                          presupuesto)
+
+    @instrumentado("flota", contar_distancias=False)
+    @cacheado()
+    def resolver_flota(self, num_vehiculos=3, capacidades=None, tiempo_limite=None, max_evaluaciones=None,
+                       max_procesos=None, k_vecinos=10, cancelacion=None, progreso=None):
+        """Resuelve el problema con una flota de vehículos que reparten a la vez (ver `flota.py`)
+
+        `capacidades` da la capacidad de cada vehículo; por defecto hay
+        `num_vehiculos` iguales al camión. La ruta resultante encadena los
+        viajes de todos los vehículos en un orden en el que, con vehículos
+        iguales al camión, `evaluar_ruta` reproduce sus entregas; la de cada
+        vehículo queda en `rutas_flota` y la distancia del que tiene la
+        jornada más larga en `makespan`.
+        """
+        if capacidades is None:
+            capacidades = [self.capacidad_camion] * num_vehiculos
+        capacidades = list(capacidades)
+        if not capacidades or min(capacidades) <= 0:
+            raise ValueError("La flota necesita al menos un vehículo con capacidad positiva")
+        with presupuesto_compartido(self, tiempo_limite, cancelacion, progreso, max_evaluaciones,
+                                    MAX_EVALUACIONES_DEFECTO) as presupuesto:
+            viajes, vehiculo_de_viaje, nodos, cantidades = resolver_flota(
+                self.distancias, self.demandas, capacidades, self.caminos_almacen.distancia, tiempo_limite,
+                max_evaluaciones, max_procesos, k_vecinos, self.rng.getrandbits(64), presupuesto)
+
+            ruta_indices = [0]
+            entregas = RegistroEntregas(vehiculos=())
+            regresos = array(TIPO_ENTERO)
+            rutas_vehiculo = [[0] for _ in capacidades]
+            for viaje, v in zip(viajes, vehiculo_de_viaje):
+                carga_actual = capacidades[v]
+                for pedido in viaje:
+                    if cantidades[pedido] > 0:
+                        carga_actual -= cantidades[pedido]
+                        entregas.agregar(nodos[pedido], cantidades[pedido], carga_actual, v + 1)
+                recorrido = [nodos[pedido] for pedido in viaje] + [0]
+                ruta_indices.extend(recorrido)
+                rutas_vehiculo[v].extend(recorrido)
+                regresos.append(nodos[viaje[-1]])
+            self.rutas_flota = [{
+                'vehiculo': v + 1,
+                'capacidad': capacidad,
+                'ruta': self.etiquetar_ruta(ruta_vehiculo),
+                'viajes': vehiculo_de_viaje.count(v),
+                'distancia': self.distancia_total(ruta_vehiculo)
+            } for v, (capacidad, ruta_vehiculo) in enumerate(zip(capacidades, rutas_vehiculo))]
+
+            self.mejor_ruta_indices = ruta_compacta(ruta_indices)
+            self.mejor_distancia = sum(ruta['distancia'] for ruta in self.rutas_flota)
+            self.makespan = max(ruta['distancia'] for ruta in self.rutas_flota)
+            self.entregas_realizadas = entregas
+            self.regresos_almacen = regresos
+        return self.resultado()
+
+    @instrumentado("descomposicion", contar_distancias=False)
+    @cacheado()
+    def resolver_descomposicion(self, tamano_grupo=TAMANO_GRUPO, algoritmo="greedy", max_procesos=None, k_vecinos=10,
+                                tiempo_limite=None, max_evaluaciones=None, cancelacion=None, progreso=None):
+        """Resuelve instancias muy grandes por grupos de clientes cercanos (ver `descomposicion.py`)
+
+        Cada grupo de unos `tamano_grupo` clientes se resuelve en paralelo,
+        con el almacén, mediante `resolver_<algoritmo>`; los viajes de todos
+        los grupos se juntan y los movimientos entre viajes del modo flota
+        reparan las fronteras entre grupos.
+        """
+        with presupuesto_compartido(self, tiempo_limite, cancelacion, progreso, max_evaluaciones,
+                                    MAX_EVALUACIONES_DEFECTO) as presupuesto:
+            distancias = sin_contar(self.distancias)
+            regreso = self.caminos_almacen.distancia
+            with self.instrumentacion.fase("listas_vecinos"):
+                vecinos = distancias.vecinos_cercanos(k_vecinos)
+            with self.instrumentacion.fase("grupos"):
+                viajes, nodos, cantidades = descomponer_capacidad(
+                    distancias, self.demandas, self.capacidad_camion, regreso, vecinos, tamano_grupo, algoritmo,
+                    max_procesos, self.rng.getrandbits(64), presupuesto)
+
+            ruta_indices = [0]
+            entregas = RegistroEntregas()
+            regresos = array(TIPO_ENTERO)
+            for viaje in viajes:
+                carga_actual = self.capacidad_camion
+                for pedido in viaje:
+                    ruta_indices.append(nodos[pedido])
+                    if cantidades[pedido] > 0:
+                        carga_actual -= cantidades[pedido]
+                        entregas.agregar(nodos[pedido], cantidades[pedido], carga_actual)
+                ruta_indices.append(0)
+                regresos.append(nodos[viaje[-1]])
+
+            self.mejor_ruta_indices = ruta_compacta(ruta_indices)
+            self.mejor_distancia = self.distancia_total(ruta_indices)
+            self.entregas_realizadas = entregas
+            self.regresos_almacen = regresos
+        return self.resultado()
+
+    def _estado_reoptimizacion(self):
+        """Estado de reoptimización de la solución actual; None si aún no hay solución"""
+        if self.mejor_ruta_indices is None:
+            return None
+        estado = self._reoptimizacion
+        if estado is None or estado.ruta is not self.mejor_ruta_indices:
+            # Primer cambio desde la última resolución: se construye a partir de su ruta
+            with self.instrumentacion.fase("estado_reoptimizacion"):
+                estado = ReoptimizacionCapacidad(self.mejor_ruta_indices, self.demandas, self.capacidad_camion,
+                                                 sin_contar(self.distancias), self.caminos_almacen.distancia)
+            self._reoptimizacion = estado
+        return estado
+
+    def _reparar(self, estado, pedidos, tiempo_limite, max_evaluaciones, cancelacion, progreso):
+        """Repara la solución alrededor de `pedidos` y la deja como mejor solución"""
+        if estado is None:
+            return self.resultado()
+        with presupuesto_compartido(self, tiempo_limite, cancelacion, progreso, max_evaluaciones,
+                                    MAX_EVALUACIONES_DEFECTO) as presupuesto:
+            with self.instrumentacion.fase("mejora"):
+                estado.reparar(pedidos, presupuesto, self.rng)
+            (self.mejor_ruta_indices, self.entregas_realizadas, self.regresos_almacen,
+             self.mejor_distancia) = estado.solucion()
+        return self.resultado()
+
+    @instrumentado("reoptimizacion", contar_distancias=False)
+    def cambiar_demanda(self, nodo, demanda, tiempo_limite=None, max_evaluaciones=None, cancelacion=None,
+                        progreso=None):
+        """Cambia la demanda de un nodo y repara la solución actual en lugar de resolver de nuevo
+
+        Los cambios de la instancia (`agregar_nodo`, `eliminar_nodo`,
+        `cambiar_demanda`, `cambiar_distancia`) se aplican sobre ella y, si
+        ya está resuelta, reparan la mejor solución con inserción y retirada
+        más baratas seguidas de una búsqueda local limitada a los pedidos
+        afectados (ver `reoptimizacion.py`), de modo que el coste depende
+        del tamaño del cambio. Admiten el mismo límite de tiempo, de
+        evaluaciones, cancelación y progreso que los `resolver_*` y devuelven
+        el `Resultado` reparado.
+        """
+        if nodo == 0:
+            raise ValueError("El almacén (nodo 0) no tiene demanda")
+        estado = self._estado_reoptimizacion()
+        self.demandas = list(self.demandas)
+        self.demandas[nodo] = demanda
+        pedidos = [] if estado is None else estado.cambiar_demanda(nodo, demanda)
+        return self._reparar(estado, pedidos, tiempo_limite, max_evaluaciones, cancelacion, progreso)
+
+    def eliminar_nodo(self, nodo, **opciones):
+        """Da de baja un cliente: deja su demanda a cero y lo quita de la solución
+
+        El nodo conserva su índice y su etiqueta (no se renumeran los demás);
+        puede volver a activarse con `cambiar_demanda`.
+        """
+        return self.cambiar_demanda(nodo, 0, **opciones)
+
+    @instrumentado("reoptimizacion", contar_distancias=False)
+    def agregar_nodo(self, demanda, distancias=None, coordenada=None, tiempo_limite=None, max_evaluaciones=None,
+                     cancelacion=None, progreso=None):
+        """Añade un cliente con índice `num_nodos` y lo incorpora a la solución actual
+
+        En instancias con matriz se dan sus `distancias` a cada nodo
+        existente (simétricas) y la matriz se amplía con una copia; en las
+        euclídeas, su `coordenada` (x, y). Los caminos de regreso al almacén
+        se actualizan solo desde el nodo nuevo (`CaminosAlmacen.relajar`).
+        """
+        actuales = sin_contar(self.distancias)
+        euclidea = isinstance(actuales, DistanciasEuclideas)
+        if (coordenada if euclidea else distancias) is None:
+            raise ValueError("Hace falta la coordenada del nodo en instancias euclídeas y sus distancias en el resto")
+        estado = self._estado_reoptimizacion()
+        nuevas = actuales.con_nodo(coordenada if euclidea else distancias)
+        nodo = self.num_nodos
+        self.distancias = nuevas
+        self.num_nodos += 1
+        self.etiquetas.append(etiqueta_de_indice(nodo))
+        self.indices_etiquetas[self.etiquetas[nodo]] = nodo
+        self.demandas = list(self.demandas) + [0]
+        if estado is None:
+            self._caminos_almacen = None
+            self.demandas[nodo] = demanda
+            return self.resultado()
+        caminos = self.caminos_almacen
+        estado.ampliar(nuevas, caminos.distancia)
+        cambiados = caminos.relajar(nuevas, [nodo], estado.vecinos if euclidea else None)
+        pedidos = estado.recalcular(cambiados)
+        self.demandas[nodo] = demanda
+        pedidos += estado.cambiar_demanda(nodo, demanda)
+        return self._reparar(estado, pedidos, tiempo_limite, max_evaluaciones, cancelacion, progreso)
+
+    @instrumentado("reoptimizacion", contar_distancias=False)
+    def cambiar_distancia(self, i, j, distancia, tiempo_limite=None, max_evaluaciones=None, cancelacion=None,
+                          progreso=None):
+        """Cambia la distancia entre i y j (en ambos sentidos) y repara la solución actual
+
+        La matriz se modifica en su sitio. Si la distancia baja, los caminos
+        de regreso se actualizan desde i y j; si sube y la arista formaba
+        parte de algún camino de regreso, se recalculan todos.
+        """
+        actuales = sin_contar(self.distancias)
+        if isinstance(actuales, DistanciasEuclideas):
+            raise ValueError("En las instancias euclídeas las distancias salen de las coordenadas")
+        estado = self._estado_reoptimizacion()
+        anterior = actuales[i][j]
+        actuales.cambiar(i, j, distancia)
+        olvidar_huella(actuales)
+        if estado is None:
+            self._caminos_almacen = None
+            return self.resultado()
+        estado.acercar(i, j, distancia)
+        caminos = self.caminos_almacen
+        cambiados = set()
+        if distancia < anterior:
+            cambiados = caminos.relajar(actuales, [i, j])
+        elif distancia > anterior and (caminos.siguiente[i] == j or caminos.siguiente[j] == i):
+            previas = np.asarray(caminos.distancia)
+            self._caminos_almacen = CaminosAlmacen(actuales)
+            estado.motor.regreso = self._caminos_almacen.distancia
+            cambiados = set(np.flatnonzero(np.asarray(self._caminos_almacen.distancia) != previas).tolist())
+        pedidos = estado.recalcular(cambiados | {i, j})
+        return self._reparar(estado, pedidos, tiempo_limite, max_evaluaciones, cancelacion, progreso)
+
+    def construir_inicial(self, inicial):
+        """Solución de partida de las mejoras: con el método constructivo `inicial`, una ruta o un `Resultado`
+
+        Si `inicial` es una ruta se adapta a las demandas y la capacidad
+        actuales con `adaptar_ruta`. Si es el `Resultado` de una instancia
+        parecida (el arranque en caliente desde la caché), con demandas o
+        capacidad muy distintas la adaptación queda más larga que el greedy
+        y además cuesta más que construirlo: solo se adapta su ruta si
+        `distancia_esperada` lo admite, y si la ruta adaptada la supera en
+        más de `TOLERANCIA_ADAPTACION` se construye también el greedy y se
+        parte de la más corta de las dos.
+        """
+        if isinstance(inicial, str):
+            getattr(self, "resolver_" + inicial)()
+            return
+        esperada = None
+        if isinstance(inicial, Resultado):
+            esperada = self.distancia_esperada(inicial)
+            if esperada is None:
+                self.resolver_greedy()
+                return
+            inicial = inicial.ruta_indices
+        ruta_indices, entregas, regresos, distancia = self.adaptar_ruta(inicial)
+        if esperada is not None and distancia > esperada * (1 + TOLERANCIA_ADAPTACION):
+            self.resolver_greedy()
+            if distancia >= self.mejor_distancia:
+                return
+        self.mejor_ruta_indices, self.entregas_realizadas = ruta_indices, entregas
+        self.regresos_almacen, self.mejor_distancia = regresos, distancia
+
+    def distancia_esperada(self, resultado):
+        """Distancia que cabe esperar al adaptar la solución `resultado` de otra instancia, o None si no se adapta
+
+        Es la de `resultado` escalada por la demanda total de ahora y la que
+        entregaba. No se adapta (None) si `resultado` no tiene entregas, si
+        su capacidad, la carga con que sale el camión a la primera entrega,
+        es otra o si cambia más de `MAX_CAMBIO_ADAPTACION` de la demanda.
+        """
+        entregas = resultado.entregas
+        if entregas is None or not len(entregas):
+            return None
+        if entregas.cantidades[0] + entregas.cargas[0] != self.capacidad_camion:
+            return None
+        demandas = np.asarray(self.demandas)
+        entregado = np.bincount(np.asarray(entregas.nodos), weights=np.asarray(entregas.cantidades),
+                                minlength=len(demandas))
+        if np.abs(demandas - entregado).sum() > MAX_CAMBIO_ADAPTACION * demandas.sum():
+            return None
+        return resultado.distancia * demandas.sum() / entregado.sum()
+
+    def adaptar_ruta(self, ruta_indices):
+        """Solución (ruta, entregas, regresos, distancia) factible con las demandas actuales a partir de otra ruta
+
+        Conserva el orden de visitas y los regresos de `ruta_indices`. Es la
+        reparación de la reoptimización (`ReoptimizacionCapacidad`): la
+        ruta se simula con las demandas y la capacidad actuales, las visitas
+        que ya no entregan nada se quitan si eso no la alarga y lo que queda
+        pendiente (demandas que han crecido) llena primero los huecos de los
+        viajes que ya pasan por el nodo y luego se inserta donde menos cuesta.
+        Con las mismas demandas y capacidad la distancia no cambia.
+        """
+        estado = ReoptimizacionCapacidad(ruta_indices, self.demandas, self.capacidad_camion,
+                                         sin_contar(self.distancias), self.caminos_almacen.distancia)
+        return estado.solucion()
 
     def generar_vecino(self, ruta_indices):
         """Genera una solución vecina intercambiando dos nodos"""
@@ -217,60 +705,52 @@ class TSPCapacidad:
         if len(indices) < 2:
             return nueva_ruta_indices
 
-        i, j = random.sample(indices, 2)
+        i, j = self.rng.sample(indices, 2)
         nueva_ruta_indices[i], nueva_ruta_indices[j] = nueva_ruta_indices[j], nueva_ruta_indices[i]
 
         return nueva_ruta_indices
 
     def evaluar_ruta(self, ruta_indices):
         """Evalúa una ruta calculando la distancia y las entregas realizadas"""
-        distancia_total = 0
-        carga_actual = self.capacidad_camion
-        entregas = []
-        regresos = []
-        demandas_pendientes = self.demandas.copy()
+        with self.instrumentacion.fase("evaluar_ruta"):
+            regreso = self.caminos_almacen.distancia
+            distancia_total = 0
+            carga_actual = self.capacidad_camion
+            entregas = RegistroEntregas()
+            regresos = array(TIPO_ENTERO)
+            demandas_pendientes = self.demandas.copy()
+
+            # Simular entregas
+            for i in range(len(ruta_indices) - 1):
+                nodo_actual = ruta_indices[i]
+                siguiente_nodo = ruta_indices[i + 1]
+
+                # Si estamos en un nodo de entrega
+                if nodo_actual != 0 and demandas_pendientes[nodo_actual] > 0:
+                    if carga_actual >= demandas_pendientes[nodo_actual]:
+                        cantidad_entregada = demandas_pendientes[nodo_actual]
+                        demandas_pendientes[nodo_actual] = 0
+                    else:
+                        cantidad_entregada = carga_actual
+                        demandas_pendientes[nodo_actual] -= cantidad_entregada
+
+                    carga_actual -= cantidad_entregada
+
+                    entregas.agregar(nodo_actual, cantidad_entregada, carga_actual)
+
+                # Si llegamos al almacén, recargar
+                if siguiente_nodo == 0:
+                    carga_actual = self.capacidad_camion
+                    # Registrar el regreso al almacén
+                    if nodo_actual != 0:
+                        regresos.append(nodo_actual)
 
-        # Simular entregas
-        for i in range(len(ruta_indices) - 1):
-            nodo_actual = ruta_indices[i]
-            siguiente_nodo = ruta_indices[i + 1]
-
-            # Si estamos en un nodo de entrega
-            if nodo_actual != 0 and demandas_pendientes[nodo_actual] > 0:
-                if carga_actual >= demandas_pendientes[nodo_actual]:
-                    cantidad_entregada = demandas_pendientes[nodo_actual]
-                    demandas_pendientes[nodo_actual] = 0
+                if siguiente_nodo == 0:
+                    distancia_total += regreso[nodo_actual]
                 else:
-                    cantidad_entregada = carga_actual
-                    demandas_pendientes[nodo_actual] -= cantidad_entregada
-
-                carga_actual -= cantidad_entregada
-
-                entregas.append({
-                    'nodo': indice_a_letra(nodo_actual, self.etiquetas),
-                    'cantidad': cantidad_entregada,
-                    'carga_restante': carga_actual
-                })
+                    distancia_total += self.distancias[nodo_actual][siguiente_nodo]
 
-            # Si llegamos al almacén, recargar
-            if siguiente_nodo == 0:
-                carga_actual = self.capacidad_camion
-                # Registrar el regreso al almacén
-                if nodo_actual != 0:
-                    ruta_optima = self.obtener_ruta_optima_a_almacen(nodo_actual)
-                    distancia_regreso = 0
-                    for j in range(len(ruta_optima) - 1):
-                        distancia_regreso += self.distancias[ruta_optima[j]][ruta_optima[j + 1]]
-
-                    regresos.append({
-                        'nodo_inicio': indice_a_letra(nodo_actual, self.etiquetas),
-                        'ruta': [indice_a_letra(idx, self.etiquetas) for idx in ruta_optima],
-                        'distancia': distancia_regreso
-                    })
-
-            distancia_total += self.distancias[nodo_actual][siguiente_nodo]
-
-        return distancia_total, entregas, regresos
+            return distancia_total, entregas, regresos
 
     def mostrar_informacion_viaje(self):
         """Muestra la información del viaje antes de empezar"""
@@ -281,11 +761,26 @@ class TSPCapacidad:
         mostrar_matriz(self.distancias, self.etiquetas)
 
         print("\nDemandas por nodo:")
-        for i, demanda in enumerate(self.demandas):
-            if i == 0:
-                print(f"Almacén (Nodo {self.etiquetas[i]}): {demanda}")
-            else:
-                print(f"Nodo {self.etiquetas[i]}: {demanda}")
+        lineas = [f"Almacén (Nodo {self.etiquetas[0]}): {self.demandas[0]}"]
+        lineas.extend(f"Nodo {self.etiquetas[i]}: {self.demandas[i]}"
+                      for i in range(1, min(len(self.demandas), MAX_NODOS_LISTADO)))
+        if len(self.demandas) > MAX_NODOS_LISTADO:
+            lineas.append(f"... ({len(self.demandas) - MAX_NODOS_LISTADO} nodos más; "
+                          f"demanda total {sum(self.demandas)} unidades)")
+        sys.stdout.write("\n".join(lineas) + "\n")
+
+    def mostrar_flota(self):
+        """Muestra la ruta, los viajes y la distancia de cada vehículo de la flota"""
+        print("\n=== FLOTA ===")
+        lineas = []
+        for ruta in self.rutas_flota:
+            lineas.append(f"Vehículo {ruta['vehiculo']} (capacidad {ruta['capacidad']}): {ruta['viajes']} viajes, "
+                          f"{ruta['distancia']:.2f} km")
+            if len(ruta['ruta']) <= MAX_NODOS_LISTADO:
+                lineas.append("  " + " -> ".join(ruta['ruta']))
+        sys.stdout.write("\n".join(lineas) + "\n")
+        print(f"Distancia total: {self.mejor_distancia:.2f} km")
+        print(f"Makespan (jornada más larga): {self.makespan:.2f} km")
 
     def mostrar_resultados(self):
         """Muestra los resultados de la solución"""
@@ -294,20 +789,21 @@ class TSPCapacidad:
         print(" -> ".join(self.mejor_ruta))
         print(f"Distancia total: {self.mejor_distancia:.2f} km")
 
+        # Las etiquetas de entregas y regresos solo se generan aquí, al mostrarlos.
+        # Cada listado se escribe de una vez, no con un print por línea
         print("\nEntregas realizadas:")
-        for entrega in self.entregas_realizadas:
-            print(
-                f"  - Nodo {entrega['nodo']}: {entrega['cantidad']} unidades (Carga restante: {entrega['carga_restante']})")
+        sys.stdout.write("".join(
+            f"  - Nodo {entrega['nodo']}: {entrega['cantidad']} unidades (Carga restante: {entrega['carga_restante']})\n"
+            for entrega in self.entregas_realizadas.como_diccionarios(self.etiquetas)))
 
         print("\nRegresos al almacén (rutas óptimas):")
-        for regreso in self.regresos_almacen:
-            print(f"  - Desde {regreso['nodo_inicio']}: {' -> '.join(regreso['ruta'])} ({regreso['distancia']:.2f} km)")
+        sys.stdout.write("".join(
+            f"  - Desde {regreso['nodo_inicio']}: {' -> '.join(regreso['ruta'])} ({regreso['distancia']:.2f} km)\n"
+            for regreso in map(self.regreso_almacen, self.regresos_almacen)))
 
         # Verificar si todas las demandas fueron satisfechas
-        demandas_pendientes = self.demandas.copy()
-        for entrega in self.entregas_realizadas:
-            nodo_idx = self.etiquetas.index(entrega['nodo'])
-            demandas_pendientes[nodo_idx] -= entrega['cantidad']
+        entregado = self.entregas_realizadas.entregado(self.num_nodos)
+        demandas_pendientes = [demanda - cantidad for demanda, cantidad in zip(self.demandas, entregado)]
 
         pendientes = [f"{self.etiquetas[i]}({d})" for i, d in enumerate(demandas_pendientes) if d > 0]
         if pendientes:
@@ -316,7 +812,7 @@ class TSPCapacidad:
             print("\n✅ Todas las demandas han sido satisfechas")
 
         # Verificar que la ruta comienza y termina en el almacén
-        if self.mejor_ruta[0] == 'A' and self.mejor_ruta[-1] == 'A':
+        if self.mejor_ruta_indices[0] == 0 and self.mejor_ruta_indices[-1] == 0:
             print("\n✅ La ruta comienza y termina en el almacén (A)")
         else:
             print("\n⚠️ La ruta no cumple con el requisito de regresar al almacén")
\ No newline at end of file
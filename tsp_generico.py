@@ -1,150 +1,406 @@
-import random
-import math
-from itertools import permutations
-import time
-from utils import generar_etiquetas, indice_a_letra, mostrar_matriz
-
-
-class TSPGenerico:
-    def __init__(self, num_nodos=12):
-        self.num_nodos = num_nodos
-        self.etiquetas = generar_etiquetas(num_nodos)
-        self.distancias = self.generar_distancias()
-        self.mejor_ruta_indices = None
-        self.mejor_ruta = None
-        self.mejor_distancia = float('inf')
-
-    def generar_distancias(self):
-        """Genera una matriz de distancias aleatorias entre nodos (en km)"""
-        distancias = [[0] * self.num_nodos for _ in range(self.num_nodos)]
-        for i in range(self.num_nodos):
-            for j in range(i + 1, self.num_nodos):
-                # Distancia aleatoria entre 10 y 500 km
-                dist = random.randint(10, 500)
-                distancias[i][j] = dist
-                distancias[j][i] = dist
-        return distancias
-
-    def distancia_total(self, ruta_indices):
-        """Calcula la distancia total de una ruta (dada en índices)"""
-        total = 0
-        for i in range(len(ruta_indices)):
-            total += self.distancias[ruta_indices[i]][ruta_indices[(i + 1) % len(ruta_indices)]]
-        return total
-
-    def resolver_fuerza_bruta(self):
-        """Resuelve el TSP mediante fuerza bruta (solo para n <= 10)"""
-        if self.num_nodos > 10:
-            print("La fuerza bruta no es eficiente para más de 10 nodos.")
-            return None, None
-
-        nodos = list(range(self.num_nodos))
-        mejor_ruta_indices = None
-        mejor_distancia = float('inf')
-
-        for perm in permutations(nodos[1:]):
-            ruta_indices = [nodos[0]] + list(perm)
-            distancia = self.distancia_total(ruta_indices)
-            if distancia < mejor_distancia:
-                mejor_distancia = distancia
-                mejor_ruta_indices = ruta_indices
-
-        # Asegurar que la ruta regrese al nodo inicial
-        if mejor_ruta_indices[-1] != mejor_ruta_indices[0]:
-            mejor_ruta_indices.append(mejor_ruta_indices[0])
-
-        self.mejor_ruta_indices = mejor_ruta_indices
-        self.mejor_distancia = mejor_distancia
-        self.mejor_ruta = [indice_a_letra(i, self.etiquetas) for i in mejor_ruta_indices]
-        return self.mejor_ruta, mejor_distancia
-
-    def resolver_vecino_mas_cercano(self):
-        """Resuelve el TSP usando el algoritmo del vecino más cercano"""
-        visitados = [False] * self.num_nodos
-        ruta_indices = [0]  # Empezamos en el nodo 0
-        visitados[0] = True
-        distancia_total = 0
-
-        while len(ruta_indices) < self.num_nodos:
-            actual = ruta_indices[-1]
-            min_distancia = float('inf')
-            siguiente_nodo = None
-
-            for nodo in range(self.num_nodos):
-                if not visitados[nodo] and self.distancias[actual][nodo] < min_distancia:
-                    min_distancia = self.distancias[actual][nodo]
-                    siguiente_nodo = nodo
-
-            if siguiente_nodo is not None:
-                ruta_indices.append(siguiente_nodo)
-                visitados[siguiente_nodo] = True
-                distancia_total += min_distancia
-
-        # Regresar al nodo inicial
-        if ruta_indices[-1] != ruta_indices[0]:
-            ruta_indices.append(ruta_indices[0])
-            distancia_total += self.distancias[ruta_indices[-2]][ruta_indices[-1]]
-
-        self.mejor_ruta_indices = ruta_indices
-        self.mejor_distancia = distancia_total
-        self.mejor_ruta = [indice_a_letra(i, self.etiquetas) for i in ruta_indices]
-        return self.mejor_ruta, distancia_total
-
-    def resolver_2opt(self, max_iteraciones=1000):
-        """Resuelve el TSP usando el algoritmo 2-opt"""
-        # Generar una ruta inicial con vecino más cercano
-        self.resolver_vecino_mas_cercano()
-        ruta_indices = self.mejor_ruta_indices[:-1]  # Eliminar el último nodo (que es el inicial)
-        mejor_distancia = self.mejor_distancia
-
-        mejorado = True
-        iteraciones = 0
-
-        while mejorado and iteraciones < max_iteraciones:
-            mejorado = False
-            iteraciones += 1
-
-            for i in range(1, len(ruta_indices) - 2):
-                for j in range(i + 1, len(ruta_indices)):
-                    if j - i == 1:
-                        continue
-
-                    # Crear nueva ruta intercambiando aristas
-                    nueva_ruta_indices = ruta_indices[:]
-                    nueva_ruta_indices[i:j] = ruta_indices[j - 1:i - 1:-1]  # Invertir el segmento
-
-                    # Calcular nueva distancia
-                    nueva_distancia = self.distancia_total(nueva_ruta_indices)
-
-                    if nueva_distancia < mejor_distancia:
-                        ruta_indices = nueva_ruta_indices
-                        mejor_distancia = nueva_distancia
-                        mejorado = True
-
-            # Actualizar la mejor ruta
-            ruta_indices_completa = ruta_indices + [ruta_indices[0]]
-            self.mejor_ruta_indices = ruta_indices_completa
-            self.mejor_distancia = mejor_distancia
-
-        self.mejor_ruta = [indice_a_letra(i, self.etiquetas) for i in self.mejor_ruta_indices]
-        return self.mejor_ruta, self.mejor_distancia
-
-    def mostrar_informacion_problema(self):
-        """Muestra la información del problema antes de resolver"""
-        print("\n=== INFORMACIÓN DEL PROBLEMA TSP GENÉRICO ===")
-        print(f"Número de nodos: {self.num_nodos}")
-        print("\nMatriz de distancias (km):")
-        mostrar_matriz(self.distancias, self.etiquetas)
-
-    def mostrar_resultados(self):
-        """Muestra los resultados de la solución"""
-        print("\n=== RESULTADOS TSP GENÉRICO ===")
-        print("\nMejor ruta encontrada:")
-        print(" -> ".join(self.mejor_ruta))
-        print(f"Distancia total: {self.mejor_distancia:.2f} km")
-
-        # Verificar que la ruta comienza y termina en el mismo nodo
-        if self.mejor_ruta[0] == self.mejor_ruta[-1]:
-            print("\n✅ La ruta comienza y termina en el mismo nodo (A)")
-        else:
+import random
+import math
+import numpy as np
+from itertools import permutations
+import time
+from utils import generar_etiquetas, indice_a_letra, indices_de_etiquetas, mostrar_matriz
+from busqueda_local import BusquedaLocal
+from matriz_distancias import MatrizDistancias
+from distancias_euclideas import DistanciasEuclideas
+from held_karp import held_karp, MAX_NODOS_HELD_KARP
+from ramificacion_poda import (ramificacion_poda, cota_held_karp, MAX_ABIERTOS, MAX_RAMIFICACIONES,
+                               MAX_NODOS_RAMIFICACION_PODA)
+from multiarranque import resolver_multiarranque
+from descomposicion import descomponer_tsp, TAMANO_GRUPO
+from metaheuristicas import (MovimientosTour, MAX_EVALUACIONES_DEFECTO, presupuesto_compartido, recocido_simulado,
+                             busqueda_tabu)
+from instrumentacion import SIN_INSTRUMENTACION, instrumentado, sin_contar
+from cache_soluciones import cacheado
+from solucion import Resultado, ruta_compacta
+
+
+class TSPGenerico:
+    def __init__(self, num_nodos=12, distancias=None, semilla=None, coordenadas=None):
+        self.rng = random.Random(semilla)
+        if coordenadas is not None:
+            # Instancia euclídea: distancias bajo demanda, sin matriz
+            distancias = DistanciasEuclideas(coordenadas)
+        if distancias is None:
+            self.num_nodos = num_nodos
+            self.distancias = self.generar_distancias()
+        else:
+            self.num_nodos = len(distancias)
+            self.distancias = (distancias if isinstance(distancias, (MatrizDistancias, DistanciasEuclideas))
+                               else MatrizDistancias(distancias))
+        self.etiquetas = generar_etiquetas(self.num_nodos)
+        self.indices_etiquetas = indices_de_etiquetas(self.etiquetas)
+        self.mejor_ruta_indices = None  # array('q') con la ruta cerrada (ver `solucion.py`)
+        self.mejor_distancia = float('inf')
+        self.memoria_pico = None
+        # Cota inferior de la longitud del tour óptimo (ver `calcular_cota_inferior` y `gap`)
+        self.cota_inferior = None
+        self.traza_convergencia = []  # (segundos, mejor distancia) de la última metaheurística
+        self._listas_vecinos = {}
+        # Tiempos por fase y contadores de las resoluciones (ver `instrumentacion.py`)
+        self.instrumentacion = SIN_INSTRUMENTACION
+        # Caché de soluciones que consultan los métodos `resolver_*` (ver `cache_soluciones.py`)
+        self.cache = None
+        # Por qué se detuvo la última resolución antes de terminar: None, "tiempo" o "cancelacion"
+        self.interrupcion = None
+        self._presupuesto = None  # Presupuesto de la resolución en curso (ver `presupuesto_compartido`)
+
+    def generar_distancias(self):
+        """Genera una matriz de distancias aleatorias entre nodos (en km)"""
+        # Distancia aleatoria entre 10 y 500 km
+        return MatrizDistancias.aleatoria(self.num_nodos, 10, 500, semilla=self.rng.getrandbits(64))
+
+    def distancia_total(self, ruta_indices):
+        """Calcula la distancia total de una ruta (dada en índices)"""
+        total = 0
+        for i in range(len(ruta_indices)):
+            total += self.distancias[ruta_indices[i]][ruta_indices[(i + 1) % len(ruta_indices)]]
+        return total
+
+    def etiquetar_ruta(self, ruta_indices):
+        """Convierte una ruta de índices en la lista de etiquetas de sus nodos"""
+        with self.instrumentacion.fase("etiquetas"):
+            return [indice_a_letra(i, self.etiquetas) for i in ruta_indices]
+
+    @property
+    def mejor_ruta(self):
+        """Etiquetas de la mejor ruta; se generan al consultarlas, no en cada resolución"""
+        return None if self.mejor_ruta_indices is None else self.etiquetar_ruta(self.mejor_ruta_indices)
+
+    def resultado(self):
+        """Resultado de la última resolución, con la ruta en índices"""
+        return Resultado(self.etiquetas, self.mejor_ruta_indices, self.mejor_distancia)
+
+    @property
+    def gap(self):
+        """Distancia relativa de la mejor ruta a `cota_inferior` (0 si es óptima), o None sin cota"""
+        if self.cota_inferior is None or self.mejor_ruta_indices is None:
+            return None
+        if not self.mejor_distancia:
+            return 0.0
+        return max(self.mejor_distancia - self.cota_inferior, 0) / self.mejor_distancia
+
+    def calcular_cota_inferior(self, max_iteraciones=None):
+        """Calcula la cota de Held–Karp (1-árbol con subgradiente) para conocer el `gap` de cualquier ruta
+
+        El paso del subgradiente se mide con la mejor distancia actual (sin
+        ruta, con la del vecino más cercano). Necesita la matriz completa y
+        simétrica (ver `exigir_simetrica`): cada iteración cuesta O(n²).
+        """
+        self.exigir_simetrica()
+        if self.mejor_ruta_indices is None:
+            self.resolver_vecino_mas_cercano()
+        with self.instrumentacion.fase("cota_inferior"):
+            cota = cota_held_karp(sin_contar(self.distancias), self.mejor_distancia, max_iteraciones)
+        self.cota_inferior = cota if self.cota_inferior is None else max(cota, self.cota_inferior)
+        return self.cota_inferior
+
+    @instrumentado("construccion")
+    @cacheado()
+    def resolver_fuerza_bruta(self, tiempo_limite=None, cancelacion=None, progreso=None):
+        """Resuelve el TSP mediante fuerza bruta (solo para n <= 10)
+
+        Todos los métodos `resolver_*` admiten `tiempo_limite` (segundos),
+        una `Cancelacion` y una función `progreso(mejor_distancia, segundos)`;
+        si se agota el tiempo o se cancela devuelven la mejor ruta hallada hasta
+        entonces y lo indican en `interrupcion`.
+        """
+        if self.num_nodos > 10:
+            print("La fuerza bruta no es eficiente para más de 10 nodos.")
+            return None, None
+
+        with presupuesto_compartido(self, tiempo_limite, cancelacion, progreso) as presupuesto:
+            nodos = list(range(self.num_nodos))
+            mejor_ruta_indices = None
+            mejor_distancia = float('inf')
+
+            for perm in permutations(nodos[1:]):
+                ruta_indices = [nodos[0]] + list(perm)
+                distancia = self.distancia_total(ruta_indices)
+                if distancia < mejor_distancia:
+                    mejor_distancia = distancia
+                    mejor_ruta_indices = ruta_indices
+                    presupuesto.informar(mejor_distancia)
+                if presupuesto.agotado():
+                    break
+
+            # Asegurar que la ruta regrese al nodo inicial
+            if mejor_ruta_indices[-1] != mejor_ruta_indices[0]:
+                mejor_ruta_indices.append(mejor_ruta_indices[0])
+
+            self.mejor_ruta_indices = ruta_compacta(mejor_ruta_indices)
+            self.mejor_distancia = mejor_distancia
+        return self.resultado()
+
+    @instrumentado("construccion")
+    @cacheado()
+    def resolver_held_karp(self, tiempo_limite=None, cancelacion=None, progreso=None):
+        """Resuelve el TSP de forma exacta con programación dinámica (solo para n <= 22)
+
+        La programación dinámica no tiene soluciones intermedias: si se
+        interrumpe, se devuelve la del vecino más cercano completada.
+        """
+        if self.num_nodos > MAX_NODOS_HELD_KARP:
+            print(f"Held-Karp no es eficiente para más de {MAX_NODOS_HELD_KARP} nodos.")
+            return None, None
+
+        with presupuesto_compartido(self, tiempo_limite, cancelacion, progreso) as presupuesto:
+            ruta_indices, distancia, self.memoria_pico = held_karp(self.distancias, presupuesto)
+            if ruta_indices is None:
+                return self.resolver_vecino_mas_cercano()
+
+            self.mejor_ruta_indices = ruta_compacta(ruta_indices)
+            self.mejor_distancia = distancia
+        return self.resultado()
+
+    @instrumentado("construccion")
+    @cacheado()
+    def resolver_ramificacion_poda(self, gap_objetivo=0.0, max_ramificaciones=MAX_RAMIFICACIONES,
+                                   max_abiertos=MAX_ABIERTOS, tiempo_limite=None, cancelacion=None, progreso=None):
+        """Resuelve el TSP de forma exacta con ramificación y poda y cotas de 1-árbol (solo para n <= 200)
+
+        Parte de la ruta de 3-opt y la mejora con inmersiones periódicas en
+        profundidad (ver `ramificacion_poda.py`). Demuestra el óptimo de
+        instancias de 40 a 100 nodos en segundos o decenas de segundos,
+        aunque algunas de 80 nodos siguen sin cerrarse en un minuto.
+        Como heurística se detiene al bajar de `gap_objetivo` (p. ej. 0.01
+        para un 1 %), tras `max_ramificaciones` nodos expandidos (por defecto
+        2000, unos minutos con 100 nodos; None para no limitarlos) o al
+        agotarse el tiempo, con la mejor ruta hallada. La cota inferior queda
+        en `cota_inferior` y el `gap` es 0 cuando la ruta es óptima. Con más
+        de `max_abiertos` nodos abiertos la búsqueda sigue en profundidad
+        para acotar la memoria.
+        """
+        if self.num_nodos > MAX_NODOS_RAMIFICACION_PODA:
+            print(f"La ramificación y poda no es eficiente para más de {MAX_NODOS_RAMIFICACION_PODA} nodos.")
+            return None, None
+        self.exigir_simetrica()
+
+        with presupuesto_compartido(self, tiempo_limite, cancelacion, progreso) as presupuesto:
+            self.resolver_3opt()
+            with self.instrumentacion.fase("ramificacion"):
+                ruta_indices, distancia, cota, ramificaciones = ramificacion_poda(
+                    sin_contar(self.distancias), self.mejor_ruta_indices, self.mejor_distancia, presupuesto,
+                    gap_objetivo, max_ramificaciones, max_abiertos)
+            self.instrumentacion.contar("ramificaciones", ramificaciones)
+
+            self.mejor_ruta_indices = ruta_compacta(ruta_indices)
+            self.mejor_distancia = distancia
+            self.cota_inferior = cota if self.cota_inferior is None else max(cota, self.cota_inferior)
+        return self.resultado()
+
+    @instrumentado("construccion")
+    @cacheado()
+    def resolver_vecino_mas_cercano(self, inicio=0, tiempo_limite=None, cancelacion=None, progreso=None):
+        """Resuelve el TSP usando el algoritmo del vecino más cercano partiendo de `inicio`
+
+        Si se interrumpe, los nodos que faltan se añaden en orden de índice
+        para devolver igualmente una ruta completa.
+        """
+        with presupuesto_compartido(self, tiempo_limite, cancelacion, progreso) as presupuesto:
+            # Nodos sin visitar, en un buscador del más cercano (índice espacial si hay coordenadas)
+            pendientes = self.distancias.buscador(np.ones(self.num_nodos, dtype=bool))
+            visitados = np.zeros(self.num_nodos, dtype=bool)
+            ruta_indices = [inicio]
+            pendientes.retirar(inicio)
+            visitados[inicio] = True
+            distancia_total = 0
+
+            while len(ruta_indices) < self.num_nodos:
+                if presupuesto.agotado():
+                    resto = np.flatnonzero(~visitados)
+                    desde = np.concatenate(([ruta_indices[-1]], resto[:-1]))
+                    distancia_total += self.distancias.pares(desde, resto).sum().item()
+                    ruta_indices.extend(resto.tolist())
+                    break
+                actual = ruta_indices[-1]
+                siguiente_nodo = pendientes.mas_cercano(actual)
+
+                if siguiente_nodo is not None:
+                    ruta_indices.append(siguiente_nodo)
+                    pendientes.retirar(siguiente_nodo)
+                    visitados[siguiente_nodo] = True
+                    distancia_total += self.distancias[actual][siguiente_nodo]
+
+            # Regresar al nodo inicial
+            if ruta_indices[-1] != ruta_indices[0]:
+                ruta_indices.append(ruta_indices[0])
+                distancia_total += self.distancias[ruta_indices[-2]][ruta_indices[-1]]
+
+            # La ruta se presenta siempre empezando y terminando en el nodo 0
+            if inicio != 0:
+                corte = ruta_indices.index(0)
+                ruta_indices = ruta_indices[corte:-1] + ruta_indices[:corte] + [0]
+
+            self.mejor_ruta_indices = ruta_compacta(ruta_indices)
+            self.mejor_distancia = distancia_total
+        return self.resultado()
+
+    def exigir_simetrica(self):
+        """Lanza ValueError si las distancias no son simétricas (por ejemplo, un ATSP)
+
+        2-opt, Or-opt, 3-opt y las metaheurísticas evalúan cada movimiento
+        con las aristas en un solo sentido e invierten tramos de la ruta: con
+        distancias asimétricas darían longitudes falsas, incluso negativas.
+        Las cotas de 1-árbol tratan cada arista como no dirigida.
+        """
+        if not self.distancias.es_simetrica():
+            raise ValueError("2-opt, Or-opt, 3-opt, las metaheurísticas y las cotas de 1-árbol necesitan distancias "
+                             "simétricas; con distancias asimétricas usa vecino_mas_cercano, fuerza_bruta o held_karp")
+
+    def listas_vecinos(self, k=10):
+        """Devuelve (y guarda en caché) las listas de los k vecinos más cercanos"""
+        if k not in self._listas_vecinos:
+            with self.instrumentacion.fase("listas_vecinos"):
+                self._listas_vecinos[k] = self.distancias.vecinos_cercanos(k)
+        return self._listas_vecinos[k]
+
+    def mejorar_ruta(self, movimientos, max_iteraciones=1000, k_vecinos=10, max_segmento=3, presupuesto=None,
+                     activos=None):
+        """Aplica los movimientos de `BusquedaLocal` indicados (por nombre) a la mejor ruta actual
+
+        Con `activos` la búsqueda solo parte de esos nodos (ver `BusquedaLocal.optimizar`).
+        Necesita distancias simétricas (ver `exigir_simetrica`).
+        """
+        self.exigir_simetrica()
+        motor = BusquedaLocal(self.mejor_ruta_indices[:-1], self.distancias,
+                              self.listas_vecinos(k_vecinos), self.mejor_distancia, max_segmento)
+        pasadas = motor.optimizar([getattr(motor, nombre) for nombre in movimientos], max_iteraciones, presupuesto,
+                                  activos)
+        self.instrumentacion.contar("pasadas", pasadas)
+        self.instrumentacion.contar("nodos_examinados", motor.examinados)
+        self.instrumentacion.contar("movimientos_aceptados", motor.aplicados)
+
+        self.mejor_ruta_indices = ruta_compacta(motor.ruta_desde(0))
+        self.mejor_distancia = motor.distancia
+        return self.resultado()
+
+    @instrumentado("mejora")
+    @cacheado()
+    def resolver_2opt(self, max_iteraciones=1000, k_vecinos=10, tiempo_limite=None, cancelacion=None, progreso=None):
+        """Resuelve el TSP usando 2-opt con evaluación delta, listas de vecinos y bits no mirar"""
+        with presupuesto_compartido(self, tiempo_limite, cancelacion, progreso) as presupuesto:
+            # Generar una ruta inicial con vecino más cercano
+            self.resolver_vecino_mas_cercano()
+            return self.mejorar_ruta(["mejorar_2opt"], max_iteraciones, k_vecinos, presupuesto=presupuesto)
+
+    @instrumentado("mejora")
+    @cacheado(encadena=True)
+    def resolver_or_opt(self, max_iteraciones=1000, k_vecinos=10, max_segmento=3, tiempo_limite=None,
+                        cancelacion=None, progreso=None):
+        """Mejora la ruta actual reubicando segmentos de 1 a 3 nodos (Or-opt)"""
+        with presupuesto_compartido(self, tiempo_limite, cancelacion, progreso) as presupuesto:
+            # Si aún no hay ruta se parte del vecino más cercano; si la hay, se encadena sobre ella
+            if self.mejor_ruta_indices is None:
+                self.resolver_vecino_mas_cercano()
+            return self.mejorar_ruta(["mejorar_or_opt"], max_iteraciones, k_vecinos, max_segmento, presupuesto)
+
+    @instrumentado("mejora")
+    @cacheado(encadena=True)
+    def resolver_3opt(self, max_iteraciones=1000, k_vecinos=10, max_segmento=30, tiempo_limite=None,
+                      cancelacion=None, progreso=None):
+        """Mejora la ruta actual con 2-opt e inversión + reinserción de segmentos (Or-3opt)"""
+        with presupuesto_compartido(self, tiempo_limite, cancelacion, progreso) as presupuesto:
+            if self.mejor_ruta_indices is None:
+                self.resolver_vecino_mas_cercano()
+            return self.mejorar_ruta(["mejorar_2opt", "mejorar_or_opt"], max_iteraciones, k_vecinos, max_segmento,
+                                     presupuesto)
+
+    @instrumentado("mejora")
+    @cacheado(encadena=True)
+    def resolver_recocido_simulado(self, tiempo_limite=None, max_evaluaciones=None, enfriamiento=None,
+                                   temperatura_inicial=None, k_vecinos=10, cancelacion=None, progreso=None):
+        """Mejora la ruta actual (o la del 2-opt) con recocido simulado sobre 2-opt"""
+        return self._resolver_metaheuristica(recocido_simulado, tiempo_limite, max_evaluaciones, k_vecinos,
+                                             cancelacion, progreso, temperatura_inicial=temperatura_inicial,
+                                             enfriamiento=enfriamiento)
+
+    @instrumentado("mejora")
+    @cacheado(encadena=True)
+    def resolver_tabu(self, tiempo_limite=None, max_evaluaciones=None, tenencia=10, candidatos=50, k_vecinos=10,
+                      cancelacion=None, progreso=None):
+        """Mejora la ruta actual (o la del 2-opt) con búsqueda tabú sobre 2-opt"""
+        return self._resolver_metaheuristica(busqueda_tabu, tiempo_limite, max_evaluaciones, k_vecinos,
+                                             cancelacion, progreso, tenencia=tenencia, candidatos=candidatos)
+
+    def _resolver_metaheuristica(self, metaheuristica, tiempo_limite, max_evaluaciones, k_vecinos, cancelacion,
+                                 progreso, **parametros):
+        """Ejecuta una metaheurística de `metaheuristicas` y guarda su traza de convergencia
+
+        Antes se lleva la ruta a un óptimo local de 2-opt: la metaheurística
+        parte de ahí y nunca devuelve nada peor.
+        """
+        self.exigir_simetrica()
+        with presupuesto_compartido(self, tiempo_limite, cancelacion, progreso, max_evaluaciones,
+                                    MAX_EVALUACIONES_DEFECTO) as presupuesto:
+            if self.mejor_ruta_indices is None:
+                self.resolver_vecino_mas_cercano()
+            self.mejorar_ruta(["mejorar_2opt"], k_vecinos=k_vecinos, presupuesto=presupuesto)
+            vecindario = MovimientosTour(self.mejor_ruta_indices[:-1], self.distancias,
+                                         self.listas_vecinos(k_vecinos), self.mejor_distancia)
+            ruta_indices, distancia, self.traza_convergencia = metaheuristica(vecindario, self.rng, presupuesto,
+                                                                               **parametros)
+            self.instrumentacion.contar("movimientos_evaluados", presupuesto.evaluaciones)
+            self.instrumentacion.contar("movimientos_aceptados", presupuesto.aceptados)
+
+            self.mejor_ruta_indices = ruta_compacta(ruta_indices)
+            self.mejor_distancia = distancia
+        return self.resultado()
+
+    @instrumentado("multiarranque", contar_distancias=False)
+    @cacheado()
+    def resolver_multiarranque(self, num_arranques=8, tiempo_limite=None, max_procesos=None,
+                               max_iteraciones=1000, semilla=None, cancelacion=None, progreso=None):
+        """Resuelve el TSP con varios arranques independientes en paralelo (vecino más cercano + 3-opt)"""
+        self.exigir_simetrica()
+        with presupuesto_compartido(self, tiempo_limite, cancelacion, progreso) as presupuesto:
+            return resolver_multiarranque(self, num_arranques, tiempo_limite, max_procesos, max_iteraciones, semilla,
+                                          presupuesto)
+
+    @instrumentado("descomposicion", contar_distancias=False)
+    @cacheado()
+    def resolver_descomposicion(self, tamano_grupo=TAMANO_GRUPO, algoritmo="3opt", max_procesos=None,
+                                max_iteraciones=1000, k_vecinos=10, tiempo_limite=None, cancelacion=None,
+                                progreso=None):
+        """Resuelve instancias muy grandes por grupos de nodos cercanos (ver `descomposicion.py`)
+
+        Cada grupo de unos `tamano_grupo` nodos se resuelve en paralelo con
+        `resolver_<algoritmo>`, los tours se cosen por las aristas de conexión
+        más baratas y un 2-opt + Or-opt repara las fronteras entre grupos.
+        """
+        self.exigir_simetrica()
+        with presupuesto_compartido(self, tiempo_limite, cancelacion, progreso) as presupuesto:
+            vecinos = self.listas_vecinos(k_vecinos)
+            with self.instrumentacion.fase("grupos"):
+                ruta_indices, frontera = descomponer_tsp(sin_contar(self.distancias), vecinos, tamano_grupo, algoritmo,
+                                                         max_procesos, self.rng.getrandbits(64), presupuesto)
+            self.instrumentacion.contar("nodos_frontera", len(frontera))
+            self.mejor_ruta_indices = ruta_compacta(ruta_indices)
+            self.mejor_distancia = self.distancias.pares(self.mejor_ruta_indices[:-1],
+                                                         self.mejor_ruta_indices[1:]).sum().item()
+            return self.mejorar_ruta(["mejorar_2opt", "mejorar_or_opt"], max_iteraciones, k_vecinos,
+                                     presupuesto=presupuesto, activos=frontera)
+
+    def mostrar_informacion_problema(self):
+        """Muestra la información del problema antes de resolver"""
+        print("\n=== INFORMACIÓN DEL PROBLEMA TSP GENÉRICO ===")
+        print(f"Número de nodos: {self.num_nodos}")
+        print("\nMatriz de distancias (km):")
+        mostrar_matriz(self.distancias, self.etiquetas)
+
+    def mostrar_resultados(self):
+        """Muestra los resultados de la solución"""
+        print("\n=== RESULTADOS TSP GENÉRICO ===")
+        print("\nMejor ruta encontrada:")
+        print(" -> ".join(self.mejor_ruta))
+        print(f"Distancia total: {self.mejor_distancia:.2f} km")
+
+        # Verificar que la ruta comienza y termina en el mismo nodo
+        if self.mejor_ruta_indices[0] == self.mejor_ruta_indices[-1]:
+            print("\n✅ La ruta comienza y termina en el mismo nodo (A)")
+        else:
             print("\n⚠️ La ruta no cumple con el requisito de regresar al punto de partida")
\ No newline at end of file
@@ -0,0 +1,293 @@
+"""Lectura y escritura de instancias en los formatos TSPLIB y CVRPLIB.
+
+Se admiten:
+
+- TSPLIB (`TYPE: TSP` o `ATSP`) con `EDGE_WEIGHT_TYPE: EUC_2D` (coordenadas
+  en `NODE_COORD_SECTION`) o `EXPLICIT` (matriz en `EDGE_WEIGHT_SECTION`, en
+  los formatos FULL_MATRIX, UPPER_ROW, LOWER_ROW, UPPER_DIAG_ROW,
+  LOWER_DIAG_ROW y sus equivalentes por columnas);
+- CVRPLIB (`TYPE: CVRP`), que añade `CAPACITY`, `DEMAND_SECTION` y
+  `DEPOT_SECTION`.
+
+El fichero se lee línea a línea y los números de cada sección se escriben
+directamente en arrays de NumPy reservados con el tamaño de `DIMENSION`, sin
+acumular listas de Python. Las instancias EUC_2D se cargan como
+DistanciasEuclideas (mismo redondeo al entero más cercano que TSPLIB) y las
+explícitas como MatrizDistancias.
+
+Los nodos se reordenan para que el almacén (el primero de `DEPOT_SECTION`)
+sea el índice 0, como esperan los solvers; `ids` guarda el número TSPLIB de
+cada índice para poder escribir las rutas con la numeración original.
+"""
+import numpy as np
+from matriz_distancias import MatrizDistancias
+from distancias_euclideas import DistanciasEuclideas
+
+# Formatos de EDGE_WEIGHT_SECTION según qué triángulo dan, por filas (ambas
+# matrices son simétricas: el triángulo superior por columnas es el inferior
+# por filas, y viceversa)
+_TRIANGULO_SUPERIOR = {"UPPER_ROW", "LOWER_COL"}
+_TRIANGULO_INFERIOR = {"LOWER_ROW", "UPPER_COL"}
+_TRIANGULO_SUPERIOR_DIAGONAL = {"UPPER_DIAG_ROW", "LOWER_DIAG_COL"}
+_TRIANGULO_INFERIOR_DIAGONAL = {"LOWER_DIAG_ROW", "UPPER_DIAG_COL"}
+
+
+def _numero(valor):
+    valor = float(valor)
+    return int(valor) if valor.is_integer() else valor
+
+
+def _leer_numeros(lineas, destino, fichero, seccion):
+    """Rellena el array plano `destino` con los números de las siguientes líneas de `seccion`"""
+    posicion = 0
+    total = len(destino)
+    while posicion < total:
+        linea = next(lineas, None)
+        if linea is None:
+            raise ValueError(f"{fichero}: faltan datos en {seccion} (se esperaban {total} valores, hay {posicion})")
+        try:
+            valores = np.fromstring(linea, sep=" ")
+        except ValueError:
+            raise ValueError(f"{fichero}: valor no numérico en {seccion}: {linea.strip()!r}") from None
+        if posicion + len(valores) > total:
+            raise ValueError(f"{fichero}: sobran datos en {seccion}: {linea.strip()!r}")
+        destino[posicion:posicion + len(valores)] = valores
+        posicion += len(valores)
+
+
+def _leer_tabla(lineas, num_nodos, columnas, fichero, seccion):
+    """Lee `num_nodos` líneas de "número de nodo, valores..." y devuelve los valores por índice"""
+    tabla = np.empty((num_nodos, columnas + 1), dtype=np.float64)
+    _leer_numeros(lineas, tabla.reshape(-1), fichero, seccion)
+    ids = tabla[:, 0].astype(np.int64)
+    if ids.min() < 1 or ids.max() > num_nodos or len(np.unique(ids)) != num_nodos:
+        raise ValueError(f"{fichero}: los nodos deben estar numerados de 1 a {num_nodos}")
+    valores = np.empty((num_nodos, columnas), dtype=np.float64)
+    valores[ids - 1] = tabla[:, 1:]
+    return valores
+
+
+def _leer_pesos(lineas, num_nodos, formato, fichero):
+    """Lee EDGE_WEIGHT_SECTION y devuelve la matriz completa n×n"""
+    matriz = np.zeros((num_nodos, num_nodos), dtype=np.float64)
+    if formato == "FULL_MATRIX":
+        _leer_numeros(lineas, matriz.reshape(-1), fichero, "EDGE_WEIGHT_SECTION")
+        np.fill_diagonal(matriz, 0)
+        return matriz
+    if formato in _TRIANGULO_SUPERIOR:
+        filas, columnas = np.triu_indices(num_nodos, 1)
+    elif formato in _TRIANGULO_INFERIOR:
+        filas, columnas = np.tril_indices(num_nodos, -1)
+    elif formato in _TRIANGULO_SUPERIOR_DIAGONAL:
+        filas, columnas = np.triu_indices(num_nodos)
+    elif formato in _TRIANGULO_INFERIOR_DIAGONAL:
+        filas, columnas = np.tril_indices(num_nodos)
+    else:
+        raise ValueError(f"{fichero}: EDGE_WEIGHT_FORMAT {formato} no soportado")
+    valores = np.empty(len(filas), dtype=np.float64)
+    _leer_numeros(lineas, valores, fichero, "EDGE_WEIGHT_SECTION")
+    matriz[filas, columnas] = valores
+    matriz[columnas, filas] = valores
+    np.fill_diagonal(matriz, 0)
+    return matriz
+
+
+def _leer_depositos(lineas, fichero):
+    """Lee DEPOT_SECTION (números de nodo terminados en -1)"""
+    depositos = []
+    for linea in lineas:
+        for valor in linea.split():
+            try:
+                nodo = int(valor)
+            except ValueError:
+                raise ValueError(f"{fichero}: valor no numérico en DEPOT_SECTION: {linea.strip()!r}") from None
+            if nodo == -1:
+                return depositos
+            depositos.append(nodo)
+    raise ValueError(f"{fichero}: DEPOT_SECTION sin terminar en -1")
+
+
+def _saltar_hasta_fin(lineas):
+    """Salta una sección terminada en -1 (p. ej. FIXED_EDGES_SECTION)"""
+    for linea in lineas:
+        if linea.split()[:1] == ["-1"]:
+            return
+
+
+def leer_cabecera(fichero_tsplib):
+    """Devuelve las claves de la especificación (NAME, TYPE, DIMENSION...) sin leer las secciones"""
+    cabecera = {}
+    with open(fichero_tsplib, encoding="utf-8", errors="replace") as fichero:
+        for linea in fichero:
+            clave, separador, valor = linea.partition(":")
+            clave = clave.strip().upper()
+            if not separador or clave.endswith("_SECTION"):
+                break
+            cabecera[clave] = valor.strip()
+    return cabecera
+
+
+def leer_tsplib(fichero_tsplib):
+    """Lee una instancia TSPLIB o CVRPLIB.
+
+    Devuelve un diccionario con `nombre`, `tipo`, `distancias`, `demandas`
+    (array o None), `capacidad` (o None) e `ids` (número TSPLIB de cada nodo).
+    """
+    cabecera = {}
+    coordenadas = matriz = demandas = None
+    depositos = []
+    with open(fichero_tsplib, encoding="utf-8", errors="replace") as fichero:
+        lineas = (linea for linea in fichero if linea.strip())
+        for linea in lineas:
+            clave, _, valor = linea.partition(":")
+            clave = clave.strip().upper()
+            if clave == "EOF":
+                break
+            if not clave.endswith("_SECTION"):
+                cabecera[clave] = valor.strip()
+                continue
+            if "DIMENSION" not in cabecera:
+                raise ValueError(f"{fichero_tsplib}: falta DIMENSION antes de {clave}")
+            num_nodos = int(cabecera["DIMENSION"])
+            if clave == "NODE_COORD_SECTION":
+                if cabecera.get("NODE_COORD_TYPE", "TWOD_COORDS").upper() != "TWOD_COORDS":
+                    raise ValueError(f"{fichero_tsplib}: solo se admiten coordenadas 2D")
+                coordenadas = _leer_tabla(lineas, num_nodos, 2, fichero_tsplib, clave)
+            elif clave == "EDGE_WEIGHT_SECTION":
+                formato = cabecera.get("EDGE_WEIGHT_FORMAT", "FULL_MATRIX").upper()
+                matriz = _leer_pesos(lineas, num_nodos, formato, fichero_tsplib)
+            elif clave == "DEMAND_SECTION":
+                demandas = _leer_tabla(lineas, num_nodos, 1, fichero_tsplib, clave)[:, 0]
+            elif clave == "DEPOT_SECTION":
+                depositos = _leer_depositos(lineas, fichero_tsplib)
+            elif clave == "DISPLAY_DATA_SECTION":
+                _leer_tabla(lineas, num_nodos, 2, fichero_tsplib, clave)
+            elif clave == "FIXED_EDGES_SECTION":
+                _saltar_hasta_fin(lineas)
+            else:
+                raise ValueError(f"{fichero_tsplib}: sección {clave} no soportada")
+
+    tipo = cabecera.get("TYPE", "TSP").split()[0].upper()
+    tipo_distancia = cabecera.get("EDGE_WEIGHT_TYPE", "").upper()
+    if tipo_distancia == "EUC_2D":
+        if coordenadas is None:
+            raise ValueError(f"{fichero_tsplib}: falta NODE_COORD_SECTION")
+    elif tipo_distancia == "EXPLICIT":
+        if matriz is None:
+            raise ValueError(f"{fichero_tsplib}: falta EDGE_WEIGHT_SECTION")
+    else:
+        raise ValueError(f"{fichero_tsplib}: EDGE_WEIGHT_TYPE {tipo_distancia or '(ninguno)'} no soportado")
+    num_nodos = len(coordenadas) if tipo_distancia == "EUC_2D" else len(matriz)
+
+    if len(depositos) > 1:
+        raise ValueError(f"{fichero_tsplib}: solo se admite un almacén")
+    deposito = depositos[0] - 1 if depositos else 0
+    if not 0 <= deposito < num_nodos:
+        raise ValueError(f"{fichero_tsplib}: almacén {deposito + 1} fuera de rango")
+    # El almacén pasa a ser el índice 0; el resto conserva su orden
+    orden = np.arange(num_nodos)
+    if deposito:
+        orden = np.concatenate(([deposito], np.delete(orden, deposito)))
+
+    if tipo_distancia == "EUC_2D":
+        distancias = DistanciasEuclideas(coordenadas[orden])
+    else:
+        if deposito:
+            matriz = matriz[np.ix_(orden, orden)]
+        if np.array_equal(matriz, np.floor(matriz)):
+            matriz = matriz.astype(np.int64)
+        distancias = MatrizDistancias(matriz)
+    if demandas is not None:
+        demandas = demandas[orden]
+        if np.array_equal(demandas, np.floor(demandas)):
+            demandas = demandas.astype(np.int64)
+
+    capacidad = _numero(cabecera["CAPACITY"]) if "CAPACITY" in cabecera else None
+    return {
+        "nombre": cabecera.get("NAME", ""),
+        "tipo": tipo,
+        "distancias": distancias,
+        "demandas": demandas,
+        "capacidad": capacidad,
+        "ids": orden + 1,
+    }
+
+
+def cargar_tsplib(fichero_tsplib, semilla=None):
+    """Carga una instancia TSPLIB como TSPGenerico, o CVRPLIB como TSPCapacidad"""
+    from tsp_generico import TSPGenerico
+    from tsp_capacidad import TSPCapacidad
+    instancia = leer_tsplib(fichero_tsplib)
+    if instancia["tipo"] != "CVRP":
+        return TSPGenerico(distancias=instancia["distancias"], semilla=semilla)
+    if instancia["demandas"] is None or instancia["capacidad"] is None:
+        raise ValueError(f"{fichero_tsplib}: una instancia CVRP necesita CAPACITY y DEMAND_SECTION")
+    demandas = instancia["demandas"].tolist()
+    demandas[0] = 0  # El almacén no tiene demanda
+    return TSPCapacidad(capacidad_camion=instancia["capacidad"], demandas=demandas,
+                        distancias=instancia["distancias"], semilla=semilla)
+
+
+def escribir_tsplib(fichero_tsplib, distancias, demandas=None, capacidad=None, nombre="instancia",
+                    comentario=None):
+    """Escribe una instancia en formato TSPLIB (o CVRPLIB si hay demandas), con el almacén como nodo 1.
+
+    Las instancias euclídeas se escriben como EUC_2D con sus coordenadas y el
+    resto como matriz EXPLICIT FULL_MATRIX; los datos se vuelcan por filas.
+    """
+    euclidea = isinstance(distancias, DistanciasEuclideas)
+    if not euclidea and not isinstance(distancias, MatrizDistancias):
+        distancias = MatrizDistancias(distancias)
+    num_nodos = len(distancias)
+    if demandas is not None:
+        tipo = "CVRP"
+    elif euclidea or np.array_equal(distancias.datos, distancias.datos.T):
+        tipo = "TSP"
+    else:
+        tipo = "ATSP"
+
+    with open(fichero_tsplib, "w", encoding="utf-8") as fichero:
+        fichero.write(f"NAME : {nombre}\n")
+        if comentario:
+            fichero.write(f"COMMENT : {comentario}\n")
+        fichero.write(f"TYPE : {tipo}\nDIMENSION : {num_nodos}\n")
+        if euclidea:
+            fichero.write("EDGE_WEIGHT_TYPE : EUC_2D\n")
+        else:
+            fichero.write("EDGE_WEIGHT_TYPE : EXPLICIT\nEDGE_WEIGHT_FORMAT : FULL_MATRIX\n")
+        if capacidad is not None:
+            fichero.write(f"CAPACITY : {capacidad}\n")
+        if euclidea:
+            fichero.write("NODE_COORD_SECTION\n")
+            tabla = np.column_stack((np.arange(1, num_nodos + 1), distancias.coordenadas))
+            np.savetxt(fichero, tabla, fmt=["%d", "%.10g", "%.10g"])
+        else:
+            fichero.write("EDGE_WEIGHT_SECTION\n")
+            datos = distancias.datos
+            np.savetxt(fichero, datos, fmt="%d" if datos.dtype.kind in "iu" else "%.10g")
+        if demandas is not None:
+            fichero.write("DEMAND_SECTION\n")
+            tabla = np.column_stack((np.arange(1, num_nodos + 1), np.asarray(demandas)))
+            np.savetxt(fichero, tabla, fmt="%d" if tabla.dtype.kind in "iu" else "%.10g")
+            fichero.write("DEPOT_SECTION\n1\n-1\n")
+        fichero.write("EOF\n")
+
+
+def guardar_tsplib(fichero_tsplib, tsp, nombre="instancia"):
+    """Guarda la instancia de un TSPGenerico (TSPLIB) o TSPCapacidad (CVRPLIB)"""
+    if hasattr(tsp, "capacidad_camion"):
+        escribir_tsplib(fichero_tsplib, tsp.distancias, tsp.demandas, tsp.capacidad_camion, nombre)
+    else:
+        escribir_tsplib(fichero_tsplib, tsp.distancias, nombre=nombre)
+
+
+def escribir_ruta_tsplib(fichero_tour, ruta_indices, nombre="ruta", ids=None):
+    """Escribe una ruta en formato TSPLIB (TOUR_SECTION), numerando desde 1 o con los `ids` originales"""
+    ruta = np.asarray(ruta_indices, dtype=np.int64)
+    if len(ruta) > 1 and ruta[0] == ruta[-1]:
+        ruta = ruta[:-1]  # TOUR_SECTION no repite el nodo inicial al cerrar el ciclo
+    ruta = ruta + 1 if ids is None else np.asarray(ids)[ruta]
+    with open(fichero_tour, "w", encoding="utf-8") as fichero:
+        fichero.write(f"NAME : {nombre}\nTYPE : TOUR\nDIMENSION : {len(ruta)}\nTOUR_SECTION\n")
+        np.savetxt(fichero, ruta, fmt="%d")
+        fichero.write("-1\nEOF\n")
@@ -1,3 +1,8 @@
+import itertools
+import sys
+import numpy as np
+
+
 def validar_entrada(mensaje, tipo=int, min_val=None, max_val=None):
     """Valida la entrada del usuario"""
     while True:
@@ -14,38 +19,106 @@ def validar_entrada(mensaje, tipo=int, min_val=None, max_val=None):
             print("Entrada inválida. Intente nuevamente.")
 
 
-def mostrar_matriz(matriz, etiquetas):
-    """Muestra una matriz de forma legible con etiquetas"""
-    # Calcular el ancho máximo de las etiquetas
-    max_ancho = max(len(str(etiqueta)) for etiqueta in etiquetas)
+# Tamaño hasta el que se muestra la matriz completa; por encima, resumen y ventana
+MAX_NODOS_MATRIZ_COMPLETA = 20
+# Filas de muestra para estimar las estadísticas de una matriz grande
+MAX_FILAS_ESTADISTICAS = 200
+
+
+def _fila_de_valores(matriz, i, desde, hasta):
+    """Valores de la fila `i` entre las columnas `desde` y `hasta` (exclusiva), como array"""
+    if hasattr(matriz, "fila"):
+        return np.asarray(matriz.fila(i)[desde:hasta])
+    return np.asarray(matriz[i][desde:hasta])
+
+
+def mostrar_ventana(matriz, etiquetas, fila=0, columna=0, alto=None, ancho=None, salida=None):
+    """Muestra un bloque de la matriz con etiquetas, escribiendo cada fila de una vez"""
+    salida = salida or sys.stdout
+    n = len(matriz)
+    hasta_fila = n if alto is None else min(fila + alto, n)
+    hasta_columna = n if ancho is None else min(columna + ancho, n)
+    filas = [_fila_de_valores(matriz, i, columna, hasta_columna).tolist() for i in range(fila, hasta_fila)]
+    # El ancho de columna cubre la etiqueta y el valor más largos del bloque
+    max_ancho = max(len(str(etiquetas[i]))
+                    for i in itertools.chain(range(fila, hasta_fila), range(columna, hasta_columna)))
+    max_ancho = max([max_ancho] + [len(str(valor)) for valores in filas for valor in valores])
+    celda = max_ancho + 2
+
+    lineas = [" " * (celda + 1) + "".join(f"{str(etiquetas[j]):>{celda}}" for j in range(columna, hasta_columna))]
+    for i, valores in zip(range(fila, hasta_fila), filas):
+        lineas.append(f"{str(etiquetas[i]):>{celda}}:" + "".join(f"{valor:>{celda}}" for valor in valores))
+    salida.write("\n".join(lineas) + "\n")
+
+
+def resumen_matriz(matriz):
+    """Devuelve (mínimo, máximo, media) de las distancias fuera de la diagonal.
 
-    # Imprimir encabezado
-    print(" " * (max_ancho + 2), end="")
-    for etiqueta in etiquetas:
-        print(f"{str(etiqueta):>{max_ancho + 2}}", end="")
-    print()
+    En matrices grandes se calcula sobre una muestra de filas repartidas por
+    toda la matriz, sin recorrerla entera.
+    """
+    n = len(matriz)
+    paso = max(1, n // MAX_FILAS_ESTADISTICAS)
+    minimo = None
+    maximo = None
+    suma = 0
+    cuenta = 0
+    for i in range(0, n, paso):
+        valores = np.delete(_fila_de_valores(matriz, i, 0, n), i)
+        if len(valores) == 0:
+            continue
+        minimo = int(valores.min()) if minimo is None else min(minimo, int(valores.min()))
+        maximo = int(valores.max()) if maximo is None else max(maximo, int(valores.max()))
+        suma += int(valores.sum(dtype=np.int64))
+        cuenta += len(valores)
+    return minimo, maximo, (suma / cuenta if cuenta else 0)
 
-    # Imprimir filas
-    for i in range(len(matriz)):
-        print(f"{str(etiquetas[i]):>{max_ancho + 2}}:", end="")
-        for j in range(len(matriz[i])):
-            print(f"{matriz[i][j]:>{max_ancho + 2}}", end="")
-        print()
+
+def mostrar_matriz(matriz, etiquetas, max_nodos=MAX_NODOS_MATRIZ_COMPLETA, ventana=10, salida=None):
+    """Muestra una matriz de forma legible con etiquetas.
+
+    Hasta `max_nodos` nodos se muestra completa; con más, un resumen (mínimo,
+    máximo y media) y la esquina superior izquierda de `ventana` × `ventana`.
+    Para recorrerla entera está `paginar_matriz`.
+    """
+    salida = salida or sys.stdout
+    n = len(matriz)
+    if n <= max_nodos:
+        mostrar_ventana(matriz, etiquetas, salida=salida)
+        return
+    minimo, maximo, media = resumen_matriz(matriz)
+    estimada = " (estimada)" if n > MAX_FILAS_ESTADISTICAS else ""
+    salida.write(f"Matriz de {n} x {n}: mínimo {minimo}, máximo {maximo}, media{estimada} {media:.1f}\n")
+    salida.write(f"Primeras {min(ventana, n)} filas y columnas:\n")
+    mostrar_ventana(matriz, etiquetas, 0, 0, ventana, ventana, salida)
+
+
+def paginar_matriz(matriz, etiquetas, alto=20, ancho=10, entrada=input, salida=None):
+    """Recorre la matriz por bloques de `alto` × `ancho`, esperando a Enter entre bloques ('q' para salir)"""
+    salida = salida or sys.stdout
+    n = len(matriz)
+    for columna in range(0, n, ancho):
+        for fila in range(0, n, alto):
+            salida.write(f"\nFilas {etiquetas[fila]}-{etiquetas[min(fila + alto, n) - 1]}, "
+                         f"columnas {etiquetas[columna]}-{etiquetas[min(columna + ancho, n) - 1]}:\n")
+            mostrar_ventana(matriz, etiquetas, fila, columna, alto, ancho, salida)
+            if entrada("Enter para continuar, 'q' para salir: ").strip().lower() == "q":
+                return
+
+
+def etiqueta_de_indice(indice):
+    """Etiqueta del nodo `indice` (A, B, ..., Z, AA, AB, ...), sin generar las anteriores"""
+    etiqueta = ""
+    n = indice
+    while n >= 0:
+        etiqueta = chr(65 + (n % 26)) + etiqueta
+        n = n // 26 - 1
+    return etiqueta
 
 
 def generar_etiquetas(num_nodos):
     """Genera etiquetas para los nodos (A, B, ..., Z, AA, AB, ...)"""
-    etiquetas = []
-    for i in range(num_nodos):
-        etiqueta = ""
-        n = i
-        while n >= 0:
-            etiqueta = chr(65 + (n % 26)) + etiqueta
-            n = n // 26 - 1
-            if n < 0:
-                break
-        etiquetas.append(etiqueta)
-    return etiquetas
+    return [etiqueta_de_indice(i) for i in range(num_nodos)]
 
 
 def indice_a_letra(indice, etiquetas):
@@ -53,6 +126,20 @@ def indice_a_letra(indice, etiquetas):
     return etiquetas[indice]
 
 
+def indices_de_etiquetas(etiquetas):
+    """Devuelve el diccionario etiqueta -> índice, para convertir etiquetas en O(1)"""
+    return {etiqueta: indice for indice, etiqueta in enumerate(etiquetas)}
+
+
 def letra_a_indice(letra, etiquetas):
-    """Convierte una etiqueta a su índice correspondiente"""
-    return etiquetas.index(letra)
\ No newline at end of file
+    """Convierte una etiqueta a su índice correspondiente (`etiquetas` puede ser la lista o el diccionario)"""
+    if isinstance(etiquetas, dict):
+        return etiquetas[letra]
+    # Las etiquetas de `generar_etiquetas` son números en base 26 biyectiva: el índice se calcula en O(1)
+    indice = 0
+    for caracter in letra:
+        indice = indice * 26 + ord(caracter) - 64
+    indice -= 1
+    if not 0 <= indice < len(etiquetas) or etiquetas[indice] != letra:
+        raise ValueError(f"{letra!r} no es una etiqueta de nodo")
+    return indice
\ No newline at end of file